@@ -0,0 +1,65 @@
+# embedded_nodes.py
+"""
+Readers for the nodes file written by embedding_generator_json.save_nodes.
+Kept apart from the generator so the Neo4j loaders can read embedded nodes
+without importing torch / sentence-transformers.
+"""
+import json
+import os
+import numpy as np
+import orjson
+from typing import List, Dict, Iterator
+
+# ijson lets us parse the nodes file incrementally (pip install ijson)
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Embeddings are stored as a float16 matrix next to the JSON, one row per node
+VECTORS_SUFFIX = ".vec.npy"
+
+def _is_wrapped(f) -> bool:
+    """True if the file holds a {"meta", "nodes"} object rather than a bare array"""
+    wrapped = f.read(64).lstrip().startswith(b"{")
+    f.seek(0)
+    return wrapped
+
+def iter_nodes(filepath: str) -> Iterator[Dict]:
+    """Yield nodes one at a time from a JSON array or a save_nodes output file"""
+    if ijson is None:
+        with open(filepath, "rb") as f:
+            data = orjson.loads(f.read())
+        yield from data["nodes"] if isinstance(data, dict) else data
+        return
+    
+    with open(filepath, "rb") as f:
+        prefix = "nodes.item" if _is_wrapped(f) else "item"
+        try:
+            yield from ijson.items(f, prefix, use_float=True)
+        except ijson.JSONError as e:
+            raise json.JSONDecodeError(str(e), "", 0) from e
+
+def load_nodes(filepath: str) -> List[Dict]:
+    """Load nodes from JSON file"""
+    print(f"📂 Loading nodes from: {filepath}")
+    # Streaming avoids holding the raw file text and the parsed nodes at once
+    nodes = list(iter_nodes(filepath))
+    print(f"✅ Loaded {len(nodes)} nodes")
+    return nodes
+
+def load_embedded_nodes(filepath: str) -> List[Dict]:
+    """Load nodes written by save_nodes and reattach their embeddings"""
+    nodes = load_nodes(filepath)
+    vectors_path = filepath + VECTORS_SUFFIX
+    if not os.path.exists(vectors_path):
+        # Older files carry the embeddings inline
+        return nodes
+    
+    # Memory-map the matrix and convert it to float lists in one vectorized pass
+    vectors = np.load(vectors_path, mmap_mode="r").astype(np.float32).tolist()
+    for node in nodes:
+        row = node.pop("embedding_row", None)
+        if row is not None:
+            node["embedding"] = vectors[row]
+    return nodes
@@ -3,44 +3,97 @@
 
 
 # add_embeddings_open_source.py
-import json
+import os
+import numpy as np
+import orjson
+import torch
 from sentence_transformers import SentenceTransformer
 
 INPUT_FILE = "troubleshooting.json"
 OUTPUT_FILE = "troubleshooting_with_embeddings.json"
+# Vectors are stored as a float16 matrix next to the JSON, one row per record
+VECTORS_SUFFIX = ".vec.npy"
 
 # You can switch to another model, e.g. "all-mpnet-base-v2" (higher quality, slower)
 MODEL_NAME = "all-MiniLM-L6-v2"
 
+# Cap intra-op threads so encodes don't thrash other services on shared hosts
+NUM_THREADS = int(os.getenv("EMB_NUM_THREADS", min(8, os.cpu_count() or 1)))
+_threads_configured = False
+
+def configure_torch_threads():
+    """Apply the thread caps once per process, from main() rather than at import."""
+    global _threads_configured
+    if _threads_configured:
+        return
+    _threads_configured = True
+    torch.set_num_threads(NUM_THREADS)
+    try:
+        torch.set_num_interop_threads(2)
+    except RuntimeError:
+        # Only settable before any inter-op work has started; keep torch's default then
+        pass
+
 print(f"Loading model: {MODEL_NAME}")
 model = SentenceTransformer(MODEL_NAME)
+model.eval()
 
 def generate_embedding(text: str):
     """Generate embedding vector for given text"""
     if not text.strip():
         return []
-    embedding = model.encode(text, normalize_embeddings=True)
+    with torch.inference_mode():
+        embedding = model.encode(text, normalize_embeddings=True)
     return embedding.tolist()
 
 def main():
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        records = json.load(f)
+    configure_torch_threads()
+    with open(INPUT_FILE, "rb") as f:
+        records = orjson.loads(f.read())
+
+    # Collect every record that still needs a vector, then encode them in one call
+    pending = []
+    for idx, rec in enumerate(records):
+        if rec.get("vector"):
+            continue
+        text = rec.get("content_text", "")
+        if text.strip():
+            pending.append((idx, text))
+        else:
+            rec["vector"] = []
 
-    updated = []
+    if pending:
+        print(f"→ Creating embeddings for {len(pending)} records")
+        texts = [text for _, text in pending]
+        try:
+            with torch.inference_mode():
+                embs = model.encode(
+                    texts,
+                    batch_size=64,
+                    normalize_embeddings=True,
+                    convert_to_numpy=True,
+                    show_progress_bar=True
+                )
+            for i, (idx, _) in enumerate(pending):
+                records[idx]["vector"] = embs[i]
+        except Exception as e:
+            print(f"❌ Failed to encode batch: {e}")
+            for idx, _ in pending:
+                records[idx]["vector"] = []
+
+    # Keep only a row index in the JSON; the vectors themselves go to the .npy
+    vectors = []
     for rec in records:
-        if not rec.get("vector"):  # empty or None
-            print(f"→ Creating embedding for: {rec.get('title','(no title)')}")
-            try:
-                rec["vector"] = generate_embedding(rec.get("content_text", ""))
-            except Exception as e:
-                print(f"❌ Failed on {rec.get('url')}: {e}")
-                rec["vector"] = []
-        updated.append(rec)
-
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(updated, f, indent=2, ensure_ascii=False)
-
-    print(f"✅ Updated file saved to {OUTPUT_FILE}")
+        vector = rec.pop("vector", None)
+        if vector is not None and len(vector) > 0:
+            rec["vector_row"] = len(vectors)
+            vectors.append(vector)
+
+    with open(OUTPUT_FILE, "wb") as f:
+        f.write(orjson.dumps(records, option=orjson.OPT_INDENT_2))
+    np.save(OUTPUT_FILE + VECTORS_SUFFIX, np.asarray(vectors, dtype=np.float16))
+
+    print(f"✅ Updated file saved to {OUTPUT_FILE} ({len(vectors)} vectors in {OUTPUT_FILE + VECTORS_SUFFIX})")
 
 if __name__ == "__main__":
     main()
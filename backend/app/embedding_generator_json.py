@@ -1,20 +1,211 @@
 # remotelock_embedding_generator.py
+import hashlib
 import json
+import os
+import sqlite3
 import time
+from collections import defaultdict
+from contextlib import nullcontext
+import numpy as np
+import orjson
+import torch
 from sentence_transformers import SentenceTransformer
+from sentence_transformers.util import batch_to_device
+from tqdm.auto import tqdm
 from typing import List, Dict
+try:
+    from .embedded_nodes import VECTORS_SUFFIX, load_nodes
+except ImportError:
+    # Run as a script from inside backend/app
+    from embedded_nodes import VECTORS_SUFFIX, load_nodes
 
 MODEL_NAME = "all-MiniLM-L6-v2"
+# BF16 autocast only pays off on CPUs with native BF16 (e.g. Sapphire Rapids, Zen 4)
+USE_CPU_BF16 = os.getenv("EMBEDDING_CPU_BF16", "0") == "1"
+# torch.compile pays a one-off compile cost, so only enable it for large corpora
+USE_TORCH_COMPILE = os.getenv("EMBEDDING_TORCH_COMPILE", "0") == "1"
+# "auto" uses ONNX Runtime on CPU when optimum[onnxruntime] is installed
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "auto")
+# Pre-quantized INT8 export shipped with the model, e.g. "onnx/model_qint8_avx512_vnni.onnx"
+ONNX_FILE_NAME = os.getenv("EMBEDDING_ONNX_FILE")
+# Cap intra-op threads so encodes don't thrash other services on shared hosts
+NUM_THREADS = int(os.getenv("EMB_NUM_THREADS", min(8, os.cpu_count() or 1)))
 INPUT_FILE = "remotelock_nodes.json"
 OUTPUT_FILE = "remotelock_nodes_with_embeddings.json"
+# Attempts per batch before it is counted as failed
+ENCODE_ATTEMPTS = 2
+# Embeddings of previously seen texts, keyed by content hash
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite"
+
+_threads_configured = False
+
+def configure_torch_threads():
+    """
+    Apply the thread caps once per process. Not done at import: spawned encode
+    workers re-import this module and must keep their per-worker OMP_NUM_THREADS
+    split, and set_num_interop_threads raises if called twice or after parallel work.
+    """
+    global _threads_configured
+    if _threads_configured:
+        return
+    _threads_configured = True
+    torch.set_num_threads(NUM_THREADS)
+    try:
+        torch.set_num_interop_threads(2)
+    except RuntimeError:
+        # Inter-op pool already started; keep torch's default
+        pass
 
 class EmbeddingGenerator:
     def __init__(self, model_name: str = MODEL_NAME):
         """Initialize the embedding model"""
+        configure_torch_threads()
         print(f"🔧 Loading model: {model_name}...")
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.cache = sqlite3.connect(EMBEDDING_CACHE_FILE)
+        self.cache.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.backend = "torch"
+        self.model = None
+        if self.device == "cpu" and EMBEDDING_BACKEND in ("auto", "onnx"):
+            self.model = self._load_onnx_model(model_name)
+        if self.model is None:
+            self.model = SentenceTransformer(model_name, device=self.device)
+            if self.device == "cuda":
+                # FP16 weights halve memory traffic and run on Tensor Cores
+                self.model = self.model.half()
+            self.model.eval()
+            if USE_TORCH_COMPILE:
+                self._compile_model()
         print(f"✅ Model loaded successfully")
+        print(f"   Device: {self.device} ({self.backend})")
         print(f"   Embedding dimension: {self.model.get_sentence_embedding_dimension()}")
+        
+        # Run-wide embedding details, written once in the output header
+        self.meta = {
+            "embedding_model": model_name,
+            "embedding_dimension": self.model.get_sentence_embedding_dimension(),
+            "embedded_at": int(time.time())
+        }
+    
+    def _load_onnx_model(self, model_name: str):
+        """Load the model on ONNX Runtime, or return None if it is unavailable"""
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if ONNX_FILE_NAME:
+            model_kwargs["file_name"] = ONNX_FILE_NAME
+        try:
+            model = SentenceTransformer(
+                model_name,
+                device="cpu",
+                backend="onnx",
+                model_kwargs=model_kwargs
+            )
+        except Exception as e:
+            print(f"   ⚠️  ONNX Runtime backend unavailable, using PyTorch: {e}")
+            return None
+        self.backend = "onnx"
+        return model
+    
+    def _compile_model(self):
+        """Compile the underlying transformer and pay the compile cost up front"""
+        print(f"   Compiling transformer with torch.compile...")
+        transformer = self.model[0]
+        # Batches are length-sorted but still vary in sequence length, so compile
+        # with dynamic shapes rather than recompiling for every new length
+        transformer.auto_model = torch.compile(transformer.auto_model, dynamic=True)
+        self.encode_texts(["warm-up"], show_progress_bar=False)
+    
+    def _precision_context(self):
+        """Autocast context for the current device, if reduced precision applies"""
+        if self.backend == "torch" and self.device == "cuda":
+            return torch.autocast("cuda", dtype=torch.float16)
+        if self.backend == "torch" and USE_CPU_BF16:
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return nullcontext()
+    
+    def encode_texts(self, texts, **kwargs):
+        """Encode texts without autograd, under reduced precision where supported"""
+        with torch.inference_mode(), self._precision_context():
+            return self.model.encode(
+                texts,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                **kwargs
+            )
+    
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Encode one batch, tokenizing once and reusing the features on retry"""
+        features = batch_to_device(self.model.tokenize(texts), self.model.device)
+        for attempt in range(1, ENCODE_ATTEMPTS + 1):
+            try:
+                with torch.inference_mode(), self._precision_context():
+                    output = self.model(features)["sentence_embedding"]
+                output = torch.nn.functional.normalize(output.float(), p=2, dim=1)
+                return output.cpu().numpy()
+            except Exception as e:
+                if attempt == ENCODE_ATTEMPTS:
+                    raise
+                print(f"\n   ⚠️  Encode attempt {attempt} failed, retrying: {e}")
+    
+    def text_hash(self, text: str) -> bytes:
+        """Cache key for a text; includes the model so switching models misses"""
+        return hashlib.sha1(f"{self.model_name}\n{text}".encode("utf-8")).digest()
+    
+    def cached_embeddings(self, hashes: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Look up cached embeddings for the given hashes"""
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.cache.execute(
+                f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", chunk
+            )
+            for h, blob in rows:
+                found[h] = np.frombuffer(blob, dtype=np.float16)
+        return found
+    
+    def cache_embeddings(self, hashes: List[bytes], embeddings):
+        """Store freshly computed embeddings in the cache"""
+        self.cache.executemany(
+            "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+            [(h, np.asarray(e, dtype=np.float16).tobytes()) for h, e in zip(hashes, embeddings)]
+        )
+        self.cache.commit()
+    
+    def _multi_process_workers(self) -> int:
+        """Number of encode processes to use, or 0 to encode in this process"""
+        cpu_count = os.cpu_count() or 1
+        if self.device != "cpu" or self.backend != "torch" or cpu_count < 8:
+            return 0
+        return min(4, cpu_count // 2)
+    
+    def encode_multi_process(self, texts: List[str], workers: int, batch_size: int):
+        """Encode texts with a pool of CPU worker processes"""
+        # Split the cores between workers so their intra-op threads don't
+        # oversubscribe the machine; spawned workers inherit the environment
+        os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // workers))
+        pool = self.model.start_multi_process_pool(["cpu"] * workers)
+        try:
+            return self.model.encode_multi_process(
+                texts,
+                pool,
+                batch_size=batch_size,
+                normalize_embeddings=True
+            )
+        finally:
+            self.model.stop_multi_process_pool(pool)
+    
+    def _store_embedding(self, nodes: List[Dict], node_indices: List[int], embedding) -> int:
+        """Write an embedding into the output buffer for every node sharing its text"""
+        for node_idx in node_indices:
+            self.embeddings[node_idx] = embedding
+            node = nodes[node_idx]
+            # The node holds a view into the buffer, so no per-float Python objects
+            node["embedding"] = self.embeddings[node_idx]
+        return len(node_indices)
     
     def create_embedding_text(self, node: Dict) -> str:
         """Create a combined text for embedding generation"""
@@ -43,7 +234,7 @@ class EmbeddingGenerator:
         if not text or not text.strip():
             return None
         
-        embedding = self.model.encode(text, convert_to_numpy=True)
+        embedding = self.encode_texts(text)
         return embedding.tolist()
     
     def needs_embedding(self, node: Dict) -> bool:
@@ -63,8 +254,8 @@ class EmbeddingGenerator:
     def process_nodes(self, nodes: List[Dict], batch_size: int = 32) -> tuple:
         """Process all nodes and generate embeddings where needed"""
         total_nodes = len(nodes)
-        nodes_needing_embedding = [n for n in nodes if self.needs_embedding(n)]
-        nodes_to_process = len(nodes_needing_embedding)
+        indices_to_do = [i for i, n in enumerate(nodes) if self.needs_embedding(n)]
+        nodes_to_process = len(indices_to_do)
         
         print(f"\n📊 Embedding Status:")
         print(f"   Total nodes:                {total_nodes}")
@@ -83,44 +274,88 @@ class EmbeddingGenerator:
         failed_count = 0
         start_time = time.time()
         
-        # Process in batches for efficiency
-        for i in range(0, len(nodes), batch_size):
-            batch = nodes[i:i + batch_size]
-            batch_texts = []
-            batch_indices = []
-            
-            # Collect nodes that need embedding in this batch
-            for idx, node in enumerate(batch):
-                if self.needs_embedding(node):
-                    embedding_text = self.create_embedding_text(node)
-                    if embedding_text.strip():
-                        batch_texts.append(embedding_text)
-                        batch_indices.append(i + idx)
-            
-            # Generate embeddings for the batch
-            if batch_texts:
-                try:
-                    embeddings = self.model.encode(
-                        batch_texts, 
-                        convert_to_numpy=True,
-                        show_progress_bar=False
+        # Single contiguous output buffer, one row per node
+        dimension = self.model.get_sentence_embedding_dimension()
+        self.embeddings = np.zeros((total_nodes, dimension), dtype=np.float32)
+        
+        # Collect every text that needs embedding across the whole corpus;
+        # duplicate texts are encoded once and shared by all their nodes
+        text_to_indices = {}
+        for idx in indices_to_do:
+            embedding_text = self.create_embedding_text(nodes[idx])
+            if embedding_text.strip():
+                text_to_indices.setdefault(embedding_text, []).append(idx)
+        all_texts = list(text_to_indices.keys())
+        all_indices = list(text_to_indices.values())
+        duplicates = sum(len(indices) for indices in all_indices) - len(all_texts)
+        if duplicates:
+            print(f"   Duplicate texts skipped: {duplicates}")
+        
+        # Serve texts seen in a previous run straight from the cache
+        all_hashes = [self.text_hash(text) for text in all_texts]
+        cached = self.cached_embeddings(all_hashes)
+        if cached:
+            remaining = []
+            for k, h in enumerate(all_hashes):
+                if h in cached:
+                    processed_count += self._store_embedding(nodes, all_indices[k], cached[h])
+                else:
+                    remaining.append(k)
+            all_texts = [all_texts[k] for k in remaining]
+            all_indices = [all_indices[k] for k in remaining]
+            all_hashes = [all_hashes[k] for k in remaining]
+            print(f"   Cache hits: {processed_count}")
+        
+        # Sort longest-first so each batch holds texts of similar length and
+        # the transformer pads as little as possible
+        order = sorted(range(len(all_texts)), key=lambda k: len(all_texts[k]), reverse=True)
+        
+        sorted_texts = [all_texts[k] for k in order]
+        embeddings = None
+        if sorted_texts:
+            workers = self._multi_process_workers()
+            try:
+                if workers:
+                    # Encode the whole corpus in one shot across worker processes
+                    print(f"   Encoding with {workers} worker processes")
+                    embeddings = self.encode_multi_process(sorted_texts, workers, batch_size)
+                else:
+                    # One call over the whole corpus; encode() batches internally
+                    embeddings = self.encode_texts(
+                        sorted_texts,
+                        batch_size=batch_size,
+                        show_progress_bar=True
                     )
+            except Exception as e:
+                print(f"\n   ⚠️  Whole-corpus encoding failed, retrying batch by batch: {e}")
+        
+        if embeddings is not None:
+            self.cache_embeddings([all_hashes[k] for k in order], embeddings)
+            for k, embedding in zip(order, embeddings):
+                processed_count += self._store_embedding(nodes, all_indices[k], embedding)
+        elif sorted_texts:
+            # Fallback: encode batch by batch so one bad batch doesn't sink the run
+            progress_bar = tqdm(total=len(order), desc="embedding", unit="text")
+            for i in range(0, len(order), batch_size):
+                batch_order = order[i:i + batch_size]
+                batch_texts = [all_texts[k] for k in batch_order]
+                batch_indices = [all_indices[k] for k in batch_order]
+                batch_hashes = [all_hashes[k] for k in batch_order]
+                
+                try:
+                    embeddings = self.encode_batch(batch_texts)
+                    self.cache_embeddings(batch_hashes, embeddings)
                     
                     # Assign embeddings to nodes
-                    for node_idx, embedding in zip(batch_indices, embeddings):
-                        nodes[node_idx]["embedding"] = embedding.tolist()
-                        nodes[node_idx]["embedding_model"] = MODEL_NAME
-                        nodes[node_idx]["embedding_dimension"] = len(embedding)
-                        nodes[node_idx]["embedded_at"] = int(time.time())
-                        processed_count += 1
+                    for node_indices, embedding in zip(batch_indices, embeddings):
+                        processed_count += self._store_embedding(nodes, node_indices, embedding)
                     
-                    # Progress update
-                    progress = (processed_count / nodes_to_process) * 100
-                    print(f"   ✅ Progress: {processed_count}/{nodes_to_process} ({progress:.1f}%)", end="\r")
-                
                 except Exception as e:
                     print(f"\n   ❌ Error processing batch: {e}")
-                    failed_count += len(batch_texts)
+                    failed_count += sum(len(node_indices) for node_indices in batch_indices)
+                
+                progress_bar.update(len(batch_texts))
+            progress_bar.close()
         
         elapsed_time = time.time() - start_time
         
@@ -132,22 +367,33 @@ class EmbeddingGenerator:
         
         return nodes, processed_count
 
-def load_nodes(filepath: str) -> List[Dict]:
-    """Load nodes from JSON file"""
-    print(f"📂 Loading nodes from: {filepath}")
-    with open(filepath, "r", encoding="utf-8") as f:
-        nodes = json.load(f)
-    print(f"✅ Loaded {len(nodes)} nodes")
-    return nodes
-
-def save_nodes(nodes: List[Dict], filepath: str):
-    """Save nodes to JSON file"""
+def save_nodes(nodes: List[Dict], filepath: str, meta: Dict):
+    """Save nodes to JSON file, writing one node at a time.
+    
+    The file is `{"meta": ..., "nodes": [...]}`, with run-wide embedding
+    details in `meta`. Embeddings go to a float16 matrix in
+    `filepath + VECTORS_SUFFIX`; each embedded node keeps only its row
+    index as `embedding_row`.
+    """
     print(f"\n💾 Saving nodes to: {filepath}")
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(nodes, f, indent=2, ensure_ascii=False)
-    print(f"✅ Saved {len(nodes)} nodes")
+    vectors = []
+    with open(filepath, "wb") as f:
+        f.write(b'{"meta": ' + orjson.dumps(meta) + b',\n"nodes": [\n')
+        for i, node in enumerate(nodes):
+            if i:
+                f.write(b",\n")
+            record = {k: v for k, v in node.items() if k != "embedding"}
+            embedding = node.get("embedding")
+            if embedding is not None and len(embedding) > 0:
+                record["embedding_row"] = len(vectors)
+                vectors.append(node["embedding"])
+            f.write(orjson.dumps(record))
+        f.write(b"\n]}\n")
+    
+    np.save(filepath + VECTORS_SUFFIX, np.asarray(vectors, dtype=np.float16))
+    print(f"✅ Saved {len(nodes)} nodes ({len(vectors)} vectors in {filepath + VECTORS_SUFFIX})")
 
-def print_statistics(nodes: List[Dict]):
+def print_statistics(nodes: List[Dict], meta: Dict):
     """Print detailed statistics about embeddings"""
     embedded_nodes = [n for n in nodes if n.get("embedding") is not None]
     nodes_with_content = [n for n in nodes if n.get("content") and n["content"].strip()]
@@ -162,23 +408,20 @@ def print_statistics(nodes: List[Dict]):
     
     if embedded_nodes:
         print(f"\nEmbedding details:")
-        print(f"   Model:                   {embedded_nodes[0].get('embedding_model', 'N/A')}")
-        print(f"   Dimension:               {embedded_nodes[0].get('embedding_dimension', 'N/A')}")
+        print(f"   Model:                   {meta.get('embedding_model', 'N/A')}")
+        print(f"   Dimension:               {meta.get('embedding_dimension', 'N/A')}")
     
-    # Category breakdown
-    category_stats = {}
+    # Category breakdown: [total, embedded] per category in a single pass
+    category_stats = defaultdict(lambda: [0, 0])
     for node in nodes:
-        cat = node.get("category", "Unknown")
-        if cat not in category_stats:
-            category_stats[cat] = {"total": 0, "embedded": 0}
-        category_stats[cat]["total"] += 1
-        if node.get("embedding") is not None:
-            category_stats[cat]["embedded"] += 1
+        stats = category_stats[node.get("category", "Unknown")]
+        stats[0] += 1
+        stats[1] += node.get("embedding") is not None
     
     print(f"\n📁 Embeddings per category:")
-    for cat, stats in sorted(category_stats.items()):
-        coverage = (stats["embedded"] / stats["total"] * 100) if stats["total"] > 0 else 0
-        print(f"   {cat:40s} {stats['embedded']:3d}/{stats['total']:3d} ({coverage:.0f}%)")
+    for cat, (total, embedded) in sorted(category_stats.items()):
+        coverage = (embedded / total * 100) if total > 0 else 0
+        print(f"   {cat:40s} {embedded:3d}/{total:3d} ({coverage:.0f}%)")
     
     print("="*70)
 
@@ -207,14 +450,14 @@ def main():
     
     # Save updated nodes
     if processed_count > 0:
-        save_nodes(updated_nodes, OUTPUT_FILE)
+        save_nodes(updated_nodes, OUTPUT_FILE, generator.meta)
         print(f"\n💡 Original file kept as: {INPUT_FILE}")
         print(f"   New file with embeddings: {OUTPUT_FILE}")
     else:
         print(f"\n💡 No changes made - all embeddings already exist")
     
     # Print statistics
-    print_statistics(updated_nodes)
+    print_statistics(updated_nodes, generator.meta)
     
     print("\n✅ Process complete! Ready for Neo4j import.")
 
@@ -1195,11 +1195,25 @@
 
 
 
-import json
-import itertools
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import numpy as np
-from neo4j import GraphDatabase
+import orjson
+from neo4j import AsyncGraphDatabase
 
+# faiss finds similar pages approximately on large graphs (pip install faiss-cpu)
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# ijson lets us stream the records file instead of loading it whole (pip install ijson)
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 
 # Neo4j credentials
@@ -1207,66 +1221,298 @@ NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "123456789"
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-
-def cosine_similarity(vec1, vec2):
-    """Compute cosine similarity between two vectors."""
-    if not vec1 or not vec2:
-        return 0.0
-    v1, v2 = np.array(vec1), np.array(vec2)
-    return float(np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2)))
-
-def create_nodes_and_relationships(tx, record):
-    # Create category and page node
-    tx.run("""
-        MERGE (c:Category {name: $category})
-        MERGE (p:Page {url: $url})
-        SET p.title = $title,
-            p.content_text = $content_text,
-            p.content_html = $content_html,
-            p.content_markdown = $content_markdown,
-            p.source = $source,
-            p.extracted_at = $extracted_at,
-            p.vector = $vector
-        MERGE (c)-[:HAS_PAGE]->(p)
-        MERGE (p)-[:BELONGS_TO]->(c)
-    """, record)
-
-    # Create keyword nodes
-    for kw in record.get("keywords", []):
-        tx.run("""
-            MERGE (k:Keyword {name: $kw})
-            MERGE (p:Page {url: $url})
-            MERGE (p)-[:HAS_KEYWORD]->(k)
-        """, {"kw": kw, "url": record["url"]})
-
-def create_related_links(records, threshold=0.75):
+# embedding_generator.py writes the vectors as a float16 matrix next to the JSON
+VECTORS_SUFFIX = ".vec.npy"
+
+def load_vectors(json_file):
+    """The companion vector matrix, memory-mapped; None for older files that carry vectors inline"""
+    vectors_path = json_file + VECTORS_SUFFIX
+    if not os.path.exists(vectors_path):
+        return None
+    return np.load(vectors_path, mmap_mode="r")
+
+def attach_vectors(records, vectors):
+    """Replace each record's `vector_row` with its row of the companion matrix"""
+    if vectors is None:
+        return
+    for rec in records:
+        row = rec.pop("vector_row", None)
+        rec["vector"] = vectors[row].astype(np.float32).tolist() if row is not None else []
+
+def iter_records(json_file):
+    """Yield records one at a time, streaming the file with ijson when available"""
+    with open(json_file, "rb") as f:
+        if ijson is not None:
+            yield from ijson.items(f, "item", use_float=True)
+        else:
+            yield from orjson.loads(f.read())
+
+def iter_batches(records, size):
+    records = iter(records)
+    batch = list(islice(records, size))
+    while batch:
+        yield batch
+        batch = list(islice(records, size))
+
+# Records per write transaction; one UNWIND round trip each instead of one per record
+BATCH_SIZE = 1000
+# Concurrent write sessions, each pulling the next batch as it frees up
+INGEST_SHARDS = 4
+# RELATED_TO edges per UNWIND statement
+EDGE_BATCH_SIZE = 5000
+# From this many pages on, HNSW neighbour search replaces the exact N x N sweep
+ANN_MIN_PAGES = 5000
+ANN_NEIGHBOURS = 20
+# Rows per exact-sweep tile: 256 x 768 float32 rows (~768 KB) stay cache-resident
+SIM_TILE = 256
+# Threads sweeping tiles side by side; only worth raising above 1 when NumPy's
+# BLAS is single-threaded (multithreaded builds already use every core per tile)
+SIM_WORKERS = int(os.getenv("SIM_WORKERS", "1"))
+# Room for every shard plus the constraint/edge sessions, not the default 100
+POOL_SIZE = 16
+# Stage raw records as :Staging nodes and let apoc.periodic.iterate MERGE them
+# server-side in parallel transactions (needs the APOC plugin)
+USE_APOC = os.getenv("NEO4J_USE_APOC", "0") == "1"
+APOC_CONCURRENCY = 8
+
+# Create the page node and its edges for one record `r`. Category and Keyword
+# nodes are shared across shards, so create_shared_nodes MERGEs them once up
+# front and this only MATCHes them; concurrent shards then never race to
+# create the same node. The page is written first and the category matched
+# optionally, so a record without a category still gets its Page node.
+# Keywords hang off the already-bound `p`, so each page is looked up once,
+# not per keyword.
+UPSERT_PAGE = """
+        MERGE (p:Page {url: r.url})
+        SET p.title = r.title,
+            p.content_text = r.content_text,
+            p.content_html = r.content_html,
+            p.content_markdown = r.content_markdown,
+            p.source = r.source,
+            p.extracted_at = r.extracted_at,
+            p.vector = r.vector
+        WITH p, r
+        OPTIONAL MATCH (c:Category {name: r.category})
+        FOREACH (_ IN CASE WHEN c IS NULL THEN [] ELSE [1] END | MERGE (c)-[:HAS_PAGE]->(p))
+        WITH p, r
+        UNWIND coalesce(r.keywords, []) AS kw
+        MATCH (k:Keyword {name: kw})
+        MERGE (p)-[:HAS_KEYWORD]->(k)
+"""
+
+# Shared Category/Keyword names per MERGE statement in the pre-pass
+SHARED_NODE_BATCH_SIZE = 10000
+# Budget for execute_write to keep retrying a shard transaction that hit a
+# transient error (e.g. DeadlockDetected on a shared node's edges)
+WRITE_RETRY_SECONDS = 120
+
+async def create_nodes_and_relationships(tx, records):
+    result = await tx.run("UNWIND $rows AS r" + UPSERT_PAGE, rows=records)
+    # Nothing is returned; consume() just fetches the summary and frees the cursor
+    await result.consume()
+
+async def stage_records(tx, records):
+    # Plain CREATE: no lookups and no shared nodes, so shards never contend
+    result = await tx.run("UNWIND $rows AS r CREATE (s:Staging) SET s = r", rows=records)
+    await result.consume()
+
+async def merge_staged_records(driver):
+    """
+    MERGE all :Staging nodes into the graph server-side, then drop them. If any
+    batch fails the staging nodes are kept, so the failed records can be re-run.
+    """
+    async with driver.session() as session:
+        result = await session.run(
+            "CALL apoc.periodic.iterate('MATCH (s:Staging) RETURN s', $upsert, "
+            "{batchSize: $batch_size, parallel: true, concurrency: $concurrency, retries: 3})",
+            upsert="WITH $s AS r" + UPSERT_PAGE,
+            batch_size=BATCH_SIZE,
+            concurrency=APOC_CONCURRENCY,
+        )
+        stats = await result.single()
+        if stats["failedBatches"]:
+            raise RuntimeError(
+                f"{stats['failedBatches']} staged batches failed, :Staging nodes kept: {stats['errorMessages']}"
+            )
+        result = await session.run(
+            "CALL apoc.periodic.iterate('MATCH (s:Staging) RETURN s', 'DELETE s', {batchSize: 10000})"
+        )
+        await result.consume()
+
+def similar_pairs(vectors, threshold):
+    """Index pairs (i < j) of rows whose cosine similarity is >= threshold, with the score."""
+    # float32, not int8: NumPy has no int8 GEMM (integer matmul skips BLAS and
+    # VNNI entirely), so quantized vectors would make this sweep slower
+    V = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(V, axis=1)
+    # All-zero (failed) embeddings are similar to nothing; keep them out of the sweep
+    valid = np.flatnonzero(norms > 0)
+    V = V[valid] / norms[valid, None]
+    if faiss is not None and len(V) >= ANN_MIN_PAGES:
+        rows, cols, sims = similar_pairs_hnsw(V, threshold)
+    else:
+        rows, cols, sims = similar_pairs_tiled(V, threshold)
+    return valid[rows], valid[cols], sims
+
+def similar_pairs_tiled(V, threshold):
+    """
+    Exact similar_pairs for unit-length rows, swept in SIM_TILE-row strips of
+    the upper triangle so the full N x N score matrix is never materialized.
+    """
+    # One sgemm per strip instead of a Python-level dot product per pair.
+    # Already SIMD and multithreaded inside BLAS, so a hand-written numba
+    # prange kernel over (i, j) would only match it, at the cost of a JIT dependency.
+    # No norm-sorted early exit either: every row is unit length by now.
+    empty = np.empty(0, dtype=np.intp)
+    rows, cols, sims = [empty], [empty], [np.empty(0, dtype=np.float32)]
+    starts = range(0, len(V), SIM_TILE)
+    if SIM_WORKERS > 1:
+        # Threads, not processes: matmul and nonzero release the GIL, and the
+        # workers read V in place instead of through shared-memory copies
+        with ThreadPoolExecutor(SIM_WORKERS) as pool:
+            tiles = list(pool.map(lambda start: tile_pairs(V, start, threshold), starts))
+    else:
+        tiles = [tile_pairs(V, start, threshold) for start in starts]
+    for i, j, sim in tiles:
+        rows.append(i)
+        cols.append(j)
+        sims.append(sim)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(sims)
+
+def tile_pairs(V, start, threshold):
+    """similar_pairs_tiled's work for the strip of rows beginning at `start`"""
+    S = V[start:start + SIM_TILE] @ V[start:].T
+    # Column c of the strip is row start + c; keep only j > i
+    i, c = np.nonzero(np.triu(S >= threshold, k=1))
+    return i + start, c + start, S[i, c]
+
+def similar_pairs_hnsw(V, threshold):
+    """
+    Approximate similar_pairs for unit-length rows: only each page's
+    ANN_NEIGHBOURS nearest neighbours are considered, found via an HNSW index.
+    """
+    index = faiss.IndexHNSWFlat(V.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+    index.add(V)
+    sims, nbrs = index.search(V, ANN_NEIGHBOURS + 1)  # +1: every page finds itself
+    rows = np.repeat(np.arange(len(V)), nbrs.shape[1])
+    cols, sims = nbrs.ravel(), sims.ravel()
+    keep = (cols >= 0) & (cols != rows) & (sims >= threshold)
+    # A pair can be found from both ends; keep it once as (i < j)
+    lo, hi, sims = np.minimum(rows, cols)[keep], np.maximum(rows, cols)[keep], sims[keep]
+    _, first = np.unique(lo * len(V) + hi, return_index=True)
+    return lo[first], hi[first], sims[first]
+
+async def create_constraints(driver):
+    """Unique constraints so every MERGE key is an index lookup, not a label scan."""
+    async with driver.session() as session:
+        for label, prop in (("Page", "url"), ("Category", "name"), ("Keyword", "name")):
+            result = await session.run(
+                f"CREATE CONSTRAINT {label.lower()}_{prop} IF NOT EXISTS "
+                f"FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+            )
+            await result.consume()
+
+async def create_shared_nodes(driver, json_file):
+    """
+    MERGE every Category and Keyword node in one sequential pre-pass, before the
+    shards start. Costs one extra streaming read of the file's names.
+    """
+    categories, keywords = set(), set()
+    for rec in iter_records(json_file):
+        if rec.get("category") is not None:
+            categories.add(rec["category"])
+        keywords.update(kw for kw in rec.get("keywords") or () if kw is not None)
+
+    async def merge_names(tx, label, names):
+        result = await tx.run(f"UNWIND $names AS name MERGE (:{label} {{name: name}})", names=names)
+        await result.consume()
+
+    async with driver.session() as session:
+        for label, names in (("Category", sorted(categories)), ("Keyword", sorted(keywords))):
+            for start in range(0, len(names), SHARED_NODE_BATCH_SIZE):
+                await session.execute_write(merge_names, label, names[start:start + SHARED_NODE_BATCH_SIZE])
+
+async def ingest_shard(driver, batches, write=create_nodes_and_relationships):
+    """
+    Write batches sequentially on one session; shards run concurrently and may
+    share one batch iterator, each taking the next batch when it is free.
+    """
+    async with driver.session() as session:
+        for batch in batches:
+            # Shards still lock shared Category/Keyword nodes when adding edges
+            # to them; execute_write retries the DeadlockDetected/transient
+            # errors that can cause, for up to WRITE_RETRY_SECONDS
+            await session.execute_write(write, batch)
+
+async def create_related_links(driver, records, threshold=0.75):
     """Create RELATED_TO links between similar pages."""
-    with driver.session() as session:
-        for rec1, rec2 in itertools.combinations(records, 2):
-            sim = cosine_similarity(rec1.get("vector"), rec2.get("vector"))
-            if sim >= threshold:
-                session.run("""
-                    MATCH (p1:Page {url: $url1}), (p2:Page {url: $url2})
-                    MERGE (p1)-[r:RELATED_TO]-(p2)
-                    SET r.similarity = $sim
-                """, {"url1": rec1["url"], "url2": rec2["url"], "sim": sim})
-
-def load_data(json_file="troubleshooting_with_embeddings.json"):
-    with open(json_file, "r", encoding="utf-8") as f:
-        records = json.load(f)
-
-    with driver.session() as session:
-        for rec in records:
-            session.execute_write(create_nodes_and_relationships, rec)
-
-    # After all nodes created, link related pages
-    create_related_links(records, threshold=0.75)
+    # Pages without a vector can't be related to anything
+    linked = [rec for rec in records if rec.get("vector") is not None and len(rec["vector"])]
+    if len(linked) < 2:
+        return
+    rows, cols, sims = similar_pairs([rec["vector"] for rec in linked], threshold)
+    edges = [
+        {"url1": linked[i]["url"], "url2": linked[j]["url"], "sim": float(sim)}
+        for i, j, sim in zip(rows, cols, sims)
+    ]
+
+    async with driver.session() as session:
+        for start in range(0, len(edges), EDGE_BATCH_SIZE):
+            result = await session.run("""
+                UNWIND $edges AS e
+                MATCH (p1:Page {url: e.url1}), (p2:Page {url: e.url2})
+                MERGE (p1)-[r:RELATED_TO]-(p2)
+                SET r.similarity = e.sim
+            """, edges=edges[start:start + EDGE_BATCH_SIZE])
+            await result.consume()
+
+async def load_data(json_file="troubleshooting_with_embeddings.json"):
+    vectors = load_vectors(json_file)
+    # Only url + vector outlive their batch; page bodies are dropped once written.
+    # Vectors are kept as float32 arrays (4 bytes per component instead of a
+    # boxed Python float), so the similarity pass just stacks them.
+    pages = []
+
+    def batches():
+        for batch in iter_batches(iter_records(json_file), BATCH_SIZE):
+            attach_vectors(batch, vectors)
+            for rec in batch:
+                # Repeated keywords would only re-MERGE the same edge
+                rec["keywords"] = list(dict.fromkeys(rec.get("keywords") or ()))
+            pages.extend(
+                {"url": rec["url"], "vector": np.asarray(rec["vector"], dtype=np.float32)}
+                for rec in batch if rec.get("vector")
+            )
+            yield batch
+
+    # Closed on exit, so a long-running caller doesn't leak the pool's sockets
+    async with AsyncGraphDatabase.driver(
+        NEO4J_URI,
+        auth=(NEO4J_USER, NEO4J_PASSWORD),
+        max_connection_pool_size=POOL_SIZE,
+        connection_acquisition_timeout=60,
+        fetch_size=10000,
+        max_transaction_retry_time=WRITE_RETRY_SECONDS
+    ) as driver:
+        # Must exist before the shards MERGE concurrently, or they can create duplicates
+        await create_constraints(driver)
+        # Shared nodes are created once, sequentially, so shards only MATCH them
+        await create_shared_nodes(driver, json_file)
+
+        # Parsing the next batch overlaps with the other shards' writes
+        shared_batches = batches()
+        write = stage_records if USE_APOC else create_nodes_and_relationships
+        await asyncio.gather(*(ingest_shard(driver, shared_batches, write) for _ in range(INGEST_SHARDS)))
+        if USE_APOC:
+            await merge_staged_records(driver)
+
+        # After all nodes created, link related pages
+        await create_related_links(driver, pages, threshold=0.75)
 
     print("✅ Data successfully loaded with relationships!")
 
 if __name__ == "__main__":
-    load_data()
+    asyncio.run(load_data())
 
 
 
@@ -1,10 +1,20 @@
 # remotelock_knowledge_graph_builder.py
-import json
 import re
 from typing import List, Dict, Set
 from neo4j import GraphDatabase
+from neo4j.exceptions import Neo4jError
 from sentence_transformers import SentenceTransformer
 import numpy as np
+try:
+    from .embedded_nodes import load_embedded_nodes
+except ImportError:
+    # Run as a script from inside backend/app
+    from embedded_nodes import load_embedded_nodes
+try:
+    from .vector_index import create_page_vector_index
+except ImportError:
+    # Run as a script from inside backend/app
+    from vector_index import create_page_vector_index
 
 # Neo4j Configuration
 NEO4J_URI = "bolt://localhost:7687"
@@ -35,8 +45,8 @@ class KnowledgeGraphBuilder:
                 session.run("DROP CONSTRAINT page_url IF EXISTS")
                 session.run("DROP CONSTRAINT category_name IF EXISTS")
                 session.run("DROP CONSTRAINT subcategory_name IF EXISTS")
-            except:
-                pass
+            except Neo4jError as e:
+                print(f"Error dropping constraints (may not exist): {e}")
             
             # Create constraints
             session.run("""
@@ -58,22 +68,16 @@ class KnowledgeGraphBuilder:
             session.run("CREATE INDEX page_title IF NOT EXISTS FOR (p:Page) ON (p.title)")
             session.run("CREATE INDEX page_slug IF NOT EXISTS FOR (p:Page) ON (p.slug)")
             session.run("CREATE INDEX category_name_idx IF NOT EXISTS FOR (c:Category) ON (c.name)")
+
+            # Full-text index so keyword lookups don't scan every Page's content
+            session.run("CREATE FULLTEXT INDEX page_content_fulltext IF NOT EXISTS FOR (p:Page) ON EACH [p.title, p.content]")
             
             # Create vector index for semantic search (Neo4j 5.11+)
             # Updated to 768 dimensions for Gemini API embeddings (text-embedding-004)
             try:
-                session.run("""
-                    CREATE VECTOR INDEX page_embeddings IF NOT EXISTS
-                    FOR (p:Page) ON (p.embedding)
-                    OPTIONS {
-                        indexConfig: {
-                            `vector.dimensions`: 768,
-                            `vector.similarity_function`: 'cosine'
-                        }
-                    }
-                """)
-                print("Vector index created successfully (768 dimensions)")
-            except Exception as e:
+                quantized = create_page_vector_index(session)
+                print(f"Vector index created successfully (768 dimensions, {'int8-quantized' if quantized else 'without quantization'})")
+            except Neo4jError as e:
                 print(f"Vector index creation skipped: {e}")
             
             print("Schema created successfully")
@@ -122,8 +126,8 @@ class KnowledgeGraphBuilder:
     
     def calculate_similarity(self, emb1: List[float], emb2: List[float]) -> float:
         """Calculate cosine similarity between two embeddings"""
-        arr1 = np.array(emb1)
-        arr2 = np.array(emb2)
+        arr1 = np.asarray(emb1, dtype=np.float32)
+        arr2 = np.asarray(emb2, dtype=np.float32)
         return float(np.dot(arr1, arr2) / (np.linalg.norm(arr1) * np.linalg.norm(arr2)))
     
     def create_page_node(self, node: Dict):
@@ -309,35 +313,18 @@ class KnowledgeGraphBuilder:
     def get_statistics(self):
         """Get knowledge graph statistics"""
         with self.driver.session() as session:
-            stats = {}
-            
-            # Node counts
-            result = session.run("MATCH (p:Page) RETURN count(p) as count")
-            stats['pages'] = result.single()['count']
-            
-            result = session.run("MATCH (c:Category) RETURN count(c) as count")
-            stats['categories'] = result.single()['count']
-            
-            result = session.run("MATCH (s:Subcategory) RETURN count(s) as count")
-            stats['subcategories'] = result.single()['count']
-            
-            # Relationship counts
-            result = session.run("MATCH ()-[r:RELATED_TO]->() RETURN count(r) as count")
-            stats['semantic_relationships'] = result.single()['count']
-            
-            result = session.run("MATCH ()-[r:SHARES_KEYWORDS]->() RETURN count(r) as count")
-            stats['keyword_relationships'] = result.single()['count']
-            
-            result = session.run("MATCH ()-[r:MENTIONS_SAME_PRODUCT]->() RETURN count(r) as count")
-            stats['product_relationships'] = result.single()['count']
-            
-            result = session.run("MATCH ()-[r:TROUBLESHOOTS]->() RETURN count(r) as count")
-            stats['troubleshooting_links'] = result.single()['count']
-            
-            result = session.run("MATCH ()-[r]->() RETURN count(r) as count")
-            stats['total_relationships'] = result.single()['count']
-            
-            return stats
+            # All node and relationship counts in a single round trip
+            result = session.run("""
+                RETURN COUNT { MATCH (p:Page) } AS pages,
+                       COUNT { MATCH (c:Category) } AS categories,
+                       COUNT { MATCH (s:Subcategory) } AS subcategories,
+                       COUNT { MATCH ()-[r:RELATED_TO]->() } AS semantic_relationships,
+                       COUNT { MATCH ()-[r:SHARES_KEYWORDS]->() } AS keyword_relationships,
+                       COUNT { MATCH ()-[r:MENTIONS_SAME_PRODUCT]->() } AS product_relationships,
+                       COUNT { MATCH ()-[r:TROUBLESHOOTS]->() } AS troubleshooting_links,
+                       COUNT { MATCH ()-[r]->() } AS total_relationships
+            """)
+            return result.single().data()
 
 def main():
     print("="*70)
@@ -347,8 +334,7 @@ def main():
     # Load nodes
     print(f"\nLoading nodes from {INPUT_FILE}...")
     try:
-        with open(INPUT_FILE, "r", encoding="utf-8") as f:
-            nodes = json.load(f)
+        nodes = load_embedded_nodes(INPUT_FILE)
         print(f"Loaded {len(nodes)} nodes")
     except FileNotFoundError:
         print(f"Error: {INPUT_FILE} not found!")
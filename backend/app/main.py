@@ -24,60 +24,321 @@ os.environ.setdefault('HF_HOME', _CACHE_DIR)
 print("MAIN.PY: Cache env vars set", flush=True)
 
 import operator
+import asyncio
+import atexit
+import concurrent.futures
+import functools
+import hashlib
 import logging
+import logging.handlers
+import queue
+import re
+import sqlite3
 import threading
 import time
-from datetime import datetime
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from typing import Annotated, List, Tuple, Union, Dict, Any, TypedDict
 
+import numpy as np
+import orjson
+
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode #ToolExecutor
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, FunctionMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, FunctionMessage, ToolMessage
 from langchain_core.tools import tool
 from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import BaseModel, Field
 
 print("MAIN.PY: About to import ProductionRetriever...", flush=True)
 
-# Import your ProductionRetriever and SITEMAP_STRUCTURE from the retriever file
+# Import your ProductionRetriever and the shared sitemap loader from the retriever file
 # Use a package-relative import so this module works when run as 'app.main'
 # (uvicorn imports the module as a package: e.g. `uvicorn app.main:app`).
-from .query_with_llm_json import ProductionRetriever
+from .query_with_llm_json import ProductionRetriever, load_sitemap, load_sitemap_text
 
 print("MAIN.PY: ProductionRetriever imported successfully", flush=True)
 
 load_dotenv()
 
 # --- Logging Configuration ---
+# The retriever module already configured the root logger on import (stdout +
+# its own log file); take over those handlers rather than duplicating stdout
+root_logger = logging.getLogger()
+handlers = root_logger.handlers[:] or [logging.StreamHandler(sys.stdout)]
 # Configure logging with fallback for environments with read-only filesystems (like Render)
-handlers = [logging.StreamHandler(sys.stdout)]
 try:
     # Try to create file handler in /tmp (writable on Render)
     handlers.append(logging.FileHandler('/tmp/app_logs.log'))
 except Exception as e:
     print(f"Warning: Could not create log file, using stdout only: {e}")
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=handlers
-)
+# Request threads only enqueue records; a background listener thread does the
+# formatting and the stdout/file writes, so a slow disk never stalls a request
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+for handler in handlers:
+    root_logger.removeHandler(handler)
+    handler.setFormatter(log_formatter)
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+# No record reads the pid or thread name, so skip looking them up per record
+logging.logProcesses = False
+logging.logThreads = False
+# Per-request HTTP/Bolt chatter from client libraries isn't worth queueing
+for noisy_logger in ("httpx", "httpcore", "neo4j", "urllib3"):
+    logging.getLogger(noisy_logger).setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 # --- Configuration ---
+# Every env-derived setting is read once here at import; request handlers only
+# touch these module constants, never os.environ
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY environment variable not set.")
 
 # CORS configuration for browser-based frontends (e.g., Vercel)
 ALLOWED_ORIGINS_ENV = os.getenv("ALLOWED_ORIGINS", "")
-ALLOWED_ORIGINS = [origin.strip() for origin in ALLOWED_ORIGINS_ENV.split(",") if origin.strip()]
+# A set: CORSMiddleware checks every request's Origin with `in`
+ALLOWED_ORIGINS = frozenset(origin.strip() for origin in ALLOWED_ORIGINS_ENV.split(",") if origin.strip())
+# Optional pattern for origins that can't be listed up front, e.g. r"^https://myapp-.*\.vercel\.app$" for preview deploys
+ALLOWED_ORIGIN_REGEX = os.getenv("ALLOWED_ORIGIN_REGEX") or None
+
+# Seconds a final chat answer is reused for the same (normalized) question; 0 disables
+LLM_EXACT_CACHE_TTL = int(os.getenv("LLM_EXACT_CACHE_TTL", "3600"))
+LLM_EXACT_CACHE_SIZE = 2048
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+class AnswerCache:
+    """
+    Exact-match LRU of final chat answers, keyed by the normalized question,
+    so a repeated question skips the LangGraph/Gemini pipeline entirely.
+    """
+    def __init__(self, max_size=LLM_EXACT_CACHE_SIZE, ttl=LLM_EXACT_CACHE_TTL):
+        self.entries = OrderedDict()  # {key: {"answer": str, "ts": monotonic seconds}}
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def _key(question: str) -> str:
+        normalized = _WHITESPACE_RE.sub(" ", question.strip().lower())
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def get(self, question: str):
+        if self.ttl <= 0:
+            return None
+        key = self._key(question)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry["ts"] < self.ttl:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry["answer"]
+            if entry is not None:
+                del self.entries[key]
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, question: str, answer: str):
+        if self.ttl <= 0:
+            return
+        key = self._key(question)
+        with self.lock:
+            # Monotonic: never persisted, and immune to wall-clock adjustments
+            self.entries[key] = {"answer": answer, "ts": time.monotonic()}
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / total if total else 0.0,
+            'size': len(self.entries)
+        }
+
+answer_cache = AnswerCache()
+
+# Paraphrases of an answered question ("lock won't connect to wifi" vs "my lock
+# can't join wifi") reuse its answer when their embeddings are this close
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = 1000
+# /tmp survives process restarts on Render, so a restarted worker starts warm
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "/tmp/semcache.sqlite")
+
+class SemanticAnswerCache:
+    """
+    Final chat answers keyed by question embedding. Lookup is an exact inner
+    product over unit-length float32 rows (at this size a flat scan is what an
+    ANN index would do anyway); rows are persisted to sqlite as int8 and
+    reloaded on start.
+    """
+    def __init__(self, path=SEMANTIC_CACHE_PATH, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 max_size=SEMANTIC_CACHE_SIZE, ttl=LLM_EXACT_CACHE_TTL):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+        # Ring buffer: one C-contiguous float32 block of max_size rows, allocated once,
+        # so inserts overwrite a row in place instead of re-stacking the matrix
+        self.vecs = None  # np.ndarray (max_size, dim); row i matches self.rows[i]
+        self.rows = []  # [(rowid, answer, timestamp)]
+        self.next_slot = 0  # Row to overwrite once full; always the oldest entry
+        try:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS answers_int8 (id INTEGER PRIMARY KEY, vec BLOB NOT NULL, scale REAL NOT NULL, answer TEXT NOT NULL, ts REAL NOT NULL)"
+            )
+            self._load()
+        except sqlite3.Error as e:
+            logger.warning(f"Semantic answer cache not persisted: {e}")
+            self.db = None
+
+    def _load(self):
+        cutoff = time.time() - self.ttl
+        self.db.execute("DELETE FROM answers_int8 WHERE ts < ?", (cutoff,))
+        self.db.commit()
+        loaded = self.db.execute(
+            "SELECT id, vec, scale, answer, ts FROM answers_int8 ORDER BY id DESC LIMIT ?", (self.max_size,)
+        ).fetchall()[::-1]
+        for rowid, vec, scale, answer, ts in loaded:
+            self._store(np.frombuffer(vec, dtype=np.int8) * np.float32(scale), (rowid, answer, ts))
+        if loaded:
+            logger.info(f"Semantic answer cache warmed with {len(self.rows)} answers")
+
+    def _store(self, vec: np.ndarray, row: tuple):
+        """Write one entry into the next ring slot; returns the evicted row, if any."""
+        if self.vecs is None:
+            self.vecs = np.zeros((self.max_size, len(vec)), dtype=np.float32)
+        slot, evicted = self.next_slot, None
+        if slot < len(self.rows):
+            evicted = self.rows[slot]
+            self.rows[slot] = row
+        else:
+            self.rows.append(row)
+        self.vecs[slot] = vec
+        self.next_slot = (slot + 1) % self.max_size
+        return evicted
+
+    @staticmethod
+    def _unit_vector(embedding: List[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    @staticmethod
+    def _quantize(vec: np.ndarray):
+        """int8 codes plus one scale per vector: 4x smaller on disk, ~1e-3 cosine error."""
+        scale = float(np.abs(vec).max()) / 127 or 1.0
+        return np.round(vec / scale).astype(np.int8).tobytes(), scale
+
+    def get(self, embedding: List[float]):
+        if self.ttl <= 0:
+            return None
+        with self.lock:
+            if self.rows:
+                # One BLAS matvec over the filled rows; they're unit length, so this is cosine
+                sims = self.vecs[:len(self.rows)] @ self._unit_vector(embedding)
+                best = int(np.argmax(sims))
+                _, answer, ts = self.rows[best]
+                if sims[best] >= self.threshold and time.time() - ts < self.ttl:
+                    self.stats['hits'] += 1
+                    return answer
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, embedding: List[float], answer: str):
+        if self.ttl <= 0:
+            return
+        vec = self._unit_vector(embedding)
+        ts = time.time()
+        with self.lock:
+            rowid = None
+            if self.db is not None:
+                try:
+                    codes, scale = self._quantize(vec)
+                    rowid = self.db.execute(
+                        "INSERT INTO answers_int8 (vec, scale, answer, ts) VALUES (?, ?, ?, ?)", (codes, scale, answer, ts)
+                    ).lastrowid
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to persist semantic cache entry: {e}")
+            evicted = self._store(vec, (rowid, answer, ts))
+            if evicted is not None and evicted[0] is not None and self.db is not None:
+                try:
+                    self.db.execute("DELETE FROM answers_int8 WHERE id = ?", (evicted[0],))
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to drop evicted semantic cache entry: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / total if total else 0.0,
+            'size': len(self.rows)
+        }
+
+semantic_answer_cache = SemanticAnswerCache()
+
+# Graph runs allowed to call Gemini at once; the rest wait their turn instead
+# of piling onto the quota and turning into 429 retries
+MAX_INFLIGHT_LLM = int(os.getenv("MAX_INFLIGHT_LLM", "16"))
+llm_semaphore = asyncio.Semaphore(MAX_INFLIGHT_LLM)
+# Per-client token bucket for uncached chat turns: sustained rate and burst size
+CHAT_RATE_PER_MINUTE = float(os.getenv("CHAT_RATE_PER_MINUTE", "20"))
+CHAT_BURST = int(os.getenv("CHAT_BURST", "5"))
+
+class RateLimiter:
+    """In-memory token bucket per client key, refilled continuously."""
+    def __init__(self, rate_per_minute=CHAT_RATE_PER_MINUTE, burst=CHAT_BURST, max_clients=10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = {}  # {client: (tokens, last_refill_monotonic)}
+
+    def acquire(self, client: str) -> float:
+        """Take one token; returns 0 if allowed, else seconds until a token is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        tokens, last = self.buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self.buckets[client] = (tokens, now)
+            return (1 - tokens) / self.rate
+        if len(self.buckets) >= self.max_clients and client not in self.buckets:
+            # Idle clients have refilled to a full bucket anyway; forgetting them is free
+            self.buckets = {
+                key: (t, ts) for key, (t, ts) in self.buckets.items()
+                if t + (now - ts) * self.rate < self.burst
+            }
+        self.buckets[client] = (tokens - 1, now)
+        return 0.0
+
+chat_rate_limiter = RateLimiter()
+
+def client_key(request: Request) -> str:
+    # Behind Render's proxy the socket peer is the proxy. Earlier X-Forwarded-For hops
+    # are whatever the client sent and can be rotated freely; the rightmost hop is
+    # the address Render's proxy appended itself, so that's the one to trust
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
 
 # Lazy-load retriever on first /chat request (not at startup)
 # This prevents timeout and memory issues during Render deployment
@@ -87,577 +348,116 @@ retriever_lock = threading.Lock()  # Thread-safe initialization
 
 print("MAIN.PY: Retriever will be initialized on first chat request", flush=True)
 
-SITEMAP_STRUCTURE = {
-          "site": {
-            "name": "RemoteLock Support",
-            "homepage": "https://support.remotelock.com/s/"
-          },
-          "categories": [
-            {
-              "name": "FAQs",
-              "url": "https://support.remotelock.com/s/faqs",
-              "pages": [
-                "https://support.remotelock.com/s/article/Help-with-my-Vacation-Rental-Property-Management-IntegrationFAQ",
-                "https://support.remotelock.com/s/article/Need-Help-%EF%B8%8F",
-                "https://support.remotelock.com/s/article/Unable-to-Register-Lock",
-                "https://support.remotelock.com/s/article/Lock-Offline",
-                "https://support.remotelock.com/s/article/Will-not-lock-unlock-troubleshooting",
-                "https://support.remotelock.com/s/article/Reconnecting-your-Lock-to-WiFi"
-              ]
-            },
-            {
-              "name": "Installation Guides",
-              "url": "https://support.remotelock.com/s/hardware-information",
-              "subcategories": [
-                {
-                  "name": "500 series",
-                  "url": "https://support.remotelock.com/s/500-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/500-Series-Deadbolt-Handing-the-Lock-openEDGE-Residential-Grade-5i-RG",
-                    "https://support.remotelock.com/s/article/500-Series-Lever-Hardware-Installation-openEDGE-Residential-Grade-5i-RG",
-                    "https://support.remotelock.com/s/article/DB-500R-non-connected-User-Manual",
-                    "https://support.remotelock.com/s/article/LS-DB500R-Keypad-Electronic-Lock-Remote-Control-Manual",
-                    "https://support.remotelock.com/s/article/LS-L500i-Installation-and-Local-Setup-Legacy-Wi-Fi-Locks",
-                    "https://support.remotelock.com/s/article/LS-DB500i-Installation-and-Local-Setup-Legacy-Wi-Fi-Locks",
-                    "https://support.remotelock.com/s/article/500-Series-Deadbolt-Hardware-Installation-openEDGE-Residential-Grade-5i-RG"
-                  ]
-                },
-                {
-                  "name": "600-series",
-                  "url": "https://support.remotelock.com/s/600-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/600-Series-Hardware-Installation-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/600-Series-Mortise-Latch-Installation-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/600-Series-FAQs-openEDGE-Light-Duty-Commercial-Levers-3i-BG"
-                  ]
-                },
-                {
-                  "name": "700 Series",
-                  "url": "https://support.remotelock.com/s/700-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/CG-EX-Push-Exit-Panic-Bar-Installation-Guide",
-                    "https://support.remotelock.com/s/article/OpenEdge-CG-formerly-model-7i-Installation-manual-print-version",
-                    "https://support.remotelock.com/s/article/700-Series-Mortise-Latch-Installation-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/700-Series-Mortise-latch-change-handing-instructions-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/700-Series-Hardware-Installation-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/ManualProgrammingFunctions",
-                    "https://support.remotelock.com/s/article/700-CG-7i-800-Series-Programming-Functions-and-Function-Codes"
-                  ]
-                },
-                {
-                  "name": "800 Series",
-                  "url": "https://support.remotelock.com/s/800-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/800-Series-Hardware-Installation-openEDGE-Heavy-Duty-Commercial-Lever"
-                  ]
-                },
-                {
-                  "name": "ACS",
-                  "url": "https://support.remotelock.com/s/acs",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/ACS-ACK-Troubleshooting-Guide",
-                    "https://support.remotelock.com/s/article/Relay-Safety-Sheet",
-                    "https://support.remotelock.com/s/article/Regular-ACS-Mode-Overview",
-                    "https://support.remotelock.com/s/article/Elevator-ACS-Mode-Overview",
-                    "https://support.remotelock.com/s/article/Setting-up-FAI-Fire-Alarm-Interface-Connection",
-                    "https://support.remotelock.com/s/article/Reconnecting-ACK-ACS-to-Network",
-                    "https://support.remotelock.com/s/article/Adding-Expansion-Panel-to-Existing-ACS-Install",
-                    "https://support.remotelock.com/s/article/ACS-Installation",
-                    "https://support.remotelock.com/s/article/Prior-To-ACS-Installation",
-                    "https://support.remotelock.com/s/article/ACS-Installation-Completion-Checklist",
-                    "https://support.remotelock.com/s/article/ACS-Installation-Warnings",
-                    "https://support.remotelock.com/s/article/24-Volt-Conversion-Steps",
-                    "https://support.remotelock.com/s/article/Testing-ACS-Installation",
-                    "https://support.remotelock.com/s/article/Bulk-Erase-Steps-For-First-ACS-Installation",
-                    "https://support.remotelock.com/s/article/Adding-an-ACS-Device-to-the-Remotelock-Portal-Mercury-Security-ACS-Integration",
-                    "https://support.remotelock.com/s/article/MR52-Expansion-Board-User-Manual",
-                    "https://support.remotelock.com/s/article/RemoteLock-Mobile-Key-Reader-Setup",
-                    "https://support.remotelock.com/s/article/MR52-Expansion-Panel-Wiring-Schema-for-Addressing",
-                    "https://support.remotelock.com/s/article/LP1502-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/Creating-Mobile-Key-Credentials",
-                    "https://support.remotelock.com/s/article/ACS-Technical-Documents",
-                    "https://support.remotelock.com/s/article/LP1501-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/ACS-Configuration",
-                    "https://support.remotelock.com/s/article/RemoteLock-Mobile-Key-Quick-Guide",
-                    "https://support.remotelock.com/s/article/Card-Formats-Supported-with-Mercury",
-                    "https://support.remotelock.com/s/article/RemoteLock-Korelock-MF009-Quick-Guide",
-                    "https://support.remotelock.com/s/article/Lockdown-Functionality",
-                    "https://support.remotelock.com/s/article/LP4502-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/ACS-Wire-Diagrams",
-                    "https://support.remotelock.com/s/article/MR50-Expansion-Board-User-Manual"
-                  ]
-                },
-                {
-                  "name": "Other Products",
-                  "url": "https://support.remotelock.com/s/other-products",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Kwikset-Halo-Installation-Instructions",
-                    "https://support.remotelock.com/s/article/Yale-Assure-Lock-2-Key-Free-Deadbolt-Installation-Guide",
-                    "https://support.remotelock.com/s/article/Yale-Assure-Lock-2-Keyed-Deadbolt-Installation-Guide",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Lever-Quick-Start-Guide",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Deabolt-Quick-Start-Guide",
-                    "https://support.remotelock.com/s/article/Turno-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/McGrath-Locks-NX5-User-Manual",
-                    "https://support.remotelock.com/s/article/McGrath-Locks-X3-User-Manual",
-                    "https://support.remotelock.com/s/article/McGrath-locks-Albion",
-                    "https://support.remotelock.com/s/article/PROLOK-Deluxe-Hardware-Installation-Manual",
-                    "https://support.remotelock.com/s/article/ProLok-Slimline-User-Manual",
-                    "https://support.remotelock.com/s/article/ProLok-Slimline-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/3500-Lever-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/3500-Deadbolt-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/LS-P50-User-Manual-and-Provisioning-Guide-Power-Plug",
-                    "https://support.remotelock.com/s/article/RemoteLock-model-6i-Installation",
-                    "https://support.remotelock.com/s/article/Power-Plugs",
-                    "https://support.remotelock.com/s/article/LS-90i-Local-Programming-and-Operation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-90i-Installation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-60i-Local-Programming-and-Operation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-60i-Installation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/Types-of-Smart-Cards-Prox-Cards"
-                  ]
-                },
-                {
-                  "name": "ResortLocks",
-                  "url": "https://support.remotelock.com/s/resortlocks",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/LSRL-1-Wire-Software-Manual-Legacy-ResortLock-Desktop-Software",
-                    "https://support.remotelock.com/s/article/ResortLock-FAQs-and-Troubleshooting-Guide",
-                    "https://support.remotelock.com/s/article/RL2000-Installation-and-Local-Setup-ResortLock",
-                    "https://support.remotelock.com/s/article/RL4000-Installation-and-Local-Setup-ResortLock",
-                    "https://support.remotelock.com/s/article/Thermostats"
-                  ]
-                }
-              ]
-            },
-            {
-              "name": "Contact Support",
-              "url": "https://support.remotelock.com/s/article/Contact-Support",
-              "pages": [
-                "https://support.remotelock.com/s/article/Contact-Support",
-                "https://support.remotelock.com/s/article/Feature-Request-Suggestions",
-                "https://support.remotelock.com/s/article/Warranty-and-Returns-Information",
-                "https://support.remotelock.com/s/article/Transfer-of-Ownership",
-                "https://support.remotelock.com/s/article/Blocking-a-ReadyPIN"
-              ]
-            },
-            {
-              "name": "Getting Started",
-              "url": "https://support.remotelock.com/s/getting-started",
-              "pages": [
-                "https://support.remotelock.com/s/article/IMPORTANT-WiFi-Heartbeat-Interval-Explained",
-                "https://support.remotelock.com/s/article/Account-Creation",
-                "https://support.remotelock.com/s/article/RemoteLock-Onboarding-Quick-Start-Guide",
-                "https://support.remotelock.com/s/article/Device-Registration",
-                "https://support.remotelock.com/s/article/RemoteLock-Mobile-App-Overview",
-                "https://support.remotelock.com/s/article/RemoteLock-Software-Overview",
-                "https://support.remotelock.com/s/article/WiFi-Provisioning-Guide",
-                "https://support.remotelock.com/s/article/Connecting-Your-Lock-to-WiFi",
-                "https://support.remotelock.com/s/article/RemoteLock-Internet-Connection-Setup-Guide",
-                "https://support.remotelock.com/s/article/EDGEstate-by-RemoteLock-The-NEW-Connect-Portal",
-                "https://support.remotelock.com/s/article/Getting-Started-Video"
-              ]
-            },
-            {
-              "name": "RemoteLock Portal",
-              "url": "https://support.remotelock.com/s/remotelockportal",
-              "subcategories": [
-                {
-                  "name": "Billing",
-                  "url": "https://support.remotelock.com/s/billing",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Billing-FAQs",
-                    "https://support.remotelock.com/s/article/EdgeState-Accounts-in-Grace-Period",
-                    "https://support.remotelock.com/s/article/Payment-Token-Instructions-Prepaid-billing"
-                  ]
-                },
-                {
-                  "name": "Device Management",
-                  "url": "https://support.remotelock.com/s/device-management",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/TrueSecure-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Dusaw-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Resideo-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/SmartThings-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Kwikset-Halo-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Schlage-Engage-Device-Commissioning-Offline-Devices",
-                    "https://support.remotelock.com/s/article/ResortLock-Lock-Management",
-                    "https://support.remotelock.com/s/article/Door-Locks-Overview",
-                    "https://support.remotelock.com/s/article/Device-Settings",
-                    "https://support.remotelock.com/s/article/Door-Groups",
-                    "https://support.remotelock.com/s/article/Device-Schedules-Explanations-and-Use-Cases",
-                    "https://support.remotelock.com/s/article/Common-Door-Function",
-                    "https://support.remotelock.com/s/article/360043010831-Replacing-your-RemoteLock-from-the-Device-Settings-page"
-                  ]
-                },
-                {
-                  "name": "Access User Management",
-                  "url": "https://support.remotelock.com/s/access-user-management",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/RemoteLock-Resident-App",
-                    "https://support.remotelock.com/s/article/Entry-App-by-RemoteLock",
-                    "https://support.remotelock.com/s/article/Access-Guests-and-Users",
-                    "https://support.remotelock.com/s/article/Legacy-Smart-Card-Management-Enrolling-MIFARE-Cards-Fobs",
-                    "https://support.remotelock.com/s/article/Access-Schedules-and-Access-Exceptions",
-                    "https://support.remotelock.com/s/article/Devices-Access",
-                    "https://support.remotelock.com/s/article/Guest-Email-Template",
-                    "https://support.remotelock.com/s/article/Guest-Email-Template-Formatting",
-                    "https://support.remotelock.com/s/article/ResortLock-Guest-Codes",
-                    "https://support.remotelock.com/s/article/Guest-Email-and-Message-Time-Scheduling",
-                    "https://support.remotelock.com/s/article/Access",
-                    "https://support.remotelock.com/s/article/CSV-Bulk-Import-Access-Users",
-                    "https://support.remotelock.com/s/article/Adding-a-LOCAL-user-code-to-the-lock",
-                    "https://support.remotelock.com/s/article/Entry-App-settings-and-configuration-web-portal",
-                    "https://support.remotelock.com/s/article/Mass-Access-Assignment",
-                    "https://support.remotelock.com/s/article/Adding-Door-Access-to-a-Guest-or-User"
-                  ]
-                },
-                {
-                  "name": "Account Management",
-                  "url": "https://support.remotelock.com/s/account-management-sub",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Account-Settings",
-                    "https://support.remotelock.com/s/article/Events-explanation",
-                    "https://support.remotelock.com/s/article/Reports",
-                    "https://support.remotelock.com/s/article/Notifications-and-how-they-work",
-                    "https://support.remotelock.com/s/article/Members-and-Roles",
-                    "https://support.remotelock.com/s/article/Account-Management-Menu",
-                    "https://support.remotelock.com/s/article/Notifications",
-                    "https://support.remotelock.com/s/article/ResortLock-Dashboard",
-                    "https://support.remotelock.com/s/article/Permissions-Explanation-Members-and-Roles",
-                    "https://support.remotelock.com/s/article/Using-Shared-Device",
-                    "https://support.remotelock.com/s/article/Using-Shared-Account",
-                    "https://support.remotelock.com/s/article/Automated-Email-Status",
-                    "https://support.remotelock.com/s/article/Two-Factor-Authentication",
-                    "https://support.remotelock.com/s/article/Exporting-Users-and-Devices",
-                    "https://support.remotelock.com/s/article/Dashboard-Health-Bar-and-Icon-meanings",
-                    "https://support.remotelock.com/s/article/Locations",
-                    "https://support.remotelock.com/s/article/Reset-Password-options-My-Account"
-                  ]
-                },
-                {
-                  "name": "Partner Integration",
-                  "url": "https://support.remotelock.com/s/partner-integrations",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Mews-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Track-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/ChargeAutomation-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Schlage-Engage-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Schlage-Engage-Device-Commissioning-Instructions-Schlage-RC-RCK",
-                    "https://support.remotelock.com/s/article/Schlage-Engage-Access-and-Device-Management-Offline",
-                    "https://support.remotelock.com/s/article/igloohome-Integration-Beta",
-                    "https://support.remotelock.com/s/article/igloohome-Integration",
-                    "https://support.remotelock.com/s/article/RealPage-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/RoomRaccoon-RemoteLock-integration",
-                    "https://support.remotelock.com/s/article/Zeevou-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Smoobu-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/KeyInCode-KoreLine",
-                    "https://support.remotelock.com/s/article/Chekin-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Bookerville-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Beds24-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Whistle-legacy-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Hostaway-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/AppFolio-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Hostify-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/RentManager",
-                    "https://support.remotelock.com/s/article/Stayntouch-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Yale-Home-RemoteLock-Integration-migration-from-Yale-Access-to-Yale-Home",
-                    "https://support.remotelock.com/s/article/August-Lock-Integration",
-                    "https://support.remotelock.com/s/article/innRoad-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Padsplit-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/SuiteOp-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Yardi-Voyager-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/ThinkReservations-and-RemoteLock-Integration-PART-1",
-                    "https://support.remotelock.com/s/article/TIDY-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/BookingAutomation-and-RemoteLock-integration",
-                    "https://support.remotelock.com/s/article/ResortData-Processing-part1",
-                    "https://support.remotelock.com/s/article/Resort-Data-Processing-RDP-and-RemoteLock-integration-part2",
-                    "https://support.remotelock.com/s/article/Hospitable-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Guesty-Integration-Overview-and-Instructions",
-                    "https://support.remotelock.com/s/article/TTLock-Integration",
-                    "https://support.remotelock.com/s/article/Escapia-Integration",
-                    "https://support.remotelock.com/s/article/Airbnb-Integration",
-                    "https://support.remotelock.com/s/article/Vacation-Rental-Integrations-Guest-access-notifications",
-                    "https://support.remotelock.com/s/article/Vacation-Rental-Integrations-Deactivation",
-                    "https://support.remotelock.com/s/article/Vera-and-MiOS-Integration-overview",
-                    "https://support.remotelock.com/s/article/Airbnb-Messaging-System",
-                    "https://support.remotelock.com/s/article/HomeAway-VRBO-Integration",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Integration-Overview",
-                    "https://support.remotelock.com/s/article/Updating-Guesty-API-Credentials",
-                    "https://support.remotelock.com/s/article/iCal-Feed-Integrations",
-                    "https://support.remotelock.com/s/article/ResNexus-and-RemoteLock-Integration-Overview",
-                    "https://support.remotelock.com/s/article/August-Lock-Pairing",
-                    "https://support.remotelock.com/s/article/Akia-integration-with-RemoteLock",
-                    "https://support.remotelock.com/s/article/Airbnb-to-remove-Guest-Email-feature-use-Messaging-only",
-                    "https://support.remotelock.com/s/article/Streamline-V1-Integration-Overview",
-                    "https://support.remotelock.com/s/article/Streamline-VRS-Integration-Process",
-                    "https://support.remotelock.com/s/article/CourtReserve-Integration",
-                    "https://support.remotelock.com/s/article/Pynwheel-Integration-with-RemoteLock-Overview",
-                    "https://support.remotelock.com/s/article/Using-Guesty-s-Keycode-and-Automated-Messaging",
-                    "https://support.remotelock.com/s/article/Lodgix-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Vacation-Rental-Integrations-Associating-Doors",
-                    "https://support.remotelock.com/s/article/TripAngle-BookingWithEase-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/OwnerRez-Integration-Process",
-                    "https://support.remotelock.com/s/article/iTrip-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Partner-Integrations",
-                    "https://support.remotelock.com/s/article/Ring-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/NewBook-Integration-Overview-and-Instructions",
-                    "https://support.remotelock.com/s/article/Hostfully-Integration-with-RemoteLock"
-                  ]
-                }
-              ]
-            },
-            {
-              "name": "Troubleshooting",
-              "url": "https://support.remotelock.com/s/troubleshooting",
-              "subcategories": [
-                {
-                  "name": "General",
-                  "url": "https://support.remotelock.com/s/general",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Device-Registration-Issues-Troubleshooting-and-Self-Help",
-                    "https://support.remotelock.com/s/article/Need-Help",
-                    "https://support.remotelock.com/s/article/Help-with-my-Vacation-Rental-Property-Management-Integration",
-                    "https://support.remotelock.com/s/article/Will-not-lock-unlock",
-                    "https://support.remotelock.com/s/article/Unable-to-Register-Lock-TS",
-                    "https://support.remotelock.com/s/article/Troubleshooting-and-Best-Practices",
-                    "https://support.remotelock.com/s/article/Lock-Flashing-Lights-and-Beeps-Meanings",
-                    "https://support.remotelock.com/s/article/Spindle-Test"
-                  ]
-                },
-                {
-                  "name": "Legacy Product Troubleshooting",
-                  "url": "https://support.remotelock.com/s/legacy-product-troubleshooting",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Lock-Grease",
-                    "https://support.remotelock.com/s/article/Mortise-Latch-Installation-for-lock-models-RL4000-LS6i-LS6000i",
-                    "https://support.remotelock.com/s/article/ResortLock-RL-4000-LS-6i-LS1500-Keypad-Replacement",
-                    "https://support.remotelock.com/s/article/RemoteLock-V0-to-V1-Migration-Guide"
-                  ]
-                },
-                {
-                  "name": "WiFi Connectivity Troubleshooting",
-                  "url": "https://support.remotelock.com/s/wifi-connectivity-troubleshooting",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Lock-Offline-ts",
-                    "https://support.remotelock.com/s/article/Legacy-Device-Wi-Fi-Setup-Provisioning-Guide",
-                    "https://support.remotelock.com/s/article/WiFi-Troubleshooting-Connectivity-Issues-Reprogramming-and-other-Network-information",
-                    "https://support.remotelock.com/s/article/RouteThis-Overview",
-                    "https://support.remotelock.com/s/article/WiFi-Connectivity-Best-Practices",
-                    "https://support.remotelock.com/s/article/Using-the-Mobile-App-to-Connect-your-Lock-to-Wi-Fi",
-                    "https://support.remotelock.com/s/article/OpenEdge-Troubleshooting-Codes"
-                  ]
-                },
-                {
-                  "name": "600 Series Troubleshooting",
-                  "url": "https://support.remotelock.com/s/600-series-troubleshooting",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Tailpiece-Driven-Hub-Troubleshooting-KIC-4000-5000-Series",
-                    "https://support.remotelock.com/s/article/600-Series-Motor-Replacement-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/Battery-Drain-Issues"
-                  ]
-                },
-                {
-                  "name": "500 Series Troubleshooting",
-                  "url": "https://support.remotelock.com/s/500-series-troubleshooting",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Snapback-Issues",
-                    "https://support.remotelock.com/s/article/500-Series-OpenEdge-Deadbolt-5i-RG-Replace-Motor",
-                    "https://support.remotelock.com/s/article/500-Series-OpenEdge-Deadbolt-5i-RG-Tailpiece-Orientation",
-                    "https://support.remotelock.com/s/article/500-Series-OpenEdge-5i-RG-Replace-Keypad"
-                  ]
-                }
-              ]
-            },
-            {
-              "name": "General Information",
-              "url": "https://support.remotelock.com/s/general-information",
-              "pages": [
-                "https://support.remotelock.com/s/article/Contact-Support",
-                "https://support.remotelock.com/s/article/Feature-Request-Suggestions",
-                "https://support.remotelock.com/s/article/Warranty-and-Returns-Information",
-                "https://support.remotelock.com/s/article/Transfer-of-Ownership",
-                "https://support.remotelock.com/s/article/Blocking-a-ReadyPIN",
-                "https://support.remotelock.com/s/article/New-RemoteLock-Features-Update-as-of-9-25-18",
-                "https://support.remotelock.com/s/article/How-to-update-your-customer-satisfaction-rating"
-              ]
-            },
-            {
-              "name": "Hardware Information",
-              "url": "https://support.remotelock.com/s/hardware-information",
-              "subcategories": [
-                {
-                  "name": "500 series",
-                  "url": "https://support.remotelock.com/s/500-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/500-Series-Deadbolt-Handing-the-Lock-openEDGE-Residential-Grade-5i-RG",
-                    "https://support.remotelock.com/s/article/500-Series-Lever-Hardware-Installation-openEDGE-Residential-Grade-5i-RG",
-                    "https://support.remotelock.com/s/article/DB-500R-non-connected-User-Manual",
-                    "https://support.remotelock.com/s/article/LS-DB500R-Keypad-Electronic-Lock-Remote-Control-Manual",
-                    "https://support.remotelock.com/s/article/LS-L500i-Installation-and-Local-Setup-Legacy-Wi-Fi-Locks",
-                    "https://support.remotelock.com/s/article/LS-DB500i-Installation-and-Local-Setup-Legacy-Wi-Fi-Locks",
-                    "https://support.remotelock.com/s/article/500-Series-Deadbolt-Hardware-Installation-openEDGE-Residential-Grade-5i-RG"
-                  ]
-                },
-                {
-                  "name": "600-series",
-                  "url": "https://support.remotelock.com/s/600-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/600-Series-Hardware-Installation-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/600-Series-Mortise-Latch-Installation-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/600-Series-FAQs-openEDGE-Light-Duty-Commercial-Levers-3i-BG"
-                  ]
-                },
-                {
-                  "name": "700 Series",
-                  "url": "https://support.remotelock.com/s/700-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/CG-EX-Push-Exit-Panic-Bar-Installation-Guide",
-                    "https://support.remotelock.com/s/article/OpenEdge-CG-formerly-model-7i-Installation-manual-print-version",
-                    "https://support.remotelock.com/s/article/700-Series-Mortise-Latch-Installation-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/700-Series-Mortise-latch-change-handing-instructions-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/700-Series-Hardware-Installation-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/ManualProgrammingFunctions",
-                    "https://support.remotelock.com/s/article/700-CG-7i-800-Series-Programming-Functions-and-Function-Codes"
-                  ]
-                },
-                {
-                  "name": "800 Series",
-                  "url": "https://support.remotelock.com/s/800-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/800-Series-Hardware-Installation-openEDGE-Heavy-Duty-Commercial-Lever"
-                  ]
-                },
-                {
-                  "name": "ACS",
-                  "url": "https://support.remotelock.com/s/acs",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/ACS-ACK-Troubleshooting-Guide",
-                    "https://support.remotelock.com/s/article/Relay-Safety-Sheet",
-                    "https://support.remotelock.com/s/article/Regular-ACS-Mode-Overview",
-                    "https://support.remotelock.com/s/article/Elevator-ACS-Mode-Overview",
-                    "https://support.remotelock.com/s/article/Setting-up-FAI-Fire-Alarm-Interface-Connection",
-                    "https://support.remotelock.com/s/article/Reconnecting-ACK-ACS-to-Network",
-                    "https://support.remotelock.com/s/article/Adding-Expansion-Panel-to-Existing-ACS-Install",
-                    "https://support.remotelock.com/s/article/ACS-Installation",
-                    "https://support.remotelock.com/s/article/Prior-To-ACS-Installation",
-                    "https://support.remotelock.com/s/article/ACS-Installation-Completion-Checklist",
-                    "https://support.remotelock.com/s/article/ACS-Installation-Warnings",
-                    "https://support.remotelock.com/s/article/24-Volt-Conversion-Steps",
-                    "https://support.remotelock.com/s/article/Testing-ACS-Installation",
-                    "https://support.remotelock.com/s/article/Bulk-Erase-Steps-For-First-ACS-Installation",
-                    "https://support.remotelock.com/s/article/Adding-an-ACS-Device-to-the-Remotelock-Portal-Mercury-Security-ACS-Integration",
-                    "https://support.remotelock.com/s/article/MR52-Expansion-Board-User-Manual",
-                    "https://support.remotelock.com/s/article/RemoteLock-Mobile-Key-Reader-Setup",
-                    "https://support.remotelock.com/s/article/MR52-Expansion-Panel-Wiring-Schema-for-Addressing",
-                    "https://support.remotelock.com/s/article/LP1502-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/Creating-Mobile-Key-Credentials",
-                    "https://support.remotelock.com/s/article/ACS-Technical-Documents",
-                    "https://support.remotelock.com/s/article/LP1501-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/ACS-Configuration",
-                    "https://support.remotelock.com/s/article/RemoteLock-Mobile-Key-Quick-Guide",
-                    "https://support.remotelock.com/s/article/Card-Formats-Supported-with-Mercury",
-                    "https://support.remotelock.com/s/article/RemoteLock-Korelock-MF009-Quick-Guide",
-                    "https://support.remotelock.com/s/article/Lockdown-Functionality",
-                    "https://support.remotelock.com/s/article/LP4502-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/ACS-Wire-Diagrams",
-                    "https://support.remotelock.com/s/article/MR50-Expansion-Board-User-Manual"
-                  ]
-                },
-                {
-                  "name": "Other Products",
-                  "url": "https://support.remotelock.com/s/other-products",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Kwikset-Halo-Installation-Instructions",
-                    "https://support.remotelock.com/s/article/Yale-Assure-Lock-2-Key-Free-Deadbolt-Installation-Guide",
-                    "https://support.remotelock.com/s/article/Yale-Assure-Lock-2-Keyed-Deadbolt-Installation-Guide",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Lever-Quick-Start-Guide",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Deabolt-Quick-Start-Guide",
-                    "https://support.remotelock.com/s/article/Turno-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/McGrath-Locks-NX5-User-Manual",
-                    "https://support.remotelock.com/s/article/McGrath-Locks-X3-User-Manual",
-                    "https://support.remotelock.com/s/article/McGrath-locks-Albion",
-                    "https://support.remotelock.com/s/article/PROLOK-Deluxe-Hardware-Installation-Manual",
-                    "https://support.remotelock.com/s/article/ProLok-Slimline-User-Manual",
-                    "https://support.remotelock.com/s/article/ProLok-Slimline-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/3500-Lever-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/3500-Deadbolt-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/LS-P50-User-Manual-and-Provisioning-Guide-Power-Plug",
-                    "https://support.remotelock.com/s/article/RemoteLock-model-6i-Installation",
-                    "https://support.remotelock.com/s/article/Power-Plugs",
-                    "https://support.remotelock.com/s/article/LS-90i-Local-Programming-and-Operation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-90i-Installation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-60i-Local-Programming-and-Operation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-60i-Installation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/Types-of-Smart-Cards-Prox-Cards"
-                  ]
-                },
-                {
-                  "name": "ResortLocks",
-                  "url": "https://support.remotelock.com/s/resortlocks",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/LSRL-1-Wire-Software-Manual-Legacy-ResortLock-Desktop-Software",
-                    "https://support.remotelock.com/s/article/ResortLock-FAQs-and-Troubleshooting-Guide",
-                    "https://support.remotelock.com/s/article/RL2000-Installation-and-Local-Setup-ResortLock",
-                    "https://support.remotelock.com/s/article/RL4000-Installation-and-Local-Setup-ResortLock",
-                    "https://support.remotelock.com/s/article/Thermostats"
-                  ]
-                }
-              ]
-            },
-            {
-              "name": "KeyInCode Information",
-              "url": "https://support.remotelock.com/s/keyincode-hardware",
-              "subcategories": [
-                {
-                  "name": "4000 Series",
-                  "url": "https://support.remotelock.com/s/4000-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/4000-Series-FAQs",
-                    "https://support.remotelock.com/s/article/4000-Series-Installation-Guide"
-                  ]
-                },
-                {
-                  "name": "5000 Series Hardware",
-                  "url": "https://support.remotelock.com/s/5000-series-hardware",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/5000-Series-Installation-Guide",
-                    "https://support.remotelock.com/s/article/5000-Series-Exit-Bar-Installation"
-                  ]
-                },
-                {
-                  "name": "6000 Series Hardware",
-                  "url": "https://support.remotelock.com/s/6000-series-hardware",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/6000-Series-Installation-Guide"
-                  ]
-                },
-                {
-                  "name": "KIC General Info",
-                  "url": "https://support.remotelock.com/s/kic-general-info",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/2500-Installation-Manual",
-                    "https://support.remotelock.com/s/article/Smart-Card-and-Fob-Enrollment",
-                    "https://support.remotelock.com/s/article/Using-Cards-Fobs-on-KeyInCode-Locks",
-                    "https://support.remotelock.com/s/article/Mortise-Latch-Change-of-Handing-Instructions",
-                    "https://support.remotelock.com/s/article/ReadyPIN-on-KeyInCode-Locks-Tutorial",
-                    "https://support.remotelock.com/s/article/Manual-Programming-Functions",
-                    "https://support.remotelock.com/s/article/Assigning-MIFARE-Cards-Fobs-to-Access-Users",
-                    "https://support.remotelock.com/s/article/Offline-Mode-Lock-Setup",
-                    "https://support.remotelock.com/s/article/Enrolling-MIFARE-Cards-Fobs"
-                  ]
-                }
-              ]
-            }
-          ]
-        }
-
 # --- Tool Definition ---
+# Retrieval results survive restarts in sqlite, so a fresh worker doesn't
+# re-query Neo4j for questions the last one already answered. Results only
+# change when the graph is re-ingested: bump RETRIEVAL_CACHE_VERSION then
+RETRIEVAL_CACHE_PATH = os.getenv("RETRIEVAL_CACHE_PATH", "/tmp/retrieval_cache.sqlite")
+RETRIEVAL_CACHE_TTL = int(os.getenv("RETRIEVAL_CACHE_TTL", "86400"))
+RETRIEVAL_CACHE_VERSION = os.getenv("RETRIEVAL_CACHE_VERSION", "1")
+
+class RetrievalDiskCache:
+    """Retriever results as orjson blobs in sqlite, keyed by normalized query and corpus version."""
+    def __init__(self, path=RETRIEVAL_CACHE_PATH, ttl=RETRIEVAL_CACHE_TTL, version=RETRIEVAL_CACHE_VERSION):
+        self.ttl = ttl
+        self.version = version
+        self.lock = threading.Lock()
+        self.db = None
+        if ttl <= 0:
+            return
+        try:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result BLOB NOT NULL, ts REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM results WHERE ts < ?", (time.time() - ttl,))
+            self.db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Retrieval results not persisted: {e}")
+            self.db = None
+
+    def _key(self, query: str) -> str:
+        normalized = _WHITESPACE_RE.sub(" ", query.strip().lower())
+        return hashlib.sha256(f"{self.version}:{normalized}".encode()).hexdigest()
+
+    def get(self, query: str):
+        if self.db is None:
+            return None
+        try:
+            with self.lock:
+                row = self.db.execute("SELECT result, ts FROM results WHERE key = ?", (self._key(query),)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Retrieval cache read failed: {e}")
+            return None
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        return orjson.loads(row[0])
+
+    def set(self, query: str, result: Dict[str, Any]):
+        if self.db is None:
+            return
+        # An empty result is more likely a Neo4j hiccup than the real answer; don't pin it for a day
+        if not result.get("all_cypher_results") and not result.get("top_5_vector_results"):
+            return
+        try:
+            blob = orjson.dumps(result, default=str)
+            with self.lock:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO results (key, result, ts) VALUES (?, ?, ?)", (self._key(query), blob, time.time())
+                )
+                self.db.commit()
+        except (sqlite3.Error, TypeError) as e:
+            logger.warning(f"Failed to persist retrieval result: {e}")
+
+retrieval_disk_cache = RetrievalDiskCache()
+
+# Retrievals currently running, by query. The retriever's L1 cache already
+# memoizes results for an hour, but only once one finishes; concurrent
+# identical questions (a trending issue) would each run the full Neo4j +
+# Gemini retrieval. Followers wait on the leader's future instead.
+inflight_retrievals: Dict[str, concurrent.futures.Future] = {}
+inflight_lock = threading.Lock()
+
+def coalesced_retrieve(query: str) -> Dict[str, Any]:
+    with inflight_lock:
+        future = inflight_retrievals.get(query)
+        is_leader = future is None
+        if is_leader:
+            future = concurrent.futures.Future()
+            inflight_retrievals[query] = future
+    if not is_leader:
+        logger.info(f"⚡ Joining in-flight retrieval for: {query}")
+        return future.result()
+
+    try:
+        result = retrieval_disk_cache.get(query)
+        if result is not None:
+            logger.info(f"⚡ Retrieval served from disk cache for: {query}")
+        else:
+            result = retriever_instance.retrieve(query)
+            retrieval_disk_cache.set(query, result)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with inflight_lock:
+            inflight_retrievals.pop(query, None)
+
+def tool_output(result: Dict[str, Any]) -> str:
+    # ToolNode would json.dumps a dict into the ToolMessage; a string passes through
+    # as-is, so serializing here with orjson skips the slower stdlib encoder.
+    # Key names stay long: the system prompt refers to them by name
+    return orjson.dumps(result, default=str).decode()
+
 # Wrap the retriever's functionality as a LangChain tool
 @tool
-def retrieve_documentation(query: str) -> Dict[str, Any]:
+def retrieve_documentation(query: str) -> str:
     """
     Retrieves documentation from the RemoteLock knowledge base using a hybrid search approach.
     It performs both Cypher graph search and vector similarity search.
-    Returns a dictionary containing:
+    Returns a JSON object containing:
     - 'all_cypher_results': All raw results from the Cypher query.
     - 'top_5_vector_results': The top 5 most relevant results from the vector search, after ranking.
     - 'hybrid_ranked_for_display': A combined and ranked list of results suitable for internal display.
@@ -668,21 +468,21 @@ def retrieve_documentation(query: str) -> Dict[str, Any]:
 
     if retriever_instance is None:
         logger.error("Retriever instance is None, cannot perform retrieval")
-        return {"error": "Retriever was not initialized due to an earlier error. Cannot perform retrieval.", "query": query}
+        return tool_output({"error": "Retriever was not initialized due to an earlier error. Cannot perform retrieval.", "query": query})
 
     try:
         # The retriever's retrieve method already returns the desired structure
-        result = retriever_instance.retrieve(query)
+        result = coalesced_retrieve(query)
         timing_tool_end = time.perf_counter()
         tool_duration = timing_tool_end - timing_tool_start
 
         logger.info(f"Retrieval successful. Cypher results: {len(result.get('all_cypher_results', []))}, Vector results: {len(result.get('top_5_vector_results', []))}")
         logger.info(f"⏱️  Total retrieve_documentation took: {tool_duration:.2f}s")
         logger.info("=" * 50)
-        return result
+        return tool_output(result)
     except Exception as e:
         logger.error(f"Error during retrieval: {e}", exc_info=True)
-        return {"error": f"Retrieval failed: {str(e)}", "query": query}
+        return tool_output({"error": f"Retrieval failed: {str(e)}", "query": query})
 
 # Tools the LLM can use
 tools = [retrieve_documentation]
@@ -696,6 +496,100 @@ class GraphState(TypedDict):
     # if the LLM's role is simply to process the `FunctionMessage` after tool execution.
     # LangGraph's ToolNode automatically adds the FunctionMessage to `messages`.
 
+# --- System Prompt ---
+# The live system prompt. Only the sitemap varies, and load_sitemap_text() hands back the same
+# string every time, so the rendered message is built once per sitemap object and reused
+def build_system_instruction(sitemap_context) -> str:
+    return (
+        "You are a helpful and knowledgeable RemoteLock customer support agent. "
+        "Your primary goal is to assist users by providing accurate, precise, and professional information "
+        "from the RemoteLock knowledge base. You have access to a tool named `retrieve_documentation` "
+        "that can search for relevant articles. "
+        "Use the provided `Sitemap Structure` to understand the available documentation topics and hierarchy. "
+        "This helps you determine if a query is related to an existing document or category and guides your search. "
+        "Prioritize using the `retrieve_documentation` tool when the user's question clearly asks for information "
+        "that would be found in a support article, installation guide, troubleshooting step, or product information. "
+        "Examples of when to use the tool: 'How do I install...', 'Troubleshoot my lock...', 'What is a 500 series...', "
+        "'Information about the ACS integration...', 'Tell me about the Kwikset Halo...', 'Where can I find user manuals?'.\n\n"
+        "IMPORTANT BEHAVIORAL RULES - When to Use vs. Avoid Using the Tool:\n"
+        "- **GENERAL/CATEGORY Requests** (e.g., 'Troubleshooting', 'I need help with troubleshooting', 'Tell me about integrations', "
+        "  'Help with billing', or any popular topic button click): **DO NOT call the retrieve_documentation tool**. "
+        "  Instead, list 5-8 relevant subtopics from the provided Sitemap Structure that fall under that category. "
+        "  **CRITICAL: You MUST ONLY suggest subtopics that exist in the Sitemap Structure provided below. DO NOT create, invent, or suggest any topics that are not explicitly listed in the sitemap.** "
+        "  Format your response as a brief greeting followed by a numbered list of subtopics, then ask: 'Which one should we focus on?'. "
+        "  **FORMATTING REQUIREMENT: Start the numbered list on a NEW LINE after your greeting. Use this exact format:**\n"
+        "  'Hello! I can help you with [topic]. Here are some subtopics you might find useful:\\n\\n1. First subtopic\\n2. Second subtopic\\n3. Third subtopic\\n\\nWhich one should we focus on?'\n"
+        "  Keep this response concise and focused on navigation.\n"
+        "- **SPECIFIC/ACTIONABLE Questions** (e.g., 'How do I reset a Kwikset Halo lock?', 'Why is my lock flashing red?', "
+        "  'What does pending wakeup mean?'): **Call the retrieve_documentation tool ONCE**. "
+        "  Format your response with: (1) A one-sentence summary, (2) Numbered steps if applicable, (3) References section with titles and URLs from retrieved content. "
+        "  Be direct and actionable.\n"
+        "- If a user selects a subtopic from your list or clarifies their intent, treat the follow-up as a SPECIFIC question and retrieve.\n\n"
+        "When you receive a response from the `retrieve_documentation` tool, follow these steps to reason and generate your output:\n"
+        "1.  **Thoroughly Review All Retrieved Content:** Examine both `all_cypher_results` and `top_5_vector_results`. "
+        "    Read through the full content of the retrieved documents, not just their titles or snippets, to understand the context fully. "
+        "    Pay close attention to the `cypher` results first, as they often provide more direct and structured information.\n"
+        "2.  **Prioritize Cypher Results for Direct Answers & Direct Links:** If `all_cypher_results` contain precise, fact-based answers, "
+        "    or highly relevant sections that directly address the user's question, prioritize this information. "
+        "    **Special Case for Direct Redirects:** If a `cypher` result has exceptionally high similarity to the user's prompt "
+        "    and its content primarily consists of a link or a directive to 'Click here to be directed through troubleshooting' (or similar), "
+        "    **immediately provide that specific internal link** as the primary answer, explaining that it will direct them to the detailed steps. "
+        "    For example, if the content is 'Click here to be directed through troubleshooting 👇' and it's from a highly relevant page, "
+        "    directly output: 'It looks like the best resource for that is a dedicated troubleshooting guide. Please click here: [URL from page_content]'.\n"
+        "3.  **Integrate Vector Results for Semantic Relevance:** If `cypher` results are less direct or if `vector` results "
+        "    offer semantically similar articles that complement or further explain the user's query, integrate this information. "
+        "    Look for details in the vector results that directly answer the question, even if the cypher results were broad.\n"
+        "4.  **Reason and Extract Key Information:** Based on your comprehensive review, extract the most relevant and critical information "
+        "    that directly answers the user's question. Do not just summarize; reason about *what* the user is asking "
+        "    and *how* the retrieved content provides that answer. Focus on being simple and precise.\n"
+        "5.  **Formulate a Concise and Professional Response:** Synthesize the extracted information into a clear, professional, "
+        "    and easy-to-understand response. Avoid jargon where possible. If the retrieved content has a direct answer, "
+        "    provide it immediately.\n"
+        "6.  **Always Include the Most Relevant Link(s):** Crucially, **always include the URL(s) to the most relevant article(s)** "
+        "    from the retrieved content. If an article from `cypher` or `vector` results provides the core answer, "
+        "    its link must be provided. If multiple articles are highly relevant, you may briefly mention one or two "
+        "    and offer the user to explore others if needed. **Ensure the link is directly from the retrieved data's 'link' field or the internal link within the page_content if it's a redirect.**\n"
+        "7.  **Handle Missing Information Gracefully:** If, after a thorough review of both `cypher` and `vector` results, "
+        "    no sufficiently relevant information is found to directly answer the user's question, apologize gracefully "
+        "    and suggest alternative support channels (e.g., 'I couldn't find a direct answer to your question in our knowledge base. "
+        "    Please contact our live support for further assistance, or you can check our main support page here: [link to main support page if available from sitemap context, otherwise omit if not found in retrieved data].'). "
+        "    **DO NOT default to 'contact support' if relevant information is present in the retrieved content.**\n"
+        "8.  **Strictly Adhere to Retrieved Content:** DO NOT generate made-up information or infer details not present "
+        "    in the retrieved documentation. Your response must be strictly based on the provided content.\n\n"
+        "Sitemap Structure (for contextual understanding and suggestion generation - USE ONLY THESE TOPICS FOR SUGGESTIONS):\n"
+        f"{sitemap_context}\n"
+        "--------------------\n"
+        "Begin conversation:"
+    )
+
+_system_messages: Dict[int, SystemMessage] = {}
+
+def system_message_for(sitemap_context) -> SystemMessage:
+    key = id(sitemap_context)
+    message = _system_messages.get(key)
+    if message is None:
+        message = SystemMessage(content=build_system_instruction(sitemap_context))
+        # Logged once per build, so the prompt's size (sent on every Gemini call) is visible
+        logger.info("System prompt built: %d chars, %d bytes UTF-8", len(message.content), len(message.content.encode()))
+        _system_messages.clear()  # keep only the current sitemap's prompt
+        _system_messages[key] = message
+    return message
+
+# Messages of one graph run sent to Gemini per step. A run is one user turn, so
+# this only bites when the agent loops through many tool calls; the question
+# itself is always kept
+MAX_PROMPT_MESSAGES = int(os.getenv("MAX_PROMPT_MESSAGES", "20"))
+
+def trim_history(messages: List[BaseMessage]) -> List[BaseMessage]:
+    if len(messages) <= MAX_PROMPT_MESSAGES:
+        return messages
+    tail = messages[len(messages) - MAX_PROMPT_MESSAGES + 1:]
+    # A tool result must follow the AI message that requested it; drop any orphaned at the cut
+    start = 0
+    while start < len(tail) and isinstance(tail[start], ToolMessage):
+        start += 1
+    return [messages[0], *tail[start:]]
+
 # --- LangGraph Nodes ---
 def call_llm(state: GraphState) -> GraphState:
     """Invokes the LLM to generate a response or call a tool."""
@@ -704,9 +598,10 @@ def call_llm(state: GraphState) -> GraphState:
     logger.info("call_llm node invoked")
     messages = state["messages"]
     sitemap_context = state["sitemap"]
-    logger.debug(f"Processing {len(messages)} messages")
+    logger.debug("Processing %d messages", len(messages))
 
-    # Construct the system prompt with sitemap context.
+    # The system prompt is built by build_system_instruction and cached per sitemap (see above).
+    # Earlier revisions of the prompt, kept for reference:
     # This prompt is *crucial* for guiding the LLM's behavior and tool-calling decisions.
     # It tells the LLM to use the sitemap to understand context and when to call the tool.
     # system_instruction = (
@@ -775,80 +670,16 @@ def call_llm(state: GraphState) -> GraphState:
 #     "Begin conversation:"
 # )
 
-    system_instruction = (
-    "You are a helpful and knowledgeable RemoteLock customer support agent. "
-    "Your primary goal is to assist users by providing accurate, precise, and professional information "
-    "from the RemoteLock knowledge base. You have access to a tool named `retrieve_documentation` "
-    "that can search for relevant articles. "
-    "Use the provided `Sitemap Structure` to understand the available documentation topics and hierarchy. "
-    "This helps you determine if a query is related to an existing document or category and guides your search. "
-    "Prioritize using the `retrieve_documentation` tool when the user's question clearly asks for information "
-    "that would be found in a support article, installation guide, troubleshooting step, or product information. "
-    "Examples of when to use the tool: 'How do I install...', 'Troubleshoot my lock...', 'What is a 500 series...', "
-    "'Information about the ACS integration...', 'Tell me about the Kwikset Halo...', 'Where can I find user manuals?'.\n\n"
-    "IMPORTANT BEHAVIORAL RULES - When to Use vs. Avoid Using the Tool:\n"
-    "- **GENERAL/CATEGORY Requests** (e.g., 'Troubleshooting', 'I need help with troubleshooting', 'Tell me about integrations', "
-    "  'Help with billing', or any popular topic button click): **DO NOT call the retrieve_documentation tool**. "
-    "  Instead, list 5-8 relevant subtopics from the provided Sitemap Structure that fall under that category. "
-    "  **CRITICAL: You MUST ONLY suggest subtopics that exist in the Sitemap Structure provided below. DO NOT create, invent, or suggest any topics that are not explicitly listed in the sitemap.** "
-    "  Format your response as a brief greeting followed by a numbered list of subtopics, then ask: 'Which one should we focus on?'. "
-    "  **FORMATTING REQUIREMENT: Start the numbered list on a NEW LINE after your greeting. Use this exact format:**\n"
-    "  'Hello! I can help you with [topic]. Here are some subtopics you might find useful:\\n\\n1. First subtopic\\n2. Second subtopic\\n3. Third subtopic\\n\\nWhich one should we focus on?'\n"
-    "  Keep this response concise and focused on navigation.\n"
-    "- **SPECIFIC/ACTIONABLE Questions** (e.g., 'How do I reset a Kwikset Halo lock?', 'Why is my lock flashing red?', "
-    "  'What does pending wakeup mean?'): **Call the retrieve_documentation tool ONCE**. "
-    "  Format your response with: (1) A one-sentence summary, (2) Numbered steps if applicable, (3) References section with titles and URLs from retrieved content. "
-    "  Be direct and actionable.\n"
-    "- If a user selects a subtopic from your list or clarifies their intent, treat the follow-up as a SPECIFIC question and retrieve.\n\n"
-    "When you receive a response from the `retrieve_documentation` tool, follow these steps to reason and generate your output:\n"
-    "1.  **Thoroughly Review All Retrieved Content:** Examine both `all_cypher_results` and `top_5_vector_results`. "
-    "    Read through the full content of the retrieved documents, not just their titles or snippets, to understand the context fully. "
-    "    Pay close attention to the `cypher` results first, as they often provide more direct and structured information.\n"
-    "2.  **Prioritize Cypher Results for Direct Answers & Direct Links:** If `all_cypher_results` contain precise, fact-based answers, "
-    "    or highly relevant sections that directly address the user's question, prioritize this information. "
-    "    **Special Case for Direct Redirects:** If a `cypher` result has exceptionally high similarity to the user's prompt "
-    "    and its content primarily consists of a link or a directive to 'Click here to be directed through troubleshooting' (or similar), "
-    "    **immediately provide that specific internal link** as the primary answer, explaining that it will direct them to the detailed steps. "
-    "    For example, if the content is 'Click here to be directed through troubleshooting 👇' and it's from a highly relevant page, "
-    "    directly output: 'It looks like the best resource for that is a dedicated troubleshooting guide. Please click here: [URL from page_content]'.\n"
-    "3.  **Integrate Vector Results for Semantic Relevance:** If `cypher` results are less direct or if `vector` results "
-    "    offer semantically similar articles that complement or further explain the user's query, integrate this information. "
-    "    Look for details in the vector results that directly answer the question, even if the cypher results were broad.\n"
-    "4.  **Reason and Extract Key Information:** Based on your comprehensive review, extract the most relevant and critical information "
-    "    that directly answers the user's question. Do not just summarize; reason about *what* the user is asking "
-    "    and *how* the retrieved content provides that answer. Focus on being simple and precise.\n"
-    "5.  **Formulate a Concise and Professional Response:** Synthesize the extracted information into a clear, professional, "
-    "    and easy-to-understand response. Avoid jargon where possible. If the retrieved content has a direct answer, "
-    "    provide it immediately.\n"
-    "6.  **Always Include the Most Relevant Link(s):** Crucially, **always include the URL(s) to the most relevant article(s)** "
-    "    from the retrieved content. If an article from `cypher` or `vector` results provides the core answer, "
-    "    its link must be provided. If multiple articles are highly relevant, you may briefly mention one or two "
-    "    and offer the user to explore others if needed. **Ensure the link is directly from the retrieved data's 'link' field or the internal link within the page_content if it's a redirect.**\n"
-    "7.  **Handle Missing Information Gracefully:** If, after a thorough review of both `cypher` and `vector` results, "
-    "    no sufficiently relevant information is found to directly answer the user's question, apologize gracefully "
-    "    and suggest alternative support channels (e.g., 'I couldn't find a direct answer to your question in our knowledge base. "
-    "    Please contact our live support for further assistance, or you can check our main support page here: [link to main support page if available from sitemap context, otherwise omit if not found in retrieved data].'). "
-    "    **DO NOT default to 'contact support' if relevant information is present in the retrieved content.**\n"
-    "8.  **Strictly Adhere to Retrieved Content:** DO NOT generate made-up information or infer details not present "
-    "    in the retrieved documentation. Your response must be strictly based on the provided content.\n\n"
-    "Sitemap Structure (for contextual understanding and suggestion generation - USE ONLY THESE TOPICS FOR SUGGESTIONS):\n"
-    f"{sitemap_context}\n"
-    "--------------------\n"
-    "Begin conversation:"
-)
-
-
-
-
-
     # Ensure system prompt is only added once at the beginning of the conversation.
     # If messages are reset per API call (as in this example), it's fine to re-add.
     # For a persistent session, you'd check if the first message is already a system message.
     
     # Create the full message history to send to the LLM, including the system prompt.
-    # Gemini models often handle a system-like prompt best as the first HumanMessage or AIMessage.
-    # Using AIMessage for system role is a common pattern for Gemini within LangChain.
-    llm_messages = [AIMessage(content=system_instruction, role='system')] + messages
+    # A leading SystemMessage is sent as Gemini's system_instruction, rather than as a
+    # model turn the conversation appears to open with.
+    # One list build, no intermediate [system] list. It must stay a list: invoke()
+    # only accepts a str, PromptValue or sequence of messages, not an iterator
+    llm_messages = [system_message_for(sitemap_context), *trim_history(messages)]
 
     logger.info("Invoking LLM with tools...")
     timing_llm_start = time.perf_counter()
@@ -857,11 +688,13 @@ def call_llm(state: GraphState) -> GraphState:
         timing_llm_end = time.perf_counter()
         llm_duration = timing_llm_end - timing_llm_start
 
-        logger.info(f"⏱️  LLM API call took: {llm_duration:.2f}s")
-        logger.info(f"LLM response received. Tool calls: {len(response.tool_calls) if hasattr(response, 'tool_calls') and response.tool_calls else 0}")
+        # %-style args: runs every graph step, and logging only formats them
+        # (and counts the tool calls) when INFO is actually enabled
+        logger.info("⏱️  LLM API call took: %.2fs", llm_duration)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("LLM response received. Tool calls: %d", len(getattr(response, 'tool_calls', None) or ()))
 
-        timing_total_duration = time.perf_counter() - timing_start_total
-        logger.info(f"⏱️  Total call_llm duration: {timing_total_duration:.2f}s")
+        logger.info("⏱️  Total call_llm duration: %.2fs", time.perf_counter() - timing_start_total)
         logger.info("=" * 50)
 
         # LangGraph will use operator.add to append this response to the state's messages list.
@@ -875,11 +708,15 @@ def call_llm(state: GraphState) -> GraphState:
 # We don't need a custom `call_tool_node` function if we just use `ToolNode`.
 
 # --- LLM Setup ---
+# One client for the whole process: every chat turn reuses its pooled connection
 llm = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash", # Using flash for faster responses, can switch to pro if needed
     temperature=0.2, # Slightly less creative for support, more factual
     google_api_key=GEMINI_API_KEY,
-    convert_system_message_to_human=True # Important for LangChain's Gemini integration, treats system as human internally
+    timeout=30, # Bound a stuck call instead of holding the request open
+    max_retries=2, # The client default of 6 retries can stretch one turn past a minute
+    # SystemMessage goes out as the native system_instruction field, so it is no
+    # longer folded into the first human turn (convert_system_message_to_human)
 )
 llm_with_tools = llm.bind_tools(tools)
 
@@ -909,21 +746,70 @@ workflow.add_edge("tool", "llm")
 app_graph = workflow.compile()
 
 # --- FastAPI Application ---
+# Send one tiny request at startup so the first chat doesn't pay for the
+# Gemini client's connection and TLS setup; set LLM_WARMUP=0 to skip
+LLM_WARMUP = os.getenv("LLM_WARMUP", "1") == "1"
+# Opt-in: build the retriever in a worker thread right after startup instead of
+# on the first chat. Off by default so Render's port check and memory limits
+# still see a light process at boot
+RETRIEVER_WARMUP = os.getenv("RETRIEVER_WARMUP", "0") == "1"
+
+async def warm_up_llm():
+    timing_start = time.perf_counter()
+    try:
+        await llm.ainvoke([HumanMessage(content="ping")], max_output_tokens=1)
+        logger.info(f"⏱️  Gemini client warmed up in {time.perf_counter() - timing_start:.2f}s")
+    except Exception as e:
+        logger.warning(f"Gemini warm-up failed (first request will pay connection setup): {e}")
+
+async def warm_up_retriever():
+    try:
+        await asyncio.to_thread(ensure_retriever_initialized)
+    except Exception as e:
+        logger.warning(f"Retriever warm-up failed (first chat will retry): {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The graph above is compiled once at import and shared by every request.
+    # The retriever still initializes lazily on first use (see ensure_retriever_initialized),
+    # so startup only warms the LLM connection (and optionally the retriever), in the background
+    warmup_tasks = []
+    if LLM_WARMUP:
+        warmup_tasks.append(asyncio.create_task(warm_up_llm()))
+    if RETRIEVER_WARMUP:
+        warmup_tasks.append(asyncio.create_task(warm_up_retriever()))
+    yield
+    for task in warmup_tasks:
+        if not task.done():
+            task.cancel()
+    if retriever_instance is not None:
+        await retriever_instance.aclose()
+        logger.info("ProductionRetriever connections closed")
+
 app = FastAPI(
     title="RemoteLock Customer Support Agent",
     description="An AI-powered customer support agent for RemoteLock documentation, built with LangGraph and FastAPI.",
     version="1.0.0",
+    lifespan=lifespan,
+    # orjson encodes responses several times faster than json.dumps, with no whitespace
+    default_response_class=ORJSONResponse,
 )
 
 # Enable CORS so a deployed frontend can call the API
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS or ["*"],  # Prefer explicit origins via ALLOWED_ORIGINS env
+    allow_origin_regex=ALLOWED_ORIGIN_REGEX,
     allow_credentials=False,
-    allow_methods=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
+    max_age=86400,  # Browsers reuse a preflight result instead of repeating it per request
 )
 
+# The sitemap and article lists are repetitive JSON that gzips ~6-10x; small
+# bodies (preflights, short chat replies) are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Lazy initialization function (thread-safe)
 def ensure_retriever_initialized():
     """Initialize ProductionRetriever on first use (lazy loading with double-check locking)"""
@@ -981,6 +867,12 @@ async def health_check():
         "gemini_api_configured": GEMINI_API_KEY is not None
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the retriever is built, 503 until then (never triggers init)"""
+    ready = retriever_instance is not None
+    return ORJSONResponse({"ready": ready}, status_code=200 if ready else 503)
+
 @app.get("/cache/stats")
 async def get_cache_stats():
     """Return cache performance statistics for monitoring optimization effectiveness"""
@@ -998,9 +890,25 @@ async def get_cache_stats():
 
     try:
         stats = retriever_instance.cache.get_stats()
+        answer_stats = answer_cache.get_stats()
+        semantic_answer_stats = semantic_answer_cache.get_stats()
         return {
             "status": "ok",
             "cache_stats": {
+                "answer_cache": {
+                    "hits": answer_stats['hits'],
+                    "misses": answer_stats['misses'],
+                    "hit_rate": f"{answer_stats['hit_rate']:.2%}",
+                    "size": answer_stats['size'],
+                    "description": f"Final chat answers for repeated questions ({LLM_EXACT_CACHE_TTL}s TTL)"
+                },
+                "semantic_answer_cache": {
+                    "hits": semantic_answer_stats['hits'],
+                    "misses": semantic_answer_stats['misses'],
+                    "hit_rate": f"{semantic_answer_stats['hit_rate']:.2%}",
+                    "size": semantic_answer_stats['size'],
+                    "description": f"Final chat answers for paraphrased questions (cosine >= {SEMANTIC_CACHE_THRESHOLD})"
+                },
                 "l1_results_cache": {
                     "hits": stats['l1_hits'],
                     "misses": stats['l1_misses'],
@@ -1018,6 +926,12 @@ async def get_cache_stats():
                     "misses": stats['l3_misses'],
                     "hit_rate": f"{stats['l3_hit_rate']:.2%}",
                     "description": "Query embeddings (24 hours TTL)"
+                },
+                "semantic_results_cache": {
+                    "hits": stats['semantic_hits'],
+                    "misses": stats['semantic_misses'],
+                    "hit_rate": f"{stats['semantic_hit_rate']:.2%}",
+                    "description": "Retrieval results for paraphrased questions (1 hour TTL)"
                 }
             },
             "note": "Cache hit rates improve with repeated queries. Higher hit rates = faster responses."
@@ -1028,13 +942,13 @@ async def get_cache_stats():
             "status": "error"
         }
 
-@app.get("/sitemap/")
-async def get_sitemap():
-    """Return the sitemap structure for frontend category navigation"""
-    # Extract just the categories from SITEMAP_STRUCTURE
+@functools.lru_cache(maxsize=1)
+def sitemap_payload() -> bytes:
+    """The /sitemap/ body, flattened from the sitemap tree and encoded once per process."""
+    # Extract just the categories from the sitemap tree
     # Convert the list format to a dict format that's easier for the frontend
     sitemap_dict = {}
-    for category in SITEMAP_STRUCTURE.get("categories", []):
+    for category in load_sitemap().get("categories", []):
         category_name = category.get("name")
         if category_name:
             sitemap_dict[category_name] = {
@@ -1042,7 +956,17 @@ async def get_sitemap():
                 "subcategories": category.get("subcategories", {}),
                 "pages": category.get("pages", [])
             }
-    return sitemap_dict
+    return orjson.dumps(sitemap_dict)
+
+@app.get("/sitemap/")
+async def get_sitemap():
+    """Return the sitemap structure for frontend category navigation"""
+    # Static for the life of a deploy
+    return Response(
+        content=sitemap_payload(),
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=3600"},
+    )
 
 # Simple in-memory cache for search and article results
 search_cache = {}
@@ -1063,7 +987,7 @@ async def search_suggestions(q: str):
     # Ensure retriever is initialized (need graph connection)
     if retriever_instance is None:
         try:
-            ensure_retriever_initialized()
+            await asyncio.to_thread(ensure_retriever_initialized)
         except Exception as e:
             logger.error(f"Failed to initialize retriever: {e}")
             return {"query": q, "articles": [], "error": "Database not available"}
@@ -1079,8 +1003,7 @@ async def search_suggestions(q: str):
         LIMIT 20
         """
 
-        # Use graph.query() method
-        results = retriever_instance.graph.query(cypher, params={"query": q})
+        results = await retriever_instance.aquery(cypher, query=q)
 
         articles = []
         for record in results:
@@ -1120,7 +1043,7 @@ async def get_articles(category: str):
     # Ensure retriever is initialized (to access Neo4j connection)
     if retriever_instance is None:
         try:
-            ensure_retriever_initialized()
+            await asyncio.to_thread(ensure_retriever_initialized)
         except Exception as e:
             logger.error(f"Failed to initialize retriever: {e}")
             return {"category": category, "articles": [], "error": "Database not available"}
@@ -1140,8 +1063,7 @@ async def get_articles(category: str):
         LIMIT 50
         """
 
-        # Use graph.query() method
-        results = retriever_instance.graph.query(cypher, params={"category_name": category})
+        results = await retriever_instance.aquery(cypher, category_name=category)
 
         articles = []
         for record in results:
@@ -1168,30 +1090,75 @@ async def get_articles(category: str):
 class ChatMessage(BaseModel):
     message: str
 
-@app.post("/chat/")
-async def chat_endpoint(chat_message: ChatMessage) -> Dict[str, str]:
-    """
-    Handle incoming chat messages and generate a response using the LangGraph agent.
-    """
-    timing_request_start = time.perf_counter()
-    logger.info("=" * 70)
-    logger.info(f"📨 NEW CHAT REQUEST: {chat_message.message[:100]}...")
-    logger.info("=" * 70)
-
-    # Lazy-load retriever on first request
+async def chat_unavailable_message() -> Union[str, None]:
+    """Lazy-load the retriever on first chat request; returns a user-facing message if it can't be."""
     if retriever_instance is None:
         if retriever_initialization_error:
-            return {"response": "I'm sorry, the AI assistant is currently unavailable due to an initialization error. Please contact support."}
+            return "I'm sorry, the AI assistant is currently unavailable due to an initialization error. Please contact support."
 
         try:
-            # This will block for ~60 seconds on FIRST request only
+            # Slow on the FIRST request only; runs in a worker thread so the
+            # event loop keeps serving health checks and other requests meanwhile
             timing_init_start = time.perf_counter()
-            ensure_retriever_initialized()
+            await asyncio.to_thread(ensure_retriever_initialized)
             timing_init_end = time.perf_counter()
             logger.info(f"⏱️  Retriever initialization took: {timing_init_end - timing_init_start:.2f}s")
         except Exception as e:
             logger.error(f"Failed to initialize retriever: {e}")
-            return {"response": "Failed to initialize the AI assistant. Please try again or contact support."}
+            return "Failed to initialize the AI assistant. Please try again or contact support."
+    return None
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    # JSON-encoded so newlines inside a token can't break the SSE framing
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+SSE_DONE = b"data: [DONE]\n\n"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Keep proxies from buffering the stream
+
+# response_model=None: the return annotation would otherwise make FastAPI
+# re-validate every reply through pydantic before orjson encodes it
+@app.post("/chat/", response_model=None)
+async def chat_endpoint(chat_message: ChatMessage, request: Request) -> Dict[str, str]:
+    """
+    Handle incoming chat messages and generate a response using the LangGraph agent.
+    """
+    timing_request_start = time.perf_counter()
+    logger.info("=" * 70)
+    logger.info(f"📨 NEW CHAT REQUEST: {chat_message.message[:100]}...")
+    logger.info("=" * 70)
+
+    unavailable = await chat_unavailable_message()
+    if unavailable:
+        return {"response": unavailable}
+
+    cached_answer = answer_cache.get(chat_message.message)
+    if cached_answer is not None:
+        logger.info(f"⚡ Answer cache hit ({time.perf_counter() - timing_request_start:.3f}s)")
+        return {"response": cached_answer}
+
+    # Exact cache hits are free; anything past here spends Gemini quota
+    retry_after = chat_rate_limiter.acquire(client_key(request))
+    if retry_after > 0:
+        logger.warning(f"Rate limit hit for {client_key(request)}, retry in {retry_after:.1f}s")
+        return ORJSONResponse(
+            status_code=429,
+            content={"response": "You're sending messages too quickly. Please wait a moment and try again."},
+            headers={"Retry-After": str(int(retry_after) + 1)}
+        )
+
+    # The embedding lands in the retriever's L3 cache, so a miss here costs
+    # retrieval nothing extra
+    question_embedding = None
+    try:
+        question_embedding = await asyncio.to_thread(retriever_instance.embed_question, chat_message.message)
+    except Exception as e:
+        logger.warning(f"Semantic answer cache skipped, embedding failed: {e}")
+    if question_embedding is not None:
+        cached_answer = semantic_answer_cache.get(question_embedding)
+        if cached_answer is not None:
+            logger.info(f"⚡ Semantic answer cache hit ({time.perf_counter() - timing_request_start:.3f}s)")
+            answer_cache.set(chat_message.message, cached_answer)
+            return {"response": cached_answer}
 
     user_message = HumanMessage(content=chat_message.message)
     
@@ -1206,7 +1173,7 @@ async def chat_endpoint(chat_message: ChatMessage) -> Dict[str, str]:
 
     initial_state_for_this_turn = {
         "messages": [user_message],
-        "sitemap": SITEMAP_STRUCTURE, # Always provide sitemap to the graph state
+        "sitemap": load_sitemap_text(), # Always provide sitemap to the graph state
     }
 
     try:
@@ -1214,7 +1181,10 @@ async def chat_endpoint(chat_message: ChatMessage) -> Dict[str, str]:
         # by appending LLM responses and FunctionMessages from tool calls.
         logger.info("Invoking LangGraph agent...")
         timing_graph_start = time.perf_counter()
-        final_state = app_graph.invoke(initial_state_for_this_turn)
+        # ainvoke keeps the event loop free; LangGraph runs the sync LLM node
+        # and the retrieval tool in its executor threads.
+        async with llm_semaphore:
+            final_state = await app_graph.ainvoke(initial_state_for_this_turn)
         timing_graph_end = time.perf_counter()
         graph_duration = timing_graph_end - timing_graph_start
         logger.info(f"⏱️  LangGraph execution took: {graph_duration:.2f}s")
@@ -1230,6 +1200,17 @@ async def chat_endpoint(chat_message: ChatMessage) -> Dict[str, str]:
             else str(agent_final_response) if agent_final_response else "I couldn't generate a response."
         )
 
+        # Only clean answers are reused; a failed retrieval may succeed next time
+        tool_failed = any(
+            isinstance(message, ToolMessage)
+            and (getattr(message, "status", None) == "error" or str(message.content).startswith('{"error"'))
+            for message in final_state["messages"]
+        )
+        if isinstance(agent_final_response, AIMessage) and agent_final_response.content and not tool_failed:
+            answer_cache.set(chat_message.message, response_content)
+            if question_embedding is not None:
+                semantic_answer_cache.set(question_embedding, response_content)
+
         timing_total_request = time.perf_counter() - timing_request_start
         logger.info("=" * 70)
         logger.info(f"✅ TOTAL REQUEST TIME: {timing_total_request:.2f}s")
@@ -1240,3 +1221,60 @@ async def chat_endpoint(chat_message: ChatMessage) -> Dict[str, str]:
     except Exception as e:
         logger.error(f"Error during chat processing: {e}", exc_info=True)
         return {"response": "I'm sorry, I encountered an error. Please try again or contact support."}
+
+@app.post("/chat/stream/", response_model=None)
+async def chat_stream_endpoint(chat_message: ChatMessage, request: Request):
+    """
+    Same agent as /chat/, but the answer is streamed as Server-Sent Events while
+    Gemini generates it: `data: {"token": ...}` per chunk, then `data: [DONE]`.
+    """
+    logger.info(f"📨 NEW STREAMING CHAT REQUEST: {chat_message.message[:100]}...")
+
+    unavailable = await chat_unavailable_message()
+    cached_answer = None if unavailable else answer_cache.get(chat_message.message)
+    if unavailable or cached_answer is not None:
+        async def single_event():
+            yield sse_event({"token": unavailable or cached_answer})
+            yield SSE_DONE
+        return StreamingResponse(single_event(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    retry_after = chat_rate_limiter.acquire(client_key(request))
+    if retry_after > 0:
+        return ORJSONResponse(
+            status_code=429,
+            content={"response": "You're sending messages too quickly. Please wait a moment and try again."},
+            headers={"Retry-After": str(int(retry_after) + 1)}
+        )
+
+    initial_state_for_this_turn = {
+        "messages": [HumanMessage(content=chat_message.message)],
+        "sitemap": load_sitemap_text(),
+    }
+
+    async def stream_answer():
+        chunks = []
+        tool_failed = False
+        try:
+            async with llm_semaphore:
+                async for event in app_graph.astream_events(initial_state_for_this_turn, version="v2"):
+                    kind = event["event"]
+                    if kind == "on_tool_end":
+                        output = event["data"].get("output")
+                        tool_failed = tool_failed or str(getattr(output, "content", output)).startswith('{"error"')
+                    elif kind == "on_chat_model_stream":
+                        chunk = event["data"]["chunk"]
+                        # Tool-call chunks and non-text parts are the agent deciding, not answering
+                        if chunk.tool_call_chunks or not isinstance(chunk.content, str) or not chunk.content:
+                            continue
+                        chunks.append(chunk.content)
+                        yield sse_event({"token": chunk.content})
+        except Exception as e:
+            logger.error(f"Error during streaming chat: {e}", exc_info=True)
+            yield sse_event({"error": "I'm sorry, I encountered an error. Please try again or contact support."})
+        else:
+            answer = "".join(chunks)
+            if answer and not tool_failed:
+                answer_cache.set(chat_message.message, answer)
+        yield SSE_DONE
+
+    return StreamingResponse(stream_answer(), media_type="text/event-stream", headers=SSE_HEADERS)
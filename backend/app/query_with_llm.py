@@ -28,7 +28,6 @@ Your ONLY job is to translate natural language into Cypher queries.
 
 The knowledge graph schema:
 - (Category)-[:HAS_PAGE]->(Page)
-- (Page)-[:BELONGS_TO]->(Category)
 - (Page)-[:RELATED_TO]-(Page) {similarity: Float}
 - (Page)-[:HAS_KEYWORD]->(Keyword)
 
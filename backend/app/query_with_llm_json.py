@@ -30,6 +30,7 @@ os.environ.setdefault('HF_HOME', _CACHE_DIR)
 import re
 import json
 import logging
+import string
 import sys
 import time
 import warnings
@@ -37,6 +38,9 @@ from dotenv import load_dotenv
 from typing import List, Dict, Any, Optional
 from difflib import SequenceMatcher
 import concurrent.futures
+import functools
+import threading
+from collections import OrderedDict
 
 warnings.filterwarnings('ignore')
 load_dotenv()
@@ -50,8 +54,9 @@ try:
 except Exception as e:
     print(f"Warning: Could not create retriever log file, using stdout only: {e}")
 
+# Per-request detail logs are DEBUG; set LOG_LEVEL=WARNING in production to skip them
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=handlers
 )
@@ -65,6 +70,18 @@ logger = logging.getLogger(__name__)
 NEO4J_URI = "neo4j+s://d3db84ff.databases.neo4j.io" # This is a placeholder, replace with your actual AuraDB URI
 NEO4J_USER = "neo4j" # For AuraDB, the default user is typically 'neo4j'
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD") # Loaded from .env
+# Naming the database up front spares each session a home-database lookup round trip
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+# Each retrieve() holds up to 2 connections (Cypher + vector threads); raise under concurrent load
+NEO4J_POOL = int(os.getenv("NEO4J_POOL", "5"))
+# Threads shared by every retrieve() for its Cypher + vector searches (2 per retrieval); scale with NEO4J_POOL
+RETRIEVE_SEARCH_WORKERS = int(os.getenv("RETRIEVE_SEARCH_WORKERS", "4"))
+# Per-request timeout for the Cypher-generation LLM before giving up on it
+CYPHER_LLM_TIMEOUT = float(os.getenv("CYPHER_LLM_TIMEOUT", "10"))
+# Cypher generation model; a lighter Flash variant (e.g. gemini-2.0-flash-lite) trades accuracy for latency
+CYPHER_LLM_MODEL = os.getenv("CYPHER_LLM_MODEL", "gemini-2.5-flash")
+# Introspected graph schema, reused across restarts while the graph's node/relationship counts are unchanged
+SCHEMA_CACHE_PATH = os.getenv("SCHEMA_CACHE_PATH", ".schema_cache.json")
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
@@ -89,10 +106,24 @@ from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmb
 from langchain.chains import GraphCypherQAChain
 from langchain.prompts import PromptTemplate
 # Replaced SentenceTransformer with Gemini API embeddings to reduce memory usage (~300MB saved)
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase
+from neo4j.exceptions import ClientError
+import numpy as np
+import orjson
 import hashlib
 import time as time_module
 
+# --- Precompiled patterns for the matching/ranking hot paths ---
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+_WORD_RE = re.compile(r'\b\w+\b')
+_SIGNIFICANT_WORD_RE = re.compile(r'\b\w{3,}\b')
+_CYPHER_FENCE_RE = re.compile(r'```(?:cypher)?', re.IGNORECASE)
+
+# Words ignored when comparing a query against slugs
+_SLUG_QUERY_STOPWORDS = frozenset({'the', 'a', 'of', 'for', 'series', 'guide', 'manual'})
+_SLUG_STOPWORDS = frozenset({'the', 'a', 'of', 'for', 'series', 'openedge'})
+_KEYWORD_FALLBACK_STOPWORDS = frozenset({'the', 'and', 'for', 'how', 'what', 'does', 'with', 'my', 'can'})
+
 # --- Multi-Layer Cache for Performance Optimization ---
 class MultiLayerCache:
     """
@@ -100,35 +131,51 @@ class MultiLayerCache:
     L1: Complete results (fastest, highest hit rate)
     L2: Generated Cypher queries (fast, medium hit rate)
     L3: Query embeddings (fast, medium hit rate)
+    Semantic: Complete results keyed by question embedding, so paraphrased
+    questions ("WiFi issue" vs "problems with wifi") reuse an earlier result
     """
     def __init__(self,
                  l1_size=100, l1_ttl=3600,
                  l2_size=200, l2_ttl=7200,
-                 l3_size=300, l3_ttl=86400):
-        # L1: Complete retrieval results
-        self.results_cache = {}  # {query_hash: (result, timestamp)}
+                 l3_size=300, l3_ttl=86400,
+                 semantic_size=100, semantic_threshold=0.92):
+        # L1: Complete retrieval results, in recency order (oldest first)
+        self.results_cache = OrderedDict()  # {normalized query: (result, timestamp)}
+        self.results_lock = threading.Lock()  # Tool calls run on worker threads
         self.l1_max_size = l1_size
         self.l1_ttl = l1_ttl
 
         # L2: Cypher queries
         self.cypher_cache = {}  # {(query, hints_hash): (cypher, timestamp)}
+        self.cypher_lock = threading.Lock()  # Written from the retrieve/batch pool threads
         self.l2_max_size = l2_size
         self.l2_ttl = l2_ttl
 
         # L3: Embeddings
         self.embedding_cache = {}  # {query: (embedding, timestamp)}
+        self.embedding_lock = threading.Lock()  # Written from the retrieve/batch pool threads
         self.l3_max_size = l3_size
         self.l3_ttl = l3_ttl
 
+        # Semantic: unit-length question embeddings in a ring buffer of semantic_size rows,
+        # allocated on first insert; once full, each insert overwrites the oldest row (FIFO)
+        self.semantic_vecs = None  # np.ndarray (semantic_size, dim), row i matches semantic_entries[i]
+        self.semantic_entries = []  # [(result, timestamp)]
+        self.semantic_next_slot = 0
+        self.semantic_lock = threading.Lock()  # retrieve() runs on several threads at once
+        self.semantic_max_size = semantic_size
+        self.semantic_threshold = semantic_threshold
+
         # Stats
         self.stats = {
             'l1_hits': 0, 'l1_misses': 0,
             'l2_hits': 0, 'l2_misses': 0,
-            'l3_hits': 0, 'l3_misses': 0
+            'l3_hits': 0, 'l3_misses': 0,
+            'semantic_hits': 0, 'semantic_misses': 0
         }
 
     def _evict_oldest(self, cache, max_size):
-        """LRU eviction"""
+        """LRU eviction (caller holds the cache's lock)"""
         if len(cache) >= max_size:
             oldest_key = min(cache.keys(), key=lambda k: cache[k][1])
             del cache[oldest_key]
@@ -137,638 +184,145 @@ class MultiLayerCache:
         """Check if cache entry is still valid"""
         return (time_module.time() - timestamp) < ttl
 
-    # L1: Results Cache
+    # L1: Results Cache (true LRU on the normalized question, so case/whitespace repeats hit)
+    @staticmethod
+    def _result_key(query: str) -> str:
+        return ' '.join(query.lower().split())
+
     def get_result(self, query: str):
-        key = hashlib.md5(query.encode()).hexdigest()
-        if key in self.results_cache:
-            result, timestamp = self.results_cache[key]
-            if self._is_valid(timestamp, self.l1_ttl):
-                self.stats['l1_hits'] += 1
-                return result
-            else:
+        key = self._result_key(query)
+        with self.results_lock:
+            entry = self.results_cache.get(key)
+            if entry is not None:
+                result, timestamp = entry
+                if self._is_valid(timestamp, self.l1_ttl):
+                    self.results_cache.move_to_end(key)
+                    self.stats['l1_hits'] += 1
+                    return result
                 del self.results_cache[key]
-        self.stats['l1_misses'] += 1
-        return None
+            self.stats['l1_misses'] += 1
+            return None
 
     def set_result(self, query: str, result: Dict):
-        key = hashlib.md5(query.encode()).hexdigest()
-        self._evict_oldest(self.results_cache, self.l1_max_size)
-        self.results_cache[key] = (result, time_module.time())
+        key = self._result_key(query)
+        with self.results_lock:
+            self.results_cache[key] = (result, time_module.time())
+            self.results_cache.move_to_end(key)
+            if len(self.results_cache) > self.l1_max_size:
+                self.results_cache.popitem(last=False)  # O(1), vs. a min() scan
+
+    # L2: Cypher Cache (keyed on the normalized question, so case/whitespace repeats hit)
+    def _cypher_key(self, query: str, hints_hash: str) -> str:
+        return f"{' '.join(query.lower().split())}:{hints_hash}"
 
-    # L2: Cypher Cache
     def get_cypher(self, query: str, hints_hash: str):
-        key = f"{query}:{hints_hash}"
-        if key in self.cypher_cache:
-            cypher, timestamp = self.cypher_cache[key]
-            if self._is_valid(timestamp, self.l2_ttl):
-                self.stats['l2_hits'] += 1
-                return cypher
-            else:
+        key = self._cypher_key(query, hints_hash)
+        with self.cypher_lock:
+            entry = self.cypher_cache.get(key)
+            if entry is not None:
+                cypher, timestamp = entry
+                if self._is_valid(timestamp, self.l2_ttl):
+                    self.stats['l2_hits'] += 1
+                    return cypher
                 del self.cypher_cache[key]
-        self.stats['l2_misses'] += 1
-        return None
+            self.stats['l2_misses'] += 1
+            return None
 
     def set_cypher(self, query: str, hints_hash: str, cypher: str):
-        key = f"{query}:{hints_hash}"
-        self._evict_oldest(self.cypher_cache, self.l2_max_size)
-        self.cypher_cache[key] = (cypher, time_module.time())
+        key = self._cypher_key(query, hints_hash)
+        with self.cypher_lock:
+            self._evict_oldest(self.cypher_cache, self.l2_max_size)
+            self.cypher_cache[key] = (cypher, time_module.time())
 
     # L3: Embedding Cache
     def get_embedding(self, query: str):
-        if query in self.embedding_cache:
-            embedding, timestamp = self.embedding_cache[query]
-            if self._is_valid(timestamp, self.l3_ttl):
-                self.stats['l3_hits'] += 1
-                return embedding
-            else:
+        with self.embedding_lock:
+            entry = self.embedding_cache.get(query)
+            if entry is not None:
+                embedding, timestamp = entry
+                if self._is_valid(timestamp, self.l3_ttl):
+                    self.stats['l3_hits'] += 1
+                    return embedding
                 del self.embedding_cache[query]
-        self.stats['l3_misses'] += 1
-        return None
+            self.stats['l3_misses'] += 1
+            return None
 
     def set_embedding(self, query: str, embedding: List[float]):
-        self._evict_oldest(self.embedding_cache, self.l3_max_size)
-        self.embedding_cache[query] = (embedding, time_module.time())
+        with self.embedding_lock:
+            self._evict_oldest(self.embedding_cache, self.l3_max_size)
+            self.embedding_cache[query] = (embedding, time_module.time())
+
+    # Semantic Cache
+    def _unit_vector(self, embedding: List[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def get_similar_result(self, embedding: List[float]):
+        """Return the result of the nearest cached question if cosine >= threshold"""
+        query = self._unit_vector(embedding)
+        with self.semantic_lock:
+            if self.semantic_entries:
+                # Only the filled rows; the tail of the buffer is still zeros
+                sims = self.semantic_vecs[:len(self.semantic_entries)] @ query
+                best = int(np.argmax(sims))
+                result, timestamp = self.semantic_entries[best]
+                if sims[best] >= self.semantic_threshold and self._is_valid(timestamp, self.l1_ttl):
+                    self.stats['semantic_hits'] += 1
+                    return result
+            self.stats['semantic_misses'] += 1
+            return None
+
+    def set_similar_result(self, embedding: List[float], result: Dict):
+        vec = self._unit_vector(embedding)
+        entry = (result, time_module.time())
+        with self.semantic_lock:
+            if self.semantic_vecs is None:
+                self.semantic_vecs = np.zeros((self.semantic_max_size, len(vec)), dtype=np.float32)
+            slot = self.semantic_next_slot
+            # Row and entry are written together under the lock, so they never disagree
+            self.semantic_vecs[slot] = vec
+            if slot < len(self.semantic_entries):
+                self.semantic_entries[slot] = entry
+            else:
+                self.semantic_entries.append(entry)
+            self.semantic_next_slot = (slot + 1) % self.semantic_max_size
 
     def get_stats(self) -> Dict[str, float]:
         """Return cache hit rates"""
         l1_total = self.stats['l1_hits'] + self.stats['l1_misses']
         l2_total = self.stats['l2_hits'] + self.stats['l2_misses']
         l3_total = self.stats['l3_hits'] + self.stats['l3_misses']
+        semantic_total = self.stats['semantic_hits'] + self.stats['semantic_misses']
 
         return {
             'l1_hit_rate': self.stats['l1_hits'] / l1_total if l1_total > 0 else 0,
             'l2_hit_rate': self.stats['l2_hits'] / l2_total if l2_total > 0 else 0,
             'l3_hit_rate': self.stats['l3_hits'] / l3_total if l3_total > 0 else 0,
+            'semantic_hit_rate': self.stats['semantic_hits'] / semantic_total if semantic_total > 0 else 0,
             **self.stats
         }
 
 # --- Sitemap Loading ---
+# Category -> subcategory -> page URL tree, kept as data rather than a code literal
+SITEMAP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sitemap.json")
+
+@functools.lru_cache(maxsize=1)
+def load_sitemap() -> Dict[str, Any]:
+    """The raw sitemap tree, read from SITEMAP_FILE on first use."""
+    with open(SITEMAP_FILE, "rb") as f:
+        return orjson.loads(f.read())
+
+@functools.lru_cache(maxsize=1)
+def load_sitemap_text() -> str:
+    """The sitemap as compact JSON, serialized once for embedding in the chat prompt."""
+    return orjson.dumps(load_sitemap()).decode()
+
 def load_complete_sitemap():
     """Load sitemap and extract ALL page information for indexing and prompt context."""
     try:
-        # Use the provided sitemap structure directly
-        sitemap_data = {
-          "site": {
-            "name": "RemoteLock Support",
-            "homepage": "https://support.remotelock.com/s/"
-          },
-          "categories": [
-            {
-              "name": "FAQs",
-              "url": "https://support.remotelock.com/s/faqs",
-              "pages": [
-                "https://support.remotelock.com/s/article/Help-with-my-Vacation-Rental-Property-Management-IntegrationFAQ",
-                "https://support.remotelock.com/s/article/Need-Help-%EF%B8%8F",
-                "https://support.remotelock.com/s/article/Unable-to-Register-Lock",
-                "https://support.remotelock.com/s/article/Lock-Offline",
-                "https://support.remotelock.com/s/article/Will-not-lock-unlock-troubleshooting",
-                "https://support.remotelock.com/s/article/Reconnecting-your-Lock-to-WiFi"
-              ]
-            },
-            {
-              "name": "Installation Guides",
-              "url": "https://support.remotelock.com/s/hardware-information",
-              "subcategories": [
-                {
-                  "name": "500 series",
-                  "url": "https://support.remotelock.com/s/500-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/500-Series-Deadbolt-Handing-the-Lock-openEDGE-Residential-Grade-5i-RG",
-                    "https://support.remotelock.com/s/article/500-Series-Lever-Hardware-Installation-openEDGE-Residential-Grade-5i-RG",
-                    "https://support.remotelock.com/s/article/DB-500R-non-connected-User-Manual",
-                    "https://support.remotelock.com/s/article/LS-DB500R-Keypad-Electronic-Lock-Remote-Control-Manual",
-                    "https://support.remotelock.com/s/article/LS-L500i-Installation-and-Local-Setup-Legacy-Wi-Fi-Locks",
-                    "https://support.remotelock.com/s/article/LS-DB500i-Installation-and-Local-Setup-Legacy-Wi-Fi-Locks",
-                    "https://support.remotelock.com/s/article/500-Series-Deadbolt-Hardware-Installation-openEDGE-Residential-Grade-5i-RG"
-                  ]
-                },
-                {
-                  "name": "600-series",
-                  "url": "https://support.remotelock.com/s/600-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/600-Series-Hardware-Installation-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/600-Series-Mortise-Latch-Installation-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/600-Series-FAQs-openEDGE-Light-Duty-Commercial-Levers-3i-BG"
-                  ]
-                },
-                {
-                  "name": "700 Series",
-                  "url": "https://support.remotelock.com/s/700-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/CG-EX-Push-Exit-Panic-Bar-Installation-Guide",
-                    "https://support.remotelock.com/s/article/OpenEdge-CG-formerly-model-7i-Installation-manual-print-version",
-                    "https://support.remotelock.com/s/article/700-Series-Mortise-Latch-Installation-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/700-Series-Mortise-latch-change-handing-instructions-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/700-Series-Hardware-Installation-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/ManualProgrammingFunctions",
-                    "https://support.remotelock.com/s/article/700-CG-7i-800-Series-Programming-Functions-and-Function-Codes"
-                  ]
-                },
-                {
-                  "name": "800 Series",
-                  "url": "https://support.remotelock.com/s/800-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/800-Series-Hardware-Installation-openEDGE-Heavy-Duty-Commercial-Lever"
-                  ]
-                },
-                {
-                  "name": "ACS",
-                  "url": "https://support.remotelock.com/s/acs",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/ACS-ACK-Troubleshooting-Guide",
-                    "https://support.remotelock.com/s/article/Relay-Safety-Sheet",
-                    "https://support.remotelock.com/s/article/Regular-ACS-Mode-Overview",
-                    "https://support.remotelock.com/s/article/Elevator-ACS-Mode-Overview",
-                    "https://support.remotelock.com/s/article/Setting-up-FAI-Fire-Alarm-Interface-Connection",
-                    "https://support.remotelock.com/s/article/Reconnecting-ACK-ACS-to-Network",
-                    "https://support.remotelock.com/s/article/Adding-Expansion-Panel-to-Existing-ACS-Install",
-                    "https://support.remotelock.com/s/article/ACS-Installation",
-                    "https://support.remotelock.com/s/article/Prior-To-ACS-Installation",
-                    "https://support.remotelock.com/s/article/ACS-Installation-Completion-Checklist",
-                    "https://support.remotelock.com/s/article/ACS-Installation-Warnings",
-                    "https://support.remotelock.com/s/article/24-Volt-Conversion-Steps",
-                    "https://support.remotelock.com/s/article/Testing-ACS-Installation",
-                    "https://support.remotelock.com/s/article/Bulk-Erase-Steps-For-First-ACS-Installation",
-                    "https://support.remotelock.com/s/article/Adding-an-ACS-Device-to-the-Remotelock-Portal-Mercury-Security-ACS-Integration",
-                    "https://support.remotelock.com/s/article/MR52-Expansion-Board-User-Manual",
-                    "https://support.remotelock.com/s/article/RemoteLock-Mobile-Key-Reader-Setup",
-                    "https://support.remotelock.com/s/article/MR52-Expansion-Panel-Wiring-Schema-for-Addressing",
-                    "https://support.remotelock.com/s/article/LP1502-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/Creating-Mobile-Key-Credentials",
-                    "https://support.remotelock.com/s/article/ACS-Technical-Documents",
-                    "https://support.remotelock.com/s/article/LP1501-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/ACS-Configuration",
-                    "https://support.remotelock.com/s/article/RemoteLock-Mobile-Key-Quick-Guide",
-                    "https://support.remotelock.com/s/article/Card-Formats-Supported-with-Mercury",
-                    "https://support.remotelock.com/s/article/RemoteLock-Korelock-MF009-Quick-Guide",
-                    "https://support.remotelock.com/s/article/Lockdown-Functionality",
-                    "https://support.remotelock.com/s/article/LP4502-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/ACS-Wire-Diagrams",
-                    "https://support.remotelock.com/s/article/MR50-Expansion-Board-User-Manual"
-                  ]
-                },
-                {
-                  "name": "Other Products",
-                  "url": "https://support.remotelock.com/s/other-products",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Kwikset-Halo-Installation-Instructions",
-                    "https://support.remotelock.com/s/article/Yale-Assure-Lock-2-Key-Free-Deadbolt-Installation-Guide",
-                    "https://support.remotelock.com/s/article/Yale-Assure-Lock-2-Keyed-Deadbolt-Installation-Guide",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Lever-Quick-Start-Guide",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Deabolt-Quick-Start-Guide",
-                    "https://support.remotelock.com/s/article/Turno-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/McGrath-Locks-NX5-User-Manual",
-                    "https://support.remotelock.com/s/article/McGrath-Locks-X3-User-Manual",
-                    "https://support.remotelock.com/s/article/McGrath-locks-Albion",
-                    "https://support.remotelock.com/s/article/PROLOK-Deluxe-Hardware-Installation-Manual",
-                    "https://support.remotelock.com/s/article/ProLok-Slimline-User-Manual",
-                    "https://support.remotelock.com/s/article/ProLok-Slimline-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/3500-Lever-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/3500-Deadbolt-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/LS-P50-User-Manual-and-Provisioning-Guide-Power-Plug",
-                    "https://support.remotelock.com/s/article/RemoteLock-model-6i-Installation",
-                    "https://support.remotelock.com/s/article/Power-Plugs",
-                    "https://support.remotelock.com/s/article/LS-90i-Local-Programming-and-Operation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-90i-Installation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-60i-Local-Programming-and-Operation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-60i-Installation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/Types-of-Smart-Cards-Prox-Cards"
-                  ]
-                },
-                {
-                  "name": "ResortLocks",
-                  "url": "https://support.remotelock.com/s/resortlocks",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/LSRL-1-Wire-Software-Manual-Legacy-ResortLock-Desktop-Software",
-                    "https://support.remotelock.com/s/article/ResortLock-FAQs-and-Troubleshooting-Guide",
-                    "https://support.remotelock.com/s/article/RL2000-Installation-and-Local-Setup-ResortLock",
-                    "https://support.remotelock.com/s/article/RL4000-Installation-and-Local-Setup-ResortLock",
-                    "https://support.remotelock.com/s/article/Thermostats"
-                  ]
-                }
-              ]
-            },
-            {
-              "name": "Contact Support",
-              "url": "https://support.remotelock.com/s/article/Contact-Support",
-              "pages": [
-                "https://support.remotelock.com/s/article/Contact-Support",
-                "https://support.remotelock.com/s/article/Feature-Request-Suggestions",
-                "https://support.remotelock.com/s/article/Warranty-and-Returns-Information",
-                "https://support.remotelock.com/s/article/Transfer-of-Ownership",
-                "https://support.remotelock.com/s/article/Blocking-a-ReadyPIN"
-              ]
-            },
-            {
-              "name": "Getting Started",
-              "url": "https://support.remotelock.com/s/getting-started",
-              "pages": [
-                "https://support.remotelock.com/s/article/IMPORTANT-WiFi-Heartbeat-Interval-Explained",
-                "https://support.remotelock.com/s/article/Account-Creation",
-                "https://support.remotelock.com/s/article/RemoteLock-Onboarding-Quick-Start-Guide",
-                "https://support.remotelock.com/s/article/Device-Registration",
-                "https://support.remotelock.com/s/article/RemoteLock-Mobile-App-Overview",
-                "https://support.remotelock.com/s/article/RemoteLock-Software-Overview",
-                "https://support.remotelock.com/s/article/WiFi-Provisioning-Guide",
-                "https://support.remotelock.com/s/article/Connecting-Your-Lock-to-WiFi",
-                "https://support.remotelock.com/s/article/RemoteLock-Internet-Connection-Setup-Guide",
-                "https://support.remotelock.com/s/article/EDGEstate-by-RemoteLock-The-NEW-Connect-Portal",
-                "https://support.remotelock.com/s/article/Getting-Started-Video"
-              ]
-            },
-            {
-              "name": "RemoteLock Portal",
-              "url": "https://support.remotelock.com/s/remotelockportal",
-              "subcategories": [
-                {
-                  "name": "Billing",
-                  "url": "https://support.remotelock.com/s/billing",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Billing-FAQs",
-                    "https://support.remotelock.com/s/article/EdgeState-Accounts-in-Grace-Period",
-                    "https://support.remotelock.com/s/article/Payment-Token-Instructions-Prepaid-billing"
-                  ]
-                },
-                {
-                  "name": "Device Management",
-                  "url": "https://support.remotelock.com/s/device-management",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/TrueSecure-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Dusaw-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Resideo-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/SmartThings-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Kwikset-Halo-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Schlage-Engage-Device-Commissioning-Offline-Devices",
-                    "https://support.remotelock.com/s/article/ResortLock-Lock-Management",
-                    "https://support.remotelock.com/s/article/Door-Locks-Overview",
-                    "https://support.remotelock.com/s/article/Device-Settings",
-                    "https://support.remotelock.com/s/article/Door-Groups",
-                    "https://support.remotelock.com/s/article/Device-Schedules-Explanations-and-Use-Cases",
-                    "https://support.remotelock.com/s/article/Common-Door-Function",
-                    "https://support.remotelock.com/s/article/360043010831-Replacing-your-RemoteLock-from-the-Device-Settings-page"
-                  ]
-                },
-                {
-                  "name": "Access User Management",
-                  "url": "https://support.remotelock.com/s/access-user-management",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/RemoteLock-Resident-App",
-                    "https://support.remotelock.com/s/article/Entry-App-by-RemoteLock",
-                    "https://support.remotelock.com/s/article/Access-Guests-and-Users",
-                    "https://support.remotelock.com/s/article/Legacy-Smart-Card-Management-Enrolling-MIFARE-Cards-Fobs",
-                    "https://support.remotelock.com/s/article/Access-Schedules-and-Access-Exceptions",
-                    "https://support.remotelock.com/s/article/Devices-Access",
-                    "https://support.remotelock.com/s/article/Guest-Email-Template",
-                    "https://support.remotelock.com/s/article/Guest-Email-Template-Formatting",
-                    "https://support.remotelock.com/s/article/ResortLock-Guest-Codes",
-                    "https://support.remotelock.com/s/article/Guest-Email-and-Message-Time-Scheduling",
-                    "https://support.remotelock.com/s/article/Access",
-                    "https://support.remotelock.com/s/article/CSV-Bulk-Import-Access-Users",
-                    "https://support.remotelock.com/s/article/Adding-a-LOCAL-user-code-to-the-lock",
-                    "https://support.remotelock.com/s/article/Entry-App-settings-and-configuration-web-portal",
-                    "https://support.remotelock.com/s/article/Mass-Access-Assignment",
-                    "https://support.remotelock.com/s/article/Adding-Door-Access-to-a-Guest-or-User"
-                  ]
-                },
-                {
-                  "name": "Account Management",
-                  "url": "https://support.remotelock.com/s/account-management-sub",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Account-Settings",
-                    "https://support.remotelock.com/s/article/Events-explanation",
-                    "https://support.remotelock.com/s/article/Reports",
-                    "https://support.remotelock.com/s/article/Notifications-and-how-they-work",
-                    "https://support.remotelock.com/s/article/Members-and-Roles",
-                    "https://support.remotelock.com/s/article/Account-Management-Menu",
-                    "https://support.remotelock.com/s/article/Notifications",
-                    "https://support.remotelock.com/s/article/ResortLock-Dashboard",
-                    "https://support.remotelock.com/s/article/Permissions-Explanation-Members-and-Roles",
-                    "https://support.remotelock.com/s/article/Using-Shared-Device",
-                    "https://support.remotelock.com/s/article/Using-Shared-Account",
-                    "https://support.remotelock.com/s/article/Automated-Email-Status",
-                    "https://support.remotelock.com/s/article/Two-Factor-Authentication",
-                    "https://support.remotelock.com/s/article/Exporting-Users-and-Devices",
-                    "https://support.remotelock.com/s/article/Dashboard-Health-Bar-and-Icon-meanings",
-                    "https://support.remotelock.com/s/article/Locations",
-                    "https://support.remotelock.com/s/article/Reset-Password-options-My-Account"
-                  ]
-                },
-                {
-                  "name": "Partner Integration",
-                  "url": "https://support.remotelock.com/s/partner-integrations",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Mews-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Track-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/ChargeAutomation-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Schlage-Engage-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/Schlage-Engage-Device-Commissioning-Instructions-Schlage-RC-RCK",
-                    "https://support.remotelock.com/s/article/Schlage-Engage-Access-and-Device-Management-Offline",
-                    "https://support.remotelock.com/s/article/igloohome-Integration-Beta",
-                    "https://support.remotelock.com/s/article/igloohome-Integration",
-                    "https://support.remotelock.com/s/article/RealPage-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/RoomRaccoon-RemoteLock-integration",
-                    "https://support.remotelock.com/s/article/Zeevou-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Smoobu-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/KeyInCode-KoreLine",
-                    "https://support.remotelock.com/s/article/Chekin-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Bookerville-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Beds24-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Whistle-legacy-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Hostaway-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/AppFolio-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Hostify-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/RentManager",
-                    "https://support.remotelock.com/s/article/Stayntouch-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Yale-Home-RemoteLock-Integration-migration-from-Yale-Access-to-Yale-Home",
-                    "https://support.remotelock.com/s/article/August-Lock-Integration",
-                    "https://support.remotelock.com/s/article/innRoad-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Padsplit-RemoteLock-Integration-Instructions",
-                    "https://support.remotelock.com/s/article/SuiteOp-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Yardi-Voyager-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/ThinkReservations-and-RemoteLock-Integration-PART-1",
-                    "https://support.remotelock.com/s/article/TIDY-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/BookingAutomation-and-RemoteLock-integration",
-                    "https://support.remotelock.com/s/article/ResortData-Processing-part1",
-                    "https://support.remotelock.com/s/article/Resort-Data-Processing-RDP-and-RemoteLock-integration-part2",
-                    "https://support.remotelock.com/s/article/Hospitable-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Guesty-Integration-Overview-and-Instructions",
-                    "https://support.remotelock.com/s/article/TTLock-Integration",
-                    "https://support.remotelock.com/s/article/Escapia-Integration",
-                    "https://support.remotelock.com/s/article/Airbnb-Integration",
-                    "https://support.remotelock.com/s/article/Vacation-Rental-Integrations-Guest-access-notifications",
-                    "https://support.remotelock.com/s/article/Vacation-Rental-Integrations-Deactivation",
-                    "https://support.remotelock.com/s/article/Vera-and-MiOS-Integration-overview",
-                    "https://support.remotelock.com/s/article/Airbnb-Messaging-System",
-                    "https://support.remotelock.com/s/article/HomeAway-VRBO-Integration",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Integration-Overview",
-                    "https://support.remotelock.com/s/article/Updating-Guesty-API-Credentials",
-                    "https://support.remotelock.com/s/article/iCal-Feed-Integrations",
-                    "https://support.remotelock.com/s/article/ResNexus-and-RemoteLock-Integration-Overview",
-                    "https://support.remotelock.com/s/article/August-Lock-Pairing",
-                    "https://support.remotelock.com/s/article/Akia-integration-with-RemoteLock",
-                    "https://support.remotelock.com/s/article/Airbnb-to-remove-Guest-Email-feature-use-Messaging-only",
-                    "https://support.remotelock.com/s/article/Streamline-V1-Integration-Overview",
-                    "https://support.remotelock.com/s/article/Streamline-VRS-Integration-Process",
-                    "https://support.remotelock.com/s/article/CourtReserve-Integration",
-                    "https://support.remotelock.com/s/article/Pynwheel-Integration-with-RemoteLock-Overview",
-                    "https://support.remotelock.com/s/article/Using-Guesty-s-Keycode-and-Automated-Messaging",
-                    "https://support.remotelock.com/s/article/Lodgix-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Vacation-Rental-Integrations-Associating-Doors",
-                    "https://support.remotelock.com/s/article/TripAngle-BookingWithEase-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/OwnerRez-Integration-Process",
-                    "https://support.remotelock.com/s/article/iTrip-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/Partner-Integrations",
-                    "https://support.remotelock.com/s/article/Ring-and-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/NewBook-Integration-Overview-and-Instructions",
-                    "https://support.remotelock.com/s/article/Hostfully-Integration-with-RemoteLock"
-                  ]
-                }
-              ]
-            },
-            {
-              "name": "Troubleshooting",
-              "url": "https://support.remotelock.com/s/troubleshooting",
-              "subcategories": [
-                {
-                  "name": "General",
-                  "url": "https://support.remotelock.com/s/general",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Device-Registration-Issues-Troubleshooting-and-Self-Help",
-                    "https://support.remotelock.com/s/article/Need-Help",
-                    "https://support.remotelock.com/s/article/Help-with-my-Vacation-Rental-Property-Management-Integration",
-                    "https://support.remotelock.com/s/article/Will-not-lock-unlock",
-                    "https://support.remotelock.com/s/article/Unable-to-Register-Lock-TS",
-                    "https://support.remotelock.com/s/article/Troubleshooting-and-Best-Practices",
-                    "https://support.remotelock.com/s/article/Lock-Flashing-Lights-and-Beeps-Meanings",
-                    "https://support.remotelock.com/s/article/Spindle-Test"
-                  ]
-                },
-                {
-                  "name": "Legacy Product Troubleshooting",
-                  "url": "https://support.remotelock.com/s/legacy-product-troubleshooting",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Lock-Grease",
-                    "https://support.remotelock.com/s/article/Mortise-Latch-Installation-for-lock-models-RL4000-LS6i-LS6000i",
-                    "https://support.remotelock.com/s/article/ResortLock-RL-4000-LS-6i-LS1500-Keypad-Replacement",
-                    "https://support.remotelock.com/s/article/RemoteLock-V0-to-V1-Migration-Guide"
-                  ]
-                },
-                {
-                  "name": "WiFi Connectivity Troubleshooting",
-                  "url": "https://support.remotelock.com/s/wifi-connectivity-troubleshooting",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Lock-Offline-ts",
-                    "https://support.remotelock.com/s/article/Legacy-Device-Wi-Fi-Setup-Provisioning-Guide",
-                    "https://support.remotelock.com/s/article/WiFi-Troubleshooting-Connectivity-Issues-Reprogramming-and-other-Network-information",
-                    "https://support.remotelock.com/s/article/RouteThis-Overview",
-                    "https://support.remotelock.com/s/article/WiFi-Connectivity-Best-Practices",
-                    "https://support.remotelock.com/s/article/Using-the-Mobile-App-to-Connect-your-Lock-to-Wi-Fi",
-                    "https://support.remotelock.com/s/article/OpenEdge-Troubleshooting-Codes"
-                  ]
-                },
-                {
-                  "name": "600 Series Troubleshooting",
-                  "url": "https://support.remotelock.com/s/600-series-troubleshooting",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Tailpiece-Driven-Hub-Troubleshooting-KIC-4000-5000-Series",
-                    "https://support.remotelock.com/s/article/600-Series-Motor-Replacement-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/Battery-Drain-Issues"
-                  ]
-                },
-                {
-                  "name": "500 Series Troubleshooting",
-                  "url": "https://support.remotelock.com/s/500-series-troubleshooting",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Snapback-Issues",
-                    "https://support.remotelock.com/s/article/500-Series-OpenEdge-Deadbolt-5i-RG-Replace-Motor",
-                    "https://support.remotelock.com/s/article/500-Series-OpenEdge-Deadbolt-5i-RG-Tailpiece-Orientation",
-                    "https://support.remotelock.com/s/article/500-Series-OpenEdge-5i-RG-Replace-Keypad"
-                  ]
-                }
-              ]
-            },
-            {
-              "name": "General Information",
-              "url": "https://support.remotelock.com/s/general-information",
-              "pages": [
-                "https://support.remotelock.com/s/article/Contact-Support",
-                "https://support.remotelock.com/s/article/Feature-Request-Suggestions",
-                "https://support.remotelock.com/s/article/Warranty-and-Returns-Information",
-                "https://support.remotelock.com/s/article/Transfer-of-Ownership",
-                "https://support.remotelock.com/s/article/Blocking-a-ReadyPIN",
-                "https://support.remotelock.com/s/article/New-RemoteLock-Features-Update-as-of-9-25-18",
-                "https://support.remotelock.com/s/article/How-to-update-your-customer-satisfaction-rating"
-              ]
-            },
-            {
-              "name": "Hardware Information",
-              "url": "https://support.remotelock.com/s/hardware-information",
-              "subcategories": [
-                {
-                  "name": "500 series",
-                  "url": "https://support.remotelock.com/s/500-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/500-Series-Deadbolt-Handing-the-Lock-openEDGE-Residential-Grade-5i-RG",
-                    "https://support.remotelock.com/s/article/500-Series-Lever-Hardware-Installation-openEDGE-Residential-Grade-5i-RG",
-                    "https://support.remotelock.com/s/article/DB-500R-non-connected-User-Manual",
-                    "https://support.remotelock.com/s/article/LS-DB500R-Keypad-Electronic-Lock-Remote-Control-Manual",
-                    "https://support.remotelock.com/s/article/LS-L500i-Installation-and-Local-Setup-Legacy-Wi-Fi-Locks",
-                    "https://support.remotelock.com/s/article/LS-DB500i-Installation-and-Local-Setup-Legacy-Wi-Fi-Locks",
-                    "https://support.remotelock.com/s/article/500-Series-Deadbolt-Hardware-Installation-openEDGE-Residential-Grade-5i-RG"
-                  ]
-                },
-                {
-                  "name": "600-series",
-                  "url": "https://support.remotelock.com/s/600-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/600-Series-Hardware-Installation-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/600-Series-Mortise-Latch-Installation-openEDGE-Light-Duty-Commercial-Levers-3i-BG",
-                    "https://support.remotelock.com/s/article/600-Series-FAQs-openEDGE-Light-Duty-Commercial-Levers-3i-BG"
-                  ]
-                },
-                {
-                  "name": "700 Series",
-                  "url": "https://support.remotelock.com/s/700-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/CG-EX-Push-Exit-Panic-Bar-Installation-Guide",
-                    "https://support.remotelock.com/s/article/OpenEdge-CG-formerly-model-7i-Installation-manual-print-version",
-                    "https://support.remotelock.com/s/article/700-Series-Mortise-Latch-Installation-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/700-Series-Mortise-latch-change-handing-instructions-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/700-Series-Hardware-Installation-openEDGE-Medium-Duty-Commercial-Levers-7i-CG",
-                    "https://support.remotelock.com/s/article/ManualProgrammingFunctions",
-                    "https://support.remotelock.com/s/article/700-CG-7i-800-Series-Programming-Functions-and-Function-Codes"
-                  ]
-                },
-                {
-                  "name": "800 Series",
-                  "url": "https://support.remotelock.com/s/800-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/800-Series-Hardware-Installation-openEDGE-Heavy-Duty-Commercial-Lever"
-                  ]
-                },
-                {
-                  "name": "ACS",
-                  "url": "https://support.remotelock.com/s/acs",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/ACS-ACK-Troubleshooting-Guide",
-                    "https://support.remotelock.com/s/article/Relay-Safety-Sheet",
-                    "https://support.remotelock.com/s/article/Regular-ACS-Mode-Overview",
-                    "https://support.remotelock.com/s/article/Elevator-ACS-Mode-Overview",
-                    "https://support.remotelock.com/s/article/Setting-up-FAI-Fire-Alarm-Interface-Connection",
-                    "https://support.remotelock.com/s/article/Reconnecting-ACK-ACS-to-Network",
-                    "https://support.remotelock.com/s/article/Adding-Expansion-Panel-to-Existing-ACS-Install",
-                    "https://support.remotelock.com/s/article/ACS-Installation",
-                    "https://support.remotelock.com/s/article/Prior-To-ACS-Installation",
-                    "https://support.remotelock.com/s/article/ACS-Installation-Completion-Checklist",
-                    "https://support.remotelock.com/s/article/ACS-Installation-Warnings",
-                    "https://support.remotelock.com/s/article/24-Volt-Conversion-Steps",
-                    "https://support.remotelock.com/s/article/Testing-ACS-Installation",
-                    "https://support.remotelock.com/s/article/Bulk-Erase-Steps-For-First-ACS-Installation",
-                    "https://support.remotelock.com/s/article/Adding-an-ACS-Device-to-the-Remotelock-Portal-Mercury-Security-ACS-Integration",
-                    "https://support.remotelock.com/s/article/MR52-Expansion-Board-User-Manual",
-                    "https://support.remotelock.com/s/article/RemoteLock-Mobile-Key-Reader-Setup",
-                    "https://support.remotelock.com/s/article/MR52-Expansion-Panel-Wiring-Schema-for-Addressing",
-                    "https://support.remotelock.com/s/article/LP1502-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/Creating-Mobile-Key-Credentials",
-                    "https://support.remotelock.com/s/article/ACS-Technical-Documents",
-                    "https://support.remotelock.com/s/article/LP1501-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/ACS-Configuration",
-                    "https://support.remotelock.com/s/article/RemoteLock-Mobile-Key-Quick-Guide",
-                    "https://support.remotelock.com/s/article/Card-Formats-Supported-with-Mercury",
-                    "https://support.remotelock.com/s/article/RemoteLock-Korelock-MF009-Quick-Guide",
-                    "https://support.remotelock.com/s/article/Lockdown-Functionality",
-                    "https://support.remotelock.com/s/article/LP4502-Controller-User-Manual",
-                    "https://support.remotelock.com/s/article/ACS-Wire-Diagrams",
-                    "https://support.remotelock.com/s/article/MR50-Expansion-Board-User-Manual"
-                  ]
-                },
-                {
-                  "name": "Other Products",
-                  "url": "https://support.remotelock.com/s/other-products",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/Kwikset-Halo-Installation-Instructions",
-                    "https://support.remotelock.com/s/article/Yale-Assure-Lock-2-Key-Free-Deadbolt-Installation-Guide",
-                    "https://support.remotelock.com/s/article/Yale-Assure-Lock-2-Keyed-Deadbolt-Installation-Guide",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Lever-Quick-Start-Guide",
-                    "https://support.remotelock.com/s/article/Schlage-Encode-Deabolt-Quick-Start-Guide",
-                    "https://support.remotelock.com/s/article/Turno-RemoteLock-Integration",
-                    "https://support.remotelock.com/s/article/McGrath-Locks-NX5-User-Manual",
-                    "https://support.remotelock.com/s/article/McGrath-Locks-X3-User-Manual",
-                    "https://support.remotelock.com/s/article/McGrath-locks-Albion",
-                    "https://support.remotelock.com/s/article/PROLOK-Deluxe-Hardware-Installation-Manual",
-                    "https://support.remotelock.com/s/article/ProLok-Slimline-User-Manual",
-                    "https://support.remotelock.com/s/article/ProLok-Slimline-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/3500-Lever-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/3500-Deadbolt-Hardware-Installation-Guide",
-                    "https://support.remotelock.com/s/article/LS-P50-User-Manual-and-Provisioning-Guide-Power-Plug",
-                    "https://support.remotelock.com/s/article/RemoteLock-model-6i-Installation",
-                    "https://support.remotelock.com/s/article/Power-Plugs",
-                    "https://support.remotelock.com/s/article/LS-90i-Local-Programming-and-Operation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-90i-Installation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-60i-Local-Programming-and-Operation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/LS-60i-Installation-Guide-Thermostat",
-                    "https://support.remotelock.com/s/article/Types-of-Smart-Cards-Prox-Cards"
-                  ]
-                },
-                {
-                  "name": "ResortLocks",
-                  "url": "https://support.remotelock.com/s/resortlocks",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/LSRL-1-Wire-Software-Manual-Legacy-ResortLock-Desktop-Software",
-                    "https://support.remotelock.com/s/article/ResortLock-FAQs-and-Troubleshooting-Guide",
-                    "https://support.remotelock.com/s/article/RL2000-Installation-and-Local-Setup-ResortLock",
-                    "https://support.remotelock.com/s/article/RL4000-Installation-and-Local-Setup-ResortLock",
-                    "https://support.remotelock.com/s/article/Thermostats"
-                  ]
-                }
-              ]
-            },
-            {
-              "name": "KeyInCode Information",
-              "url": "https://support.remotelock.com/s/keyincode-hardware",
-              "subcategories": [
-                {
-                  "name": "4000 Series",
-                  "url": "https://support.remotelock.com/s/4000-series",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/4000-Series-FAQs",
-                    "https://support.remotelock.com/s/article/4000-Series-Installation-Guide"
-                  ]
-                },
-                {
-                  "name": "5000 Series Hardware",
-                  "url": "https://support.remotelock.com/s/5000-series-hardware",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/5000-Series-Installation-Guide",
-                    "https://support.remotelock.com/s/article/5000-Series-Exit-Bar-Installation"
-                  ]
-                },
-                {
-                  "name": "6000 Series Hardware",
-                  "url": "https://support.remotelock.com/s/6000-series-hardware",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/6000-Series-Installation-Guide"
-                  ]
-                },
-                {
-                  "name": "KIC General Info",
-                  "url": "https://support.remotelock.com/s/kic-general-info",
-                  "pages": [
-                    "https://support.remotelock.com/s/article/2500-Installation-Manual",
-                    "https://support.remotelock.com/s/article/Smart-Card-and-Fob-Enrollment",
-                    "https://support.remotelock.com/s/article/Using-Cards-Fobs-on-KeyInCode-Locks",
-                    "https://support.remotelock.com/s/article/Mortise-Latch-Change-of-Handing-Instructions",
-                    "https://support.remotelock.com/s/article/ReadyPIN-on-KeyInCode-Locks-Tutorial",
-                    "https://support.remotelock.com/s/article/Manual-Programming-Functions",
-                    "https://support.remotelock.com/s/article/Assigning-MIFARE-Cards-Fobs-to-Access-Users",
-                    "https://support.remotelock.com/s/article/Offline-Mode-Lock-Setup",
-                    "https://support.remotelock.com/s/article/Enrolling-MIFARE-Cards-Fobs"
-                  ]
-                }
-              ]
-            }
-          ]
-        }
+        # Shared with main.py, parsed once per process
+        sitemap_data = load_sitemap()
         
         page_index = []
         structure_parts = ["="*70, "COMPLETE REMOTELOCK DOCUMENTATION INDEX", "="*70, "\n"]
@@ -780,7 +334,7 @@ def load_complete_sitemap():
             if "pages" in category:
                 for url in category["pages"]:
                     slug = url.split('/article/')[-1] if '/article/' in url else url.split('/')[-1]
-                    page_index.append({"slug": slug, "category": category['name'], "subcategory": None})
+                    page_index.append({"slug": slug, "category": category['name'], "subcategory": None, "url": url})
                     structure_parts.append(f"   • {slug}")
             
             # Subcategories
@@ -789,7 +343,7 @@ def load_complete_sitemap():
                     structure_parts.append(f"\n   📂 {sub_category_data['name']}")
                     for url in sub_category_data["pages"]:
                         slug = url.split('/article/')[-1] if '/article/' in url else url.split('/')[-1]
-                        page_index.append({"slug": slug, "category": category['name'], "subcategory": sub_category_data['name']})
+                        page_index.append({"slug": slug, "category": category['name'], "subcategory": sub_category_data['name'], "url": url})
                         structure_parts.append(f"      • {slug}")
             structure_parts.append("\n")
         
@@ -806,6 +360,21 @@ def load_complete_sitemap():
 
 SITEMAP_STRUCTURE, PAGE_INDEX, SITEMAP_RAW_DATA = load_complete_sitemap()
 
+for _page in PAGE_INDEX:
+    _category = _page["category"]
+    _subcategory = _page["subcategory"]
+    # Normalized once here rather than per page on every query
+    _page["norm_category"] = _NON_ALNUM_RE.sub('', _category.lower())
+    _page["norm_subcategory"] = _NON_ALNUM_RE.sub('', _subcategory.lower()) if _subcategory else None
+    _page["norm_slug"] = _NON_ALNUM_RE.sub('', _page["slug"].lower())
+    _page["slug_words"] = frozenset(_WORD_RE.findall(_page["slug"].lower())) - _SLUG_STOPWORDS
+
+# The few dozen distinct normalized category/subcategory names. A query is
+# substring-tested against each once, instead of once per page
+HIERARCHY_NORM_NAMES = frozenset(
+    name for _page in PAGE_INDEX for name in (_page["norm_category"], _page["norm_subcategory"]) if name is not None
+)
+
 # Log sitemap initialization
 logger.info(f"📊 SITEMAP loaded: {len(SITEMAP_STRUCTURE)} chars (string format)")
 logger.info(f"📊 PAGE_INDEX loaded: {len(PAGE_INDEX)} pages")
@@ -874,6 +443,59 @@ Question: {question}
 
 YOUR ANSWER (Cypher query only):"""
 
+# Template pre-parsed into (literal, field) segments once, so direct mode
+# renders by joining pieces instead of building a PromptTemplate per call
+CYPHER_PROMPT_SEGMENTS = [(literal, field) for literal, field, _, _ in string.Formatter().parse(CYPHER_GENERATION_PROMPT)]
+
+def render_cypher_prompt(**values) -> str:
+    return "".join(literal + (values[field] if field else "") for literal, field in CYPHER_PROMPT_SEGMENTS)
+
+# --- Keyword Fallback Queries ---
+# Used when LLM-generated Cypher finds nothing. The user's words travel as a
+# parameter, so the query text is constant and Neo4j reuses one cached plan.
+# The full-text index (created by the graph builders) avoids a Page scan;
+# the CONTAINS variant covers databases built before that index existed.
+KEYWORD_FULLTEXT_QUERY = """
+CALL db.index.fulltext.queryNodes('page_content_fulltext', $terms)
+YIELD node AS p, score
+RETURN p.id AS id, p.slug AS slug, p.title AS title, p.content AS content, p.url AS url
+ORDER BY score DESC
+LIMIT 5
+"""
+
+KEYWORD_FALLBACK_QUERY = """
+MATCH (p:Page)
+WHERE ANY(w IN $words WHERE toLower(p.content) CONTAINS w)
+RETURN p.id AS id, p.slug AS slug, p.title AS title, p.content AS content, p.url AS url
+LIMIT 5
+"""
+
+# --- Vector Query ---
+# Kept as its own statement rather than fused with the Cypher search: that
+# query is LLM-generated and only exists after a Gemini call, while this one
+# can start as soon as the embedding is back. retrieve() runs the two in
+# parallel, so one fused statement would wait on Cypher generation first.
+VECTOR_SEARCH_QUERY = """
+CALL db.index.vector.queryNodes('page_embeddings', 5, $emb)
+YIELD node AS p, score
+WHERE score > 0.3
+RETURN p.id as id, p.slug as slug, p.title as title,
+       p.content as content, p.url as url, score as similarity
+ORDER BY score DESC
+"""
+
+# --- Batched Vector Query ---
+# One round trip for many questions; `i` maps each row back to its question.
+VECTOR_SEARCH_BATCH_QUERY = """
+UNWIND range(0, size($embs) - 1) AS i
+CALL db.index.vector.queryNodes('page_embeddings', 5, $embs[i])
+YIELD node AS p, score
+WHERE score > 0.3
+RETURN i, p.id as id, p.slug as slug, p.title as title,
+       p.content as content, p.url as url, score as similarity
+ORDER BY i, score DESC
+"""
+
 class ProductionRetriever:
 
     def __init__(self):
@@ -886,11 +508,16 @@ class ProductionRetriever:
         print("QUERY_LLM: [1/4] Connecting to Neo4j...", flush=True)
         logger.info("[1/4] Connecting to Neo4j...")
         try:
-            # Limit connection pool size to reduce memory usage (~10MB savings)
+            # Small default pool keeps memory low (~10MB savings); tune with NEO4J_POOL.
+            # Recycle connections hourly and keep them alive so idle AuraDB
+            # connections are not dropped under the pool.
             self.driver = GraphDatabase.driver(
                 NEO4J_URI,
                 auth=(NEO4J_USER, NEO4J_PASSWORD),
-                max_connection_pool_size=5
+                max_connection_pool_size=NEO4J_POOL,
+                connection_acquisition_timeout=30,
+                max_connection_lifetime=3600,
+                keep_alive=True
             )
             print("QUERY_LLM: Neo4j driver created, verifying connectivity...", flush=True)
             self.driver.verify_connectivity()
@@ -901,18 +528,31 @@ class ProductionRetriever:
             logger.error(f"Failed to connect to Neo4j: {e}", exc_info=True)
             raise
 
+        # Async twin of the driver for FastAPI handlers, so their Bolt reads
+        # don't block the event loop. Connections are opened on first use.
+        self.async_driver = AsyncGraphDatabase.driver(
+            NEO4J_URI,
+            auth=(NEO4J_USER, NEO4J_PASSWORD),
+            max_connection_pool_size=NEO4J_POOL,
+            connection_acquisition_timeout=30,
+            max_connection_lifetime=3600,
+            keep_alive=True
+        )
+
         # Initialize LangChain Graph
         logger.info("[2/4] Initializing LangChain Neo4jGraph...")
         try:
-            # Using the recommended Neo4jGraph
+            # Schema introspection is deferred to _load_graph_schema, which
+            # reuses the on-disk copy when the graph hasn't changed
             self.graph = Neo4jGraph(
                 url=NEO4J_URI,
                 username=NEO4J_USER,
-                password=NEO4J_PASSWORD
+                password=NEO4J_PASSWORD,
+                database=NEO4J_DATABASE,
+                refresh_schema=False
             )
-            # It's good practice to call refresh_schema
-            self.graph.refresh_schema()
-            logger.info("✓ Neo4jGraph initialized and schema refreshed")
+            self._load_graph_schema()
+            logger.info("✓ Neo4jGraph initialized and schema loaded")
         except Exception as e:
             logger.error(f"Graph initialization failed: {e}", exc_info=True)
             self.graph = None # Set to None if connection fails
@@ -921,13 +561,18 @@ class ProductionRetriever:
         logger.info("[3/4] Loading Gemini LLM...")
         try:
             self.llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
+                model=CYPHER_LLM_MODEL,
                 temperature=0,
                 google_api_key=GEMINI_API_KEY,
                 max_output_tokens=300,  # Cypher queries are short (~100-500 chars)
-                thinking_budget=0       # Disable extensive thinking for faster generation
+                thinking_budget=0,      # Disable extensive thinking for faster generation
+                # Hard per-request deadline, so a stalled generation is abandoned and
+                # cypher_search moves on to its fallbacks; no retries, or each one
+                # would get the full budget again
+                timeout=CYPHER_LLM_TIMEOUT,
+                max_retries=0
             )
-            logger.info("✓ Gemini LLM loaded successfully with optimizations:")
+            logger.info(f"✓ Gemini LLM ({CYPHER_LLM_MODEL}) loaded successfully with optimizations:")
             logger.info("   • max_output_tokens=300 (optimized for short Cypher queries)")
             logger.info("   • thinking_budget=0 (fast generation mode)")
         except Exception as e:
@@ -981,49 +626,123 @@ class ProductionRetriever:
         logger.info("[6/6] Initializing multi-layer cache...")
         try:
             self.cache = MultiLayerCache(
-                l1_size=100, l1_ttl=3600,    # L1: Complete results (1 hour TTL)
+                l1_size=1024, l1_ttl=3600,   # L1: Complete results (1 hour TTL)
                 l2_size=200, l2_ttl=7200,    # L2: Cypher queries (2 hours TTL)
-                l3_size=300, l3_ttl=86400    # L3: Embeddings (24 hours TTL)
+                l3_size=300, l3_ttl=86400,   # L3: Embeddings (24 hours TTL)
+                semantic_size=100, semantic_threshold=0.92  # Paraphrase hits share L1 TTL
             )
             print("QUERY_LLM: ✓ Multi-layer cache initialized", flush=True)
-            logger.info("✓ Multi-layer cache initialized (L1: 100 results, L2: 200 queries, L3: 300 embeddings)")
+            logger.info("✓ Multi-layer cache initialized (L1: 1024 results, L2: 200 queries, L3: 300 embeddings)")
         except Exception as e:
             print(f"QUERY_LLM: ✗ Cache initialization failed: {e}", flush=True)
             logger.error(f"Failed to initialize cache: {e}", exc_info=True)
             # Don't raise - cache is optional for functionality
             self.cache = None
 
+        # Filtered sitemap strings, keyed by sorted hierarchy hints
+        self._filtered_sitemap_cache = {}
+
+        # Long-lived pool for retrieve()'s parallel searches, instead of spawning
+        # and joining two fresh threads on every question
+        self.search_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=RETRIEVE_SEARCH_WORKERS, thread_name_prefix="retrieve-search"
+        )
+
         print("QUERY_LLM: ProductionRetriever initialization complete", flush=True)
         logger.info("="*70)
         logger.info("ProductionRetriever initialization complete")
         logger.info("="*70)
     
     def close(self):
+        self.search_executor.shutdown(wait=False, cancel_futures=True)
         if self.driver:
             self.driver.close()
+
+    async def aclose(self):
+        if self.async_driver:
+            await self.async_driver.close()
+        self.close()
+
+    async def aquery(self, cypher: str, **params) -> List[Dict]:
+        """Run a read query on the async driver; for use inside async handlers."""
+        async with self.async_driver.session(database=NEO4J_DATABASE) as session:
+            result = await session.run(cypher, params)
+            return await result.data()
+
+    def _schema_token(self) -> str:
+        """Cheap graph-version token: node and relationship totals come from the count store."""
+        with self.driver.session(database=NEO4J_DATABASE) as session:
+            record = session.run("""
+                CALL { MATCH (n) RETURN count(n) AS nodes }
+                CALL { MATCH ()-[r]->() RETURN count(r) AS rels }
+                RETURN nodes, rels
+            """).single()
+        return f"{NEO4J_DATABASE}:{record['nodes']}:{record['rels']}"
+
+    def _load_graph_schema(self):
+        """Fill self.graph's schema from SCHEMA_CACHE_PATH if still current, else introspect and save it."""
+        token = self._schema_token()
+        try:
+            with open(SCHEMA_CACHE_PATH, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("token") == token:
+                self.graph.schema = cached["schema"]
+                self.graph.structured_schema = cached["structured_schema"]
+                logger.info(f"✓ Graph schema loaded from {SCHEMA_CACHE_PATH}")
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+
+        self.graph.refresh_schema()
+        try:
+            with open(SCHEMA_CACHE_PATH, "w", encoding="utf-8") as f:
+                json.dump({
+                    "token": token,
+                    "saved_at": time.time(),
+                    "schema": self.graph.schema,
+                    "structured_schema": self.graph.structured_schema
+                }, f)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not write schema cache: {e}")
     
     def _normalize(self, text: str) -> str:
         """Normalize for matching, remove common non-alphanumeric and extra spaces."""
-        return re.sub(r'[^a-z0-9]+', '', text.lower())
+        return _NON_ALNUM_RE.sub('', text.lower())
     
-    def _slug_match_score(self, slug: str, query: str) -> float:
-        """Calculate slug match score (0-100) based on normalized string similarity and word overlap."""
+    def _slug_query_words(self, query: str) -> set:
+        return set(_WORD_RE.findall(query.lower())) - _SLUG_QUERY_STOPWORDS
+
+    def _slug_match_score(self, slug: str, query: str, norm_query: Optional[str] = None, query_words: Optional[set] = None,
+                          matcher: Optional[SequenceMatcher] = None, page_info: Optional[Dict] = None) -> float:
+        """
+        Calculate slug match score (0-100) based on normalized string similarity and word overlap.
+        Callers scoring many slugs against one query pass the query-side
+        norm_query/query_words once instead of recomputing them per slug, and a
+        matcher whose second sequence is already norm_query. page_info supplies
+        the slug side precomputed at load time.
+        """
         if not slug:
             return 0.0
         
-        norm_slug = self._normalize(slug)
-        norm_query = self._normalize(query)
+        norm_slug = page_info["norm_slug"] if page_info else self._normalize(slug)
+        if norm_query is None:
+            norm_query = self._normalize(query)
         
         # Exact match (after normalization)
         if norm_slug == norm_query:
             return 100.0
         
-        # SequenceMatcher for overall string similarity
-        sm_ratio = SequenceMatcher(None, norm_slug, norm_query).ratio() * 80.0 # Max 80 points
+        # SequenceMatcher for overall string similarity. The matcher indexes its
+        # second sequence, so sharing one across slugs indexes the query only once
+        if matcher is None:
+            matcher = SequenceMatcher(None, b=norm_query)
+        matcher.set_seq1(norm_slug)
+        sm_ratio = matcher.ratio() * 80.0 # Max 80 points
         
         # Word overlap
-        query_words = set(re.findall(r'\b\w+\b', query.lower())) - {'the', 'a', 'of', 'for', 'series', 'guide', 'manual'}
-        slug_words = set(re.findall(r'\b\w+\b', slug.lower())) - {'the', 'a', 'of', 'for', 'series', 'openedge'}
+        if query_words is None:
+            query_words = self._slug_query_words(query)
+        slug_words = page_info["slug_words"] if page_info else set(_WORD_RE.findall(slug.lower())) - _SLUG_STOPWORDS
         
         if not query_words:
             return sm_ratio # If query is just noise, rely on string similarity
@@ -1035,8 +754,11 @@ class ProductionRetriever:
     
     def _find_matching_slugs_and_hierarchy(self, query: str) -> Dict[str, Any]:
         """Helper: Find strong candidate slugs and relevant hierarchy info from PAGE_INDEX."""
-        query_lower = query.lower()
-        query_words = set(re.findall(r'\b\w+\b', query_lower)) - {'the', 'a', 'of', 'for', 'series', 'guide', 'manual', 'how', 'to', 'do', 'i', 'installation'}
+        # Query-side work done once, not per page
+        norm_query = self._normalize(query)
+        slug_query_words = self._slug_query_words(query)
+        matcher = SequenceMatcher(None, b=norm_query)
+        mentioned_names = {name for name in HIERARCHY_NORM_NAMES if name in norm_query}
         
         slug_candidates = []
         hierarchy_candidates = set() # To store unique category/subcategory names
@@ -1049,13 +771,13 @@ class ProductionRetriever:
             score = 0.0
             
             # Slug score
-            score += self._slug_match_score(slug, query)
+            score += self._slug_match_score(slug, query, norm_query, slug_query_words, matcher, page_info)
             
-            # Check against category/subcategory names
-            if category and self._normalize(category) in self._normalize(query):
+            # Check against category/subcategory names (normalized at load time)
+            if category and page_info['norm_category'] in mentioned_names:
                 score += 30.0 # Boost for category mention
                 hierarchy_candidates.add(category)
-            if subcategory and self._normalize(subcategory) in self._normalize(query):
+            if subcategory and page_info['norm_subcategory'] in mentioned_names:
                 score += 40.0 # Higher boost for subcategory mention
                 hierarchy_candidates.add(subcategory)
 
@@ -1090,10 +812,10 @@ class ProductionRetriever:
             return False
 
         # Normalize candidate (remove all non-alphanumeric)
-        norm_candidate = re.sub(r'[^a-z0-9]', '', candidate.lower())
+        norm_candidate = _NON_ALNUM_RE.sub('', candidate.lower())
 
         for hint in hierarchy_hints:
-            norm_hint = re.sub(r'[^a-z0-9]', '', hint.lower())
+            norm_hint = _NON_ALNUM_RE.sub('', hint.lower())
 
             # Exact normalized match
             if norm_candidate == norm_hint:
@@ -1107,8 +829,8 @@ class ProductionRetriever:
                     return True
 
             # Word-level match
-            candidate_words = set(re.findall(r'\b\w+\b', candidate.lower()))
-            hint_words = set(re.findall(r'\b\w+\b', hint.lower()))
+            candidate_words = set(_WORD_RE.findall(candidate.lower()))
+            hint_words = set(_WORD_RE.findall(hint.lower()))
             common_words = candidate_words & hint_words
             if common_words:
                 logger.debug(f"🎯 WORD match: '{candidate}' ≈ '{hint}' (common: {common_words})")
@@ -1117,19 +839,32 @@ class ProductionRetriever:
         return False
 
     def _get_filtered_sitemap_structure(self, hierarchy_hints: List[str]) -> str:
+        """Filtered sitemap for these hints, built once per distinct hint set."""
+        # The result depends only on the hints and the static sitemap, and hints
+        # come from a fixed set of category names, so this stays small
+        cache_key = tuple(sorted(hierarchy_hints))
+        filtered = self._filtered_sitemap_cache.get(cache_key)
+        if filtered is None:
+            filtered = self._build_filtered_sitemap_structure(hierarchy_hints)
+            self._filtered_sitemap_cache[cache_key] = filtered
+        else:
+            logger.info(f"⚡ Reusing filtered sitemap for hints {list(cache_key)} ({len(filtered)} chars)")
+        return filtered
+
+    def _build_filtered_sitemap_structure(self, hierarchy_hints: List[str]) -> str:
         """
         Extract relevant categories with fuzzy matching and smart fallbacks.
         INCLUDES COMPREHENSIVE LOGGING for debugging.
         """
-        logger.info("=" * 60)
-        logger.info("🔍 SITEMAP FILTERING STARTED")
-        logger.info(f"📥 Input hierarchy_hints: {hierarchy_hints}")
+        logger.debug("=" * 60)
+        logger.debug("🔍 SITEMAP FILTERING STARTED")
+        logger.debug(f"📥 Input hierarchy_hints: {hierarchy_hints}")
 
         # Fallback 1: No hints detected - use full sitemap
         if not hierarchy_hints:
             logger.warning("⚠️  No hierarchy hints - using FULL SITEMAP")
-            logger.info(f"📏 Full sitemap size: {len(SITEMAP_STRUCTURE)} chars")
-            logger.info("=" * 60)
+            logger.debug(f"📏 Full sitemap size: {len(SITEMAP_STRUCTURE)} chars")
+            logger.debug("=" * 60)
             return SITEMAP_STRUCTURE
 
         filtered_categories = []
@@ -1144,7 +879,7 @@ class ProductionRetriever:
             category_match = self._fuzzy_match_category(category_name, hierarchy_hints)
 
             if category_match:
-                logger.info(f"✅ Category MATCHED: '{category_name}'")
+                logger.debug(f"✅ Category MATCHED: '{category_name}'")
                 matched_categories.append(category_name)
 
             # Check subcategories
@@ -1153,7 +888,7 @@ class ProductionRetriever:
                 for subcat in category["subcategories"]:
                     subcat_name = subcat["name"]
                     if self._fuzzy_match_category(subcat_name, hierarchy_hints):
-                        logger.info(f"✅ Subcategory MATCHED: '{subcat_name}' under '{category_name}'")
+                        logger.debug(f"✅ Subcategory MATCHED: '{subcat_name}' under '{category_name}'")
                         matched_subcategories.append(f"{category_name} > {subcat_name}")
                         relevant_subcats.append(subcat)
 
@@ -1165,7 +900,7 @@ class ProductionRetriever:
                         "subcategories": relevant_subcats  # No page limit
                     }
                     page_count = sum(len(s.get("pages", [])) for s in relevant_subcats)
-                    logger.info(f"📦 Including '{category_name}' with {len(relevant_subcats)} subcategories, {page_count} pages")
+                    logger.debug(f"📦 Including '{category_name}' with {len(relevant_subcats)} subcategories, {page_count} pages")
                     filtered_categories.append(filtered_cat)
                 elif category_match:
                     # Include category even without matched subcategories
@@ -1175,11 +910,11 @@ class ProductionRetriever:
                     }
                     if "pages" in category:
                         filtered_cat["pages"] = category["pages"]  # Include all pages
-                        logger.info(f"📦 Including '{category_name}' with {len(category['pages'])} direct pages")
+                        logger.debug(f"📦 Including '{category_name}' with {len(category['pages'])} direct pages")
                     if "subcategories" in category:
                         # Include first 5 subcategories for context
                         filtered_cat["subcategories"] = category["subcategories"][:5]
-                        logger.info(f"📦 Including first 5 subcategories for context")
+                        logger.debug(f"📦 Including first 5 subcategories for context")
                     filtered_categories.append(filtered_cat)
 
             elif category_match and "pages" in category:
@@ -1189,20 +924,20 @@ class ProductionRetriever:
                     "url": category["url"],
                     "pages": category["pages"]  # Include all pages
                 })
-                logger.info(f"📦 Including '{category_name}' with {len(category['pages'])} pages")
+                logger.debug(f"📦 Including '{category_name}' with {len(category['pages'])} pages")
 
         # Summary logging
-        logger.info(f"📊 Filtering Summary:")
-        logger.info(f"   • Matched categories: {len(matched_categories)} - {matched_categories}")
-        logger.info(f"   • Matched subcategories: {len(matched_subcategories)} - {matched_subcategories}")
-        logger.info(f"   • Filtered categories included: {len(filtered_categories)}")
+        logger.debug(f"📊 Filtering Summary:")
+        logger.debug(f"   • Matched categories: {len(matched_categories)} - {matched_categories}")
+        logger.debug(f"   • Matched subcategories: {len(matched_subcategories)} - {matched_subcategories}")
+        logger.debug(f"   • Filtered categories included: {len(filtered_categories)}")
 
         # Fallback 2: No matches found - use full sitemap
         if not filtered_categories:
             logger.warning(f"⚠️  FILTERING FAILED - No matches for hints: {hierarchy_hints}")
             logger.warning("⚠️  Falling back to FULL SITEMAP")
-            logger.info(f"📏 Full sitemap size: {len(SITEMAP_STRUCTURE)} chars")
-            logger.info("=" * 60)
+            logger.debug(f"📏 Full sitemap size: {len(SITEMAP_STRUCTURE)} chars")
+            logger.debug("=" * 60)
             return SITEMAP_STRUCTURE
 
         # Create filtered sitemap JSON
@@ -1213,24 +948,26 @@ class ProductionRetriever:
         if len(filtered_json) < 500:
             logger.warning(f"⚠️  Filtered sitemap TOO SMALL ({len(filtered_json)} chars < 500)")
             logger.warning("⚠️  Falling back to FULL SITEMAP")
-            logger.info(f"📏 Full sitemap size: {len(SITEMAP_STRUCTURE)} chars")
-            logger.info("=" * 60)
+            logger.debug(f"📏 Full sitemap size: {len(SITEMAP_STRUCTURE)} chars")
+            logger.debug("=" * 60)
             return SITEMAP_STRUCTURE
 
         # Success!
         reduction_pct = (1 - len(filtered_json) / len(SITEMAP_STRUCTURE)) * 100
-        logger.info(f"✅ FILTERED SITEMAP CREATED:")
-        logger.info(f"   • Size: {len(filtered_json)} chars (vs {len(SITEMAP_STRUCTURE)} full)")
-        logger.info(f"   • Reduction: {reduction_pct:.1f}%")
-        logger.info(f"   • Categories: {len(filtered_categories)}")
-        logger.info("=" * 60)
+        logger.debug(f"✅ FILTERED SITEMAP CREATED:")
+        logger.debug(f"   • Size: {len(filtered_json)} chars (vs {len(SITEMAP_STRUCTURE)} full)")
+        logger.debug(f"   • Reduction: {reduction_pct:.1f}%")
+        logger.debug(f"   • Categories: {len(filtered_categories)}")
+        logger.debug("=" * 60)
 
         return filtered_json
 
     def _rank_results(self, results: List[Dict], query: str) -> List[Dict]:
         """Rank by relevance, heavily prioritizing slug/title matches over general content."""
         norm_query = self._normalize(query)
-        query_words_strict = set(re.findall(r'\b\w+\b', query.lower())) - {'the', 'a', 'of', 'for', 'series', 'guide', 'manual', 'how', 'to', 'do', 'i'}
+        query_words_strict = set(_WORD_RE.findall(query.lower())) - {'the', 'a', 'of', 'for', 'series', 'guide', 'manual', 'how', 'to', 'do', 'i'}
+        slug_query_words = self._slug_query_words(query)
+        matcher = SequenceMatcher(None, b=norm_query)
 
         for r in results:
             score = r.get('similarity', 0) * 100 if r.get('similarity') else 0 # Start with similarity if it's a vector result
@@ -1244,14 +981,14 @@ class ProductionRetriever:
                 if norm_slug == norm_query: # Perfect normalized slug match
                     score += 1000.0
                 else:
-                    score += self._slug_match_score(slug, query) * 8.0 # Scale score
+                    score += self._slug_match_score(slug, query, norm_query, slug_query_words, matcher) * 8.0 # Scale score
             
             if id_val and id_val != slug: # If id is different and relevant
                 norm_id = self._normalize(id_val)
                 if norm_id == norm_query:
                     score += 900.0
                 else:
-                    score += self._slug_match_score(id_val, query) * 7.0
+                    score += self._slug_match_score(id_val, query, norm_query, slug_query_words, matcher) * 7.0
 
             # --- Secondary: Title Matching ---
             if r.get('title'):
@@ -1262,14 +999,14 @@ class ProductionRetriever:
                     title_sm_ratio = SequenceMatcher(None, norm_title, norm_query).ratio()
                     score += title_sm_ratio * 300.0
 
-                    title_words = set(re.findall(r'\b\w+\b', r['title'].lower()))
+                    title_words = set(_WORD_RE.findall(r['title'].lower()))
                     overlap_title = query_words_strict.intersection(title_words)
                     if query_words_strict:
                         score += (len(overlap_title) / len(query_words_strict)) * 100.0
             
             # --- Tertiary: Content Relevance (Lower Priority) ---
             if r.get('content'):
-                content_words = set(re.findall(r'\b\w{3,}\b', r['content'].lower())) # Only significant words
+                content_words = set(_SIGNIFICANT_WORD_RE.findall(r['content'].lower())) # Only significant words
                 if query_words_strict:
                     overlap_content = len(query_words_strict.intersection(content_words)) / len(query_words_strict)
                     score += overlap_content * 50.0 # Lower weight
@@ -1283,7 +1020,7 @@ class ProductionRetriever:
         results.sort(key=lambda x: x.get('_score', 0), reverse=True)
         return results
 
-    def _execute_cypher_with_sitemap(self, question: str, hints: Dict, sitemap: str, sitemap_type: str) -> List[Dict]:
+    def _execute_cypher_with_sitemap(self, question: str, hints: Dict, sitemap: str, sitemap_type: str, hints_hash: Optional[str] = None) -> List[Dict]:
         """
         Execute Cypher generation and query with given sitemap.
         Helper method to avoid code duplication in fallback logic.
@@ -1293,6 +1030,8 @@ class ProductionRetriever:
             hints: Dictionary with slug_hints and hierarchy_hints
             sitemap: Sitemap structure (filtered or full)
             sitemap_type: "FILTERED" or "FULL" for logging
+            hints_hash: L2 cache key part; when given, a Cypher query that
+                returns results is cached so repeats skip the LLM call
 
         Returns:
             List of result dictionaries from Neo4j
@@ -1335,24 +1074,21 @@ class ProductionRetriever:
                     return []
             else:
                 # Direct LLM invocation (fallback mode)
-                prompt_template_direct = PromptTemplate(
-                    input_variables=["schema", "question", "sitemap_structure", "slug_hints_injection", "hierarchy_hints_injection"],
-                    template=CYPHER_GENERATION_PROMPT
-                )
-                prompt_formatted = prompt_template_direct.format(
-                    schema=self.graph.schema if self.graph else "Schema unavailable",
+                prompt_formatted = render_cypher_prompt(
                     question=question,
                     sitemap_structure=sitemap,
                     slug_hints_injection=slug_hints_str,
                     hierarchy_hints_injection=hierarchy_hints_str
                 )
 
+                # Bounded by the client's CYPHER_LLM_TIMEOUT; a timeout raises and
+                # is handled below, so cypher_search falls back
                 timing_llm_start = time.perf_counter()
-                response_llm = self.llm.invoke(prompt_formatted)
+                response = self.llm.invoke(prompt_formatted)
                 timing_llm_end = time.perf_counter()
                 logger.info(f"⏱️  LLM Cypher generation ({sitemap_type}) took: {timing_llm_end - timing_llm_start:.2f}s")
 
-                cypher = response_llm.content.strip().replace("```cypher", "").replace("```", "").strip()
+                cypher = _CYPHER_FENCE_RE.sub("", response.content).strip()
 
             if not cypher:
                 logger.error(f"❌ Empty Cypher generated with {sitemap_type} sitemap")
@@ -1362,13 +1098,17 @@ class ProductionRetriever:
 
             # Execute Cypher
             timing_neo4j_start = time.perf_counter()
-            with self.driver.session() as session:
-                raw_results = [dict(r) for r in session.run(cypher)]
+            with self.driver.session(database=NEO4J_DATABASE) as session:
+                raw_results = session.run(cypher).data()
             timing_neo4j_end = time.perf_counter()
             logger.info(f"⏱️  Neo4j execution ({sitemap_type}) took: {timing_neo4j_end - timing_neo4j_start:.2f}s")
 
             if raw_results:
                 logger.info(f"✅ {sitemap_type} sitemap Cypher found {len(raw_results)} results")
+                # --- L2 CACHE SET: Only queries that actually found something ---
+                if self.cache and hints_hash:
+                    self.cache.set_cypher(question, hints_hash, cypher)
+                    logger.info("✓ Cypher query cached in L2 for future use")
             else:
                 logger.warning(f"⚠️  {sitemap_type} sitemap Cypher returned 0 results")
 
@@ -1403,8 +1143,8 @@ class ProductionRetriever:
                 logger.info("⚡ L2 CACHE HIT - Using cached Cypher query")
                 try:
                     timing_neo4j_start = time.perf_counter()
-                    with self.driver.session() as session:
-                        raw_results = [dict(r) for r in session.run(cached_cypher)]
+                    with self.driver.session(database=NEO4J_DATABASE) as session:
+                        raw_results = session.run(cached_cypher).data()
                     timing_neo4j_end = time.perf_counter()
                     logger.info(f"⏱️  Neo4j execution took: {timing_neo4j_end - timing_neo4j_start:.2f}s")
 
@@ -1424,7 +1164,7 @@ class ProductionRetriever:
         filtered_sitemap = self._get_filtered_sitemap_structure(hints['hierarchy_hints'])
 
         # Step 4: Try with FILTERED sitemap first
-        results = self._execute_cypher_with_sitemap(question, hints, filtered_sitemap, "FILTERED")
+        results = self._execute_cypher_with_sitemap(question, hints, filtered_sitemap, "FILTERED", hints_hash)
 
         # Step 5: Automatic fallback to FULL sitemap if 0 results and filtered != full
         if not results and filtered_sitemap != SITEMAP_STRUCTURE:
@@ -1433,16 +1173,18 @@ class ProductionRetriever:
             logger.warning("🔄 FALLBACK: Retrying with FULL sitemap...")
             logger.warning("=" * 60)
 
-            results = self._execute_cypher_with_sitemap(question, hints, SITEMAP_STRUCTURE, "FULL")
+            results = self._execute_cypher_with_sitemap(question, hints, SITEMAP_STRUCTURE, "FULL", hints_hash)
 
             if results:
                 logger.info(f"✅ FALLBACK SUCCESSFUL: Found {len(results)} results with full sitemap")
             else:
                 logger.error("❌ FALLBACK FAILED: Still 0 results even with full sitemap")
 
-        # Step 6: Cache the successful Cypher (if any)
-        # Note: Caching happens inside _execute_cypher_with_sitemap for now
-        # We could enhance this to cache the query that actually worked
+        # Step 5b: Last resort - parameterized keyword search, no LLM involved
+        if not results:
+            results = self._keyword_fallback_search(question)
+
+        # Step 6: The Cypher query that worked was cached in L2 by _execute_cypher_with_sitemap
 
         timing_cypher_total = time.perf_counter() - timing_cypher_total_start
         logger.info("=" * 70)
@@ -1452,6 +1194,56 @@ class ProductionRetriever:
 
         return results
     
+    def embed_question(self, question: str) -> List[float]:
+        """Question embedding via Gemini API, served from the L3 cache when possible."""
+        # --- L3 CACHE CHECK: Embedding Cache ---
+        emb = None
+        if self.cache:
+            emb = self.cache.get_embedding(question)
+            if emb:
+                logger.info("⚡ L3 CACHE HIT - Using cached embedding")
+                logger.debug(f"Cached embedding dimension: {len(emb)}")
+            else:
+                logger.info("L3 CACHE MISS - Generating new embedding")
+
+        # Generate embedding if not cached
+        if emb is None:
+            timing_embedding_start = time.perf_counter()
+            emb = self.embedder.embed_query(question)
+            timing_embedding_end = time.perf_counter()
+            logger.info(f"⏱️  Gemini embeddings API took: {timing_embedding_end - timing_embedding_start:.2f}s")
+            logger.debug(f"Embedding computed via API, dimension: {len(emb)}")
+
+            # --- L3 CACHE SET: Cache the generated embedding ---
+            if self.cache:
+                self.cache.set_embedding(question, emb)
+                logger.info("✓ Embedding cached in L3 for future use")
+
+        return emb
+
+    def _keyword_fallback_search(self, question: str) -> List[Dict]:
+        """Match pages whose content contains any significant word of the question."""
+        words = [w for w in _SIGNIFICANT_WORD_RE.findall(question.lower()) if w not in _KEYWORD_FALLBACK_STOPWORDS][:3]
+        if not words:
+            return []
+
+        logger.info(f"🔄 KEYWORD FALLBACK: words={words}")
+        try:
+            timing_neo4j_start = time.perf_counter()
+            with self.driver.session(database=NEO4J_DATABASE) as session:
+                try:
+                    # Words are plain \w tokens, so they are safe as Lucene terms (OR-ed)
+                    results = session.run(KEYWORD_FULLTEXT_QUERY, terms=" ".join(words)).data()
+                except ClientError as e:
+                    logger.warning(f"Full-text index unavailable ({e.code}), using CONTAINS scan")
+                    results = session.run(KEYWORD_FALLBACK_QUERY, words=words).data()
+            logger.info(f"⏱️  Neo4j keyword fallback took: {time.perf_counter() - timing_neo4j_start:.2f}s")
+            logger.info(f"📊 Keyword fallback returned {len(results)} results")
+            return results
+        except Exception as e:
+            logger.error(f"❌ Keyword fallback failed: {e}", exc_info=True)
+            return []
+
     def vector_search(self, question: str) -> List[Dict]:
         """Vector search"""
         timing_vector_total_start = time.perf_counter()
@@ -1460,45 +1252,15 @@ class ProductionRetriever:
         logger.debug("Computing embeddings via Gemini API...")
 
         try:
-            # --- L3 CACHE CHECK: Embedding Cache ---
-            emb = None
-            if self.cache:
-                emb = self.cache.get_embedding(question)
-                if emb:
-                    logger.info("⚡ L3 CACHE HIT - Using cached embedding")
-                    logger.debug(f"Cached embedding dimension: {len(emb)}")
-                else:
-                    logger.info("L3 CACHE MISS - Generating new embedding")
-
-            # Generate embedding if not cached
-            if emb is None:
-                timing_embedding_start = time.perf_counter()
-                emb = self.embedder.embed_query(question)
-                timing_embedding_end = time.perf_counter()
-                logger.info(f"⏱️  Gemini embeddings API took: {timing_embedding_end - timing_embedding_start:.2f}s")
-                logger.debug(f"Embedding computed via API, dimension: {len(emb)}")
+            emb = self.embed_question(question)
 
-                # --- L3 CACHE SET: Cache the generated embedding ---
-                if self.cache:
-                    self.cache.set_embedding(question, emb)
-                    logger.info("✓ Embedding cached in L3 for future use")
-            
             # ✅ OPTIMIZED: Using native vector index instead of manual cosine similarity
             # This is 80% faster (~0.1-0.3s vs 0.6-1.7s) and more accurate
             # The 'page_embeddings' index was created in load_into_neo4j_json.py
-            cypher = """
-            CALL db.index.vector.queryNodes('page_embeddings', 5, $emb)
-            YIELD node AS p, score
-            WHERE score > 0.3
-            RETURN p.id as id, p.slug as slug, p.title as title,
-                   p.content as content, p.url as url, score as similarity
-            ORDER BY score DESC
-            """
-
             logger.debug("Executing vector similarity query...")
             timing_neo4j_vector_start = time.perf_counter()
-            with self.driver.session() as session:
-                results = [dict(r) for r in session.run(cypher, emb=emb)]
+            with self.driver.session(database=NEO4J_DATABASE) as session:
+                results = session.run(VECTOR_SEARCH_QUERY, emb=emb).data()
             timing_neo4j_vector_end = time.perf_counter()
             logger.info(f"⏱️  Neo4j vector similarity took: {timing_neo4j_vector_end - timing_neo4j_vector_start:.2f}s")
 
@@ -1517,6 +1279,54 @@ class ProductionRetriever:
             logger.error(f"Error in vector search: {e}", exc_info=True)
             return []
 
+    def _assemble_result(self, question: str, all_cypher_results: List[Dict], raw_vector_results: List[Dict]) -> Dict[str, Any]:
+        """Rank vector results and merge them with the Cypher results into the retrieve() response."""
+        # Apply _rank_results to the *raw* vector results to score them
+        timing_ranking_start = time.perf_counter()
+        scored_vector_results = self._rank_results(raw_vector_results, question)
+        timing_ranking_end = time.perf_counter()
+        logger.info(f"⏱️  Vector result ranking took: {timing_ranking_end - timing_ranking_start:.3f}s")
+        # Take only the top 10 most relevant vector results
+        top_5_vector_results = scored_vector_results[:5]
+
+        # --- Hybrid set: (Retain existing hybrid logic for internal use/display if needed) ---
+        # This part remains identical to your original intent for the retriever's
+        # *internal* combined ranking for display or subsequent processing.
+        # It will combine both sets of results (all Cypher, and the top 5 ranked vectors),
+        # deduplicate, and rank them all together for the `format_results` function.
+        
+        hybrid_combined_results = []
+        seen_keys_for_hybrid = set()
+
+        # Add ALL Cypher results to the hybrid set
+        for r in all_cypher_results:
+            key = r.get('slug') or r.get('id')
+            if key and key not in seen_keys_for_hybrid:
+                hybrid_combined_results.append(r)
+                seen_keys_for_hybrid.add(key)
+        
+        # Add the TOP 5 RANKED Vector results to the hybrid set, avoiding duplicates
+        # and limiting the total for display
+        for r in top_5_vector_results:
+            key = r.get('slug') or r.get('id')
+            if key and key not in seen_keys_for_hybrid:
+                hybrid_combined_results.append(r)
+                seen_keys_for_hybrid.add(key)
+                if len(hybrid_combined_results) >= 10: # Limit hybrid display to 10
+                    break
+        
+        # Rank the *combined* set for internal display/use
+        timing_hybrid_ranking_start = time.perf_counter()
+        ranked_for_internal_display = self._rank_results(hybrid_combined_results, question)
+        timing_hybrid_ranking_end = time.perf_counter()
+        logger.info(f"⏱️  Hybrid result ranking took: {timing_hybrid_ranking_end - timing_hybrid_ranking_start:.3f}s")
+
+        return {
+            "all_cypher_results": all_cypher_results,          # All results from Cypher
+            "top_5_vector_results": top_5_vector_results,      # Top 5 *ranked* vector results
+            "hybrid_ranked_for_display": ranked_for_internal_display # For your `format_results`
+        }
+
    # def retrieve(self, question: str) -> Dict:
         """Main retrieval with hybrid search (Cypher + Vector) - REVISED LOGIC"""
         print("\n" + "="*70)
@@ -1635,32 +1445,54 @@ class ProductionRetriever:
               return cached_result
           logger.info("L1 CACHE MISS - Proceeding with full retrieval")
 
-      # --- Step 1 & 2: PARALLEL EXECUTION of Cypher and Vector searches ---
-      logger.info("=" * 60)
-      logger.info("🚀 PARALLEL SEARCH STARTED")
-      logger.info("   • Launching Cypher search thread...")
-      logger.info("   • Launching Vector search thread...")
-      logger.info("=" * 60)
-
       timing_parallel_start = time.perf_counter()
 
-      # Execute both searches in parallel using ThreadPoolExecutor
-      with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-          # Submit both tasks
-          cypher_future = executor.submit(self.cypher_search, question)
-          vector_future = executor.submit(self.vector_search, question)
+      # Cypher generation is the slow branch, so it starts before the semantic
+      # cache check below and overlaps with the question's embedding round trip.
+      # On a semantic hit its result is simply not used.
+      cypher_future = self.search_executor.submit(self.cypher_search, question)
 
-          # Wait for Cypher to complete
-          all_cypher_results = cypher_future.result()
-          timing_cypher_done = time.perf_counter()
-          logger.info(f"✅ Cypher search thread COMPLETED: {len(all_cypher_results)} results")
-          logger.info(f"   • Time: {timing_cypher_done - timing_parallel_start:.2f}s")
+      # --- SEMANTIC CACHE CHECK: Paraphrases of an earlier question ---
+      # The embedding lands in L3, so vector_search below reuses it.
+      question_embedding = None
+      if self.cache:
+          try:
+              question_embedding = self.embed_question(question)
+          except Exception as e:
+              logger.warning(f"Semantic cache skipped, embedding failed: {e}")
+          if question_embedding is not None:
+              similar_result = self.cache.get_similar_result(question_embedding)
+              if similar_result:
+                  cypher_future.cancel()  # Only stops it if it hasn't started yet
+                  cache_retrieve_time = time.perf_counter() - timing_retrieve_total_start
+                  logger.info("⚡ SEMANTIC CACHE HIT - Returning result of a similar question")
+                  logger.info(f"⏱️  Semantic cache retrieval took: {cache_retrieve_time:.4f}s")
+                  logger.info("="*70)
+                  return similar_result
+              logger.info("SEMANTIC CACHE MISS - Proceeding with full retrieval")
 
-          # Wait for Vector to complete
-          raw_vector_results = vector_future.result()
-          timing_vector_done = time.perf_counter()
-          logger.info(f"✅ Vector search thread COMPLETED: {len(raw_vector_results)} results")
-          logger.info(f"   • Time: {timing_vector_done - timing_parallel_start:.2f}s")
+      # --- Step 1 & 2: PARALLEL EXECUTION of Cypher and Vector searches ---
+      logger.debug("=" * 60)
+      logger.debug("🚀 PARALLEL SEARCH STARTED")
+      logger.debug("   • Launching Cypher search thread...")
+      logger.debug("   • Launching Vector search thread...")
+      logger.debug("=" * 60)
+
+      # Execute both searches in parallel on the shared search pool
+      # (the Cypher task was already submitted above)
+      vector_future = self.search_executor.submit(self.vector_search, question)
+
+      # Wait for Cypher to complete
+      all_cypher_results = cypher_future.result()
+      timing_cypher_done = time.perf_counter()
+      logger.debug(f"✅ Cypher search thread COMPLETED: {len(all_cypher_results)} results")
+      logger.debug(f"   • Time: {timing_cypher_done - timing_parallel_start:.2f}s")
+
+      # Wait for Vector to complete
+      raw_vector_results = vector_future.result()
+      timing_vector_done = time.perf_counter()
+      logger.debug(f"✅ Vector search thread COMPLETED: {len(raw_vector_results)} results")
+      logger.debug(f"   • Time: {timing_vector_done - timing_parallel_start:.2f}s")
 
       timing_parallel_end = time.perf_counter()
       parallel_duration = timing_parallel_end - timing_parallel_start
@@ -1671,75 +1503,96 @@ class ProductionRetriever:
       sequential_estimate = cypher_time + vector_time
       time_saved = sequential_estimate - parallel_duration
 
-      logger.info("=" * 60)
-      logger.info(f"⏱️  PARALLEL EXECUTION COMPLETE:")
-      logger.info(f"   • Total parallel time: {parallel_duration:.2f}s")
-      logger.info(f"   • Cypher finished at: {cypher_time:.2f}s")
-      logger.info(f"   • Vector finished at: {vector_time:.2f}s")
-      logger.info(f"   • Sequential estimate: {sequential_estimate:.2f}s")
-      logger.info(f"   • Time saved: ~{time_saved:.2f}s ({(time_saved/sequential_estimate*100):.1f}% faster)")
-      logger.info("=" * 60)
-
-      # Apply _rank_results to the *raw* vector results to score them
-      timing_ranking_start = time.perf_counter()
-      scored_vector_results = self._rank_results(raw_vector_results, question)
-      timing_ranking_end = time.perf_counter()
-      logger.info(f"⏱️  Vector result ranking took: {timing_ranking_end - timing_ranking_start:.3f}s")
-      # Take only the top 10 most relevant vector results
-      top_5_vector_results = scored_vector_results[:5]
-
-      # --- Step 3: (Retain existing hybrid logic for internal use/display if needed) ---
-      # This part remains identical to your original intent for the retriever's
-      # *internal* combined ranking for display or subsequent processing.
-      # It will combine both sets of results (all Cypher, and the top 5 ranked vectors),
-      # deduplicate, and rank them all together for the `format_results` function.
-      
-      hybrid_combined_results = []
-      seen_keys_for_hybrid = set()
-
-      # Add ALL Cypher results to the hybrid set
-      for r in all_cypher_results:
-          key = r.get('slug') or r.get('id')
-          if key and key not in seen_keys_for_hybrid:
-              hybrid_combined_results.append(r)
-              seen_keys_for_hybrid.add(key)
-      
-      # Add the TOP 5 RANKED Vector results to the hybrid set, avoiding duplicates
-      # and limiting the total for display
-      for r in top_5_vector_results:
-          key = r.get('slug') or r.get('id')
-          if key and key not in seen_keys_for_hybrid:
-              hybrid_combined_results.append(r)
-              seen_keys_for_hybrid.add(key)
-              if len(hybrid_combined_results) >= 10: # Limit hybrid display to 10
-                  break
-      
-      # Rank the *combined* set for internal display/use
-      timing_hybrid_ranking_start = time.perf_counter()
-      ranked_for_internal_display = self._rank_results(hybrid_combined_results, question)
-      timing_hybrid_ranking_end = time.perf_counter()
-      logger.info(f"⏱️  Hybrid result ranking took: {timing_hybrid_ranking_end - timing_hybrid_ranking_start:.3f}s")
+      logger.debug("=" * 60)
+      logger.info(f"⏱️  PARALLEL EXECUTION COMPLETE: {parallel_duration:.2f}s")
+      logger.debug(f"⏱️  PARALLEL EXECUTION COMPLETE:")
+      logger.debug(f"   • Total parallel time: {parallel_duration:.2f}s")
+      logger.debug(f"   • Cypher finished at: {cypher_time:.2f}s")
+      logger.debug(f"   • Vector finished at: {vector_time:.2f}s")
+      logger.debug(f"   • Sequential estimate: {sequential_estimate:.2f}s")
+      logger.debug(f"   • Time saved: ~{time_saved:.2f}s ({(time_saved/sequential_estimate*100):.1f}% faster)")
+      logger.debug("=" * 60)
+
+      # --- Step 3: Rank vector results and build the hybrid set ---
+      result = self._assemble_result(question, all_cypher_results, raw_vector_results)
 
       # --- Step 4: Return the specific results as requested ---
       timing_retrieve_total = time.perf_counter() - timing_retrieve_total_start
-      logger.info(f"Retrieval complete. Cypher: {len(all_cypher_results)}, Vector (top 5): {len(top_5_vector_results)}, Hybrid: {len(ranked_for_internal_display)}")
+      logger.info(f"Retrieval complete. Cypher: {len(result['all_cypher_results'])}, Vector (top 5): {len(result['top_5_vector_results'])}, Hybrid: {len(result['hybrid_ranked_for_display'])}")
       logger.info(f"⏱️  TOTAL RETRIEVE took: {timing_retrieve_total:.2f}s")
       logger.info("="*70)
 
-      # Prepare result dictionary
-      result = {
-          "all_cypher_results": all_cypher_results,          # All results from Cypher
-          "top_5_vector_results": top_5_vector_results,      # Top 5 *ranked* vector results
-          "hybrid_ranked_for_display": ranked_for_internal_display # For your `format_results`
-      }
-
       # --- L1 CACHE SET: Cache the complete result for future queries ---
       if self.cache:
           self.cache.set_result(question, result)
           logger.info("✓ Result cached in L1 for future queries")
+          if question_embedding is not None:
+              self.cache.set_similar_result(question_embedding, result)
 
       return result
 
+    def _vector_search_batch(self, embeddings: List[List[float]]) -> List[List[Dict]]:
+        """Vector search for several question embeddings in one Neo4j call."""
+        try:
+            timing_neo4j_vector_start = time.perf_counter()
+            with self.driver.session(database=NEO4J_DATABASE) as session:
+                rows = session.run(VECTOR_SEARCH_BATCH_QUERY, embs=embeddings).data()
+            logger.info(f"⏱️  Neo4j batched vector similarity ({len(embeddings)} questions) took: {time.perf_counter() - timing_neo4j_vector_start:.2f}s")
+        except Exception as e:
+            logger.error(f"Error in batched vector search: {e}", exc_info=True)
+            return [[] for _ in embeddings]
+
+        grouped = [[] for _ in embeddings]
+        for row in rows:
+            grouped[row.pop('i')].append(row)
+        return grouped
+
+    def retrieve_batch(self, questions: List[str], max_workers: int = 4) -> List[Dict[str, Any]]:
+        """
+        retrieve() for a list of questions, returning results in the same order.
+        Uncached questions are embedded in one Gemini call and vector-searched in
+        one Neo4j round trip; Cypher generation still needs an LLM call per
+        question, so those run concurrently on a small thread pool.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        pending = []
+        for i, question in enumerate(questions):
+            cached_result = self.cache.get_result(question) if self.cache else None
+            if cached_result:
+                results[i] = cached_result
+            else:
+                pending.append(i)
+
+        logger.info(f"RETRIEVE_BATCH: {len(questions)} questions, {len(pending)} not cached")
+        if not pending:
+            return results
+
+        pending_questions = [questions[i] for i in pending]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            cypher_futures = [executor.submit(self.cypher_search, q) for q in pending_questions]
+
+            try:
+                timing_embedding_start = time.perf_counter()
+                embeddings = self.embedder.embed_documents(pending_questions, task_type="RETRIEVAL_QUERY")
+                logger.info(f"⏱️  Gemini batch embeddings ({len(pending_questions)}) took: {time.perf_counter() - timing_embedding_start:.2f}s")
+                if self.cache:
+                    for question, emb in zip(pending_questions, embeddings):
+                        self.cache.set_embedding(question, emb)
+                vector_results = self._vector_search_batch(embeddings)
+            except Exception as e:
+                logger.error(f"Error embedding batch: {e}", exc_info=True)
+                vector_results = [[] for _ in pending_questions]
+
+            cypher_results = [future.result() for future in cypher_futures]
+
+        for i, question, cypher_hits, vector_hits in zip(pending, pending_questions, cypher_results, vector_results):
+            result = self._assemble_result(question, cypher_hits, vector_hits)
+            if self.cache:
+                self.cache.set_result(question, result)
+            results[i] = result
+
+        return results
+
   # The `format_results` function provided in the previous response
   # is already correctly set up to consume "hybrid_ranked_for_display".
   # No changes needed there if you use the updated `retrieve` above.
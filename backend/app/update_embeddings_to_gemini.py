@@ -18,6 +18,11 @@ from dotenv import load_dotenv
 from typing import List, Dict, Any
 from neo4j import GraphDatabase
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+try:
+    from .vector_index import create_page_vector_index
+except ImportError:
+    # Run as a script from inside backend/app
+    from vector_index import create_page_vector_index
 
 # Load environment variables
 load_dotenv()
@@ -209,17 +214,8 @@ class EmbeddingUpdater:
             # Create new index
             logger.info("Creating new vector index (768 dimensions)...")
             try:
-                session.run("""
-                    CREATE VECTOR INDEX page_embeddings IF NOT EXISTS
-                    FOR (p:Page) ON (p.embedding)
-                    OPTIONS {
-                        indexConfig: {
-                            `vector.dimensions`: 768,
-                            `vector.similarity_function`: 'cosine'
-                        }
-                    }
-                """)
-                logger.info("✓ New vector index created (768 dimensions)")
+                quantized = create_page_vector_index(session)
+                logger.info(f"✓ New vector index created (768 dimensions, {'int8-quantized' if quantized else 'without quantization'})")
                 logger.info("  Note: Index may take 1-2 minutes to build")
             except Exception as e:
                 logger.error(f"Failed to create vector index: {e}")
@@ -0,0 +1,38 @@
+# vector_index.py
+"""
+The Page.embedding vector index, shared by the graph loaders and the
+embedding update script so the index definition lives in one place.
+"""
+from neo4j.exceptions import ClientError
+
+# 768 dimensions for Gemini API embeddings (text-embedding-004)
+PAGE_VECTOR_INDEX = """
+    CREATE VECTOR INDEX page_embeddings IF NOT EXISTS
+    FOR (p:Page) ON (p.embedding)
+    OPTIONS {
+        indexConfig: {
+            `vector.dimensions`: 768,
+            `vector.similarity_function`: 'cosine'%s
+        }
+    }
+"""
+
+def create_page_vector_index(session) -> bool:
+    """
+    Create the page vector index, int8-quantized where the server supports it.
+    Returns True if it was created with quantization, False if without.
+    Errors other than a rejected quantization option propagate to the caller.
+    """
+    # Neo4j 5.23+ already quantizes vector indexes by default, so asking for it
+    # only matters on older servers. Servers that don't know the option reject it
+    # as an invalid statement (Neo.ClientError.Statement.*); retry without it there.
+    # Anything else, e.g. an auth/permission ClientError or a connection error, is
+    # not retried.
+    try:
+        session.run(PAGE_VECTOR_INDEX % ", `vector.quantization.enabled`: true").consume()
+        return True
+    except ClientError as e:
+        if not (e.code or "").startswith("Neo.ClientError.Statement."):
+            raise
+        session.run(PAGE_VECTOR_INDEX % "").consume()
+        return False